@@ -0,0 +1,164 @@
+"""Headless benchmarks for the SessionSlice data layer.
+
+Generates synthetic session histories, times the hot paths of SessionSliceData and the
+calendar/analytics queries, and emits JSON so results can be compared between commits.
+
+    python benchmark.py --sizes 1000,10000,100000 --output bench.json
+    python benchmark.py --sizes 1000000 --repeat 1
+    python benchmark.py --compare old.json --output new.json
+"""
+import argparse, json, os, platform, random, shutil, subprocess, sys, tempfile, time, types
+from datetime import datetime, timedelta
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = [1000, 10000, 100000]
+def generate_sessions(count, task_count=50, type_count=6, seed=0):
+    """Generate ``count`` sessions ending today, spread over up to ten years of history"""
+    rng = random.Random(seed)
+    tasks = [{"name": f"Task {i:04d}", "color": "#%06x" % rng.randrange(0xFFFFFF), "project": f"Project {i % 12}"}
+             for i in range(task_count)]
+    icons = ["🔥", "☕", "📚", "💻", "🏃", "🎨", "🧠", "📝"]
+    session_types = [{"name": f"Type {i}", "icon": icons[i % len(icons)], "color": "#%06x" % rng.randrange(0xFFFFFF),
+                      "hours": 0, "minutes": rng.choice([5, 15, 25, 50])} for i in range(type_count)]
+    type_labels = [f"{st['icon']} {st['name']}" for st in session_types]
+    days = min(3650, max(30, count // 8))
+    today = datetime.now().date()
+    sessions = []
+    for i in range(count):
+        day = today - timedelta(days=days - 1 - (i * days) // count)
+        start = rng.randrange(6 * 60, 22 * 60)
+        duration = round(rng.uniform(5, 120), 1)
+        end = int(start + duration) % (24 * 60)
+        sessions.append({
+            "name": rng.choice(tasks)["name"],
+            "date": day.strftime("%Y-%m-%d"),
+            "start": f"{start // 60:02d}:{start % 60:02d}",
+            "end": f"{end // 60:02d}:{end % 60:02d}",
+            "duration": duration,
+            "breaks": rng.randrange(3),
+            "interruptions": rng.choice([0, 0, 0, 1, 2, 3]),
+            "session_type": rng.choice(type_labels)
+        })
+    return sessions, tasks, session_types
+def _timeit(func, repeat, setup=None):
+    """Run ``func`` ``repeat`` times and return min/mean wall time in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"min_ms": round(min(timings), 3), "mean_ms": round(sum(timings) / len(timings), 3)}
+def run_size(ss, count, repeat):
+    """Write a synthetic history of ``count`` sessions into the data dir and time each hot path"""
+    sessions, tasks, session_types = generate_sessions(count)
+    ss.save_json(ss.SESSION_FILE, sessions)
+    ss.save_json(ss.TASKS_FILE, tasks)
+    ss.save_json(ss.SESSION_TYPES_FILE, session_types)
+    for path in (ss.ACHIEVEMENTS_FILE, ss.USER_PROFILE_FILE, ss.GOALS_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.rmtree(ss.ARCHIVE_DIR, ignore_errors=True)
+    del sessions
+    results = {}
+    holder = {}
+    results["load"] = _timeit(lambda: holder.__setitem__("data", ss.SessionSliceData()), repeat)
+    data = holder["data"]
+    app = types.SimpleNamespace(data=data)
+    results["save_all"] = _timeit(data.save_all, repeat)
+    results["calculate_streak"] = _timeit(lambda: ss.calculate_streak(data.sessions), repeat)
+    results["record_session"] = _timeit(lambda: data.record_session(dict(data.sessions[-1], id=ss.new_id())), repeat)
+    results["update_user_stats"] = _timeit(data._update_user_stats, repeat)
+    results["check_and_unlock_achievements"] = _timeit(
+        data.check_and_unlock_achievements, repeat,
+        setup=lambda: setattr(data, "achievements", data._create_default_achievements()))
+    results["achievement_metrics_cold"] = _timeit(data.metrics, repeat, setup=data.mark_changed)
+    calendar_page = types.SimpleNamespace(app=app, current_date=datetime.now())
+    results["calendar_month_sessions"] = _timeit(lambda: ss.CalendarPage._get_month_sessions(calendar_page), repeat)
+    for period in ["Last 7 Days", "Last 30 Days", "Last 90 Days", "This Year"]:
+        key = "analytics_" + period.lower().replace(" ", "_")
+        results[key] = _timeit(lambda: data.rollups.summarize(*ss.AnalyticsPage.preset_range(period)), repeat)
+    all_time = data.rollups.summarize()["daily_time"]
+    results["line_series_all_time"] = _timeit(
+        lambda: ss.AnalyticsPage.line_series(all_time, ss.AnalyticsPage.LINE_POINT_BUDGET), repeat)
+    today = datetime.now().date()
+    for key, days in [("compare_range_90_days", 90), ("compare_range_5_years", 5 * 365)]:
+        start = (today - timedelta(days=days - 1)).isoformat()
+        results[key] = _timeit(lambda: data.rollups.compare(start, today.isoformat()), repeat)
+    results["rollups_rebuild"] = _timeit(data.rollups.rebuild, repeat)
+    index = data.search_index
+    results["search_build"] = _timeit(index.build, repeat)
+    month_start = datetime.now().replace(day=1).strftime("%Y-%m-%d")
+    for key, kwargs in [("search_all_facets", {}),
+                        ("search_prefix_query", {"query": "task 00"}),
+                        ("search_query_date_range", {"query": "type", "start_date": month_start}),
+                        ("search_facet_filter", {"filters": {"weekday": "Mon"}})]:
+        results[key] = _timeit(lambda: index.search(**kwargs), repeat)
+    results["heatmap_bin"] = _timeit(lambda: ss.FocusHeatmap.bin_sessions(data.sessions), repeat)
+    results["file_size_bytes"] = os.path.getsize(ss.SESSION_FILE)
+    results["archive_old_sessions"] = _timeit(data.archive_old_sessions, 1)
+    if data.archive.years:
+        results["load_after_archive"] = _timeit(lambda: holder.__setitem__("data", ss.SessionSliceData()), repeat)
+        data = holder["data"]
+        year = data.archive.years[0]
+        results["archive_cold_month"] = _timeit(lambda: data.sessions_between(f"{year}-06-01", f"{year}-06-30"), repeat,
+                                                setup=data.archive._cache.clear)
+        results["hot_file_size_bytes"] = os.path.getsize(ss.SESSION_FILE)
+    return results
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+def compare(baseline, current):
+    """Print the current/baseline ratio of every timing present in both result sets"""
+    for size, benches in current["results"].items():
+        base = baseline.get("results", {}).get(size)
+        if not base:
+            continue
+        print(f"\n{size} sessions")
+        for name, result in benches.items():
+            if not isinstance(result, dict) or name not in base:
+                continue
+            old, new = base[name]["min_ms"], result["min_ms"]
+            ratio = new / old if old else float("inf")
+            flag = "  <-- regression" if ratio > 1.2 else ""
+            print(f"  {name:40s} {old:10.3f} ms -> {new:10.3f} ms  x{ratio:.2f}{flag}")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES),
+                        help="comma separated session counts, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions per benchmark")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    args = parser.parse_args(argv)
+    output_path = os.path.abspath(args.output) if args.output else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    sys.path.insert(0, REPO_DIR)
+    report = {
+        "meta": {"commit": _git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                 "timestamp": datetime.now().isoformat(timespec="seconds"), "repeat": args.repeat},
+        "results": {}
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="sessionslice-bench-") as workdir:
+        os.chdir(workdir)  # DATA_DIR is relative, so the benchmark never touches the real data/
+        try:
+            import sessionslice as ss
+            for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+                print(f"Benchmarking {size} sessions...", file=sys.stderr)
+                report["results"][str(size)] = run_size(ss, size, args.repeat)
+        finally:
+            os.chdir(cwd)
+    output = json.dumps(report, indent=2)
+    if output_path:
+        with open(output_path, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    if compare_path:
+        with open(compare_path) as f:
+            compare(json.load(f), report)
+if __name__ == "__main__":
+    main()
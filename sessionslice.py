@@ -1,18 +1,33 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, colorchooser, filedialog, simpledialog
 from datetime import datetime, timedelta, date
-import json, os, csv, threading, time, calendar as cal
-from collections import defaultdict
+import json, os, sys, re, csv, threading, time, calendar as cal, cProfile, functools, bisect, socket, queue, uuid, hashlib, hmac
+import argparse, html, io, multiprocessing, ctypes, ctypes.util, asyncio, gzip, lzma
+from array import array
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, Future
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt, numpy as np
-from matplotlib import cm
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.pyplot as plt, matplotlib.image as mpimg, numpy as np
 try: from plyer import notification; NOTIFICATIONS_AVAILABLE = True
 except ImportError: NOTIFICATIONS_AVAILABLE = False
+try: import fcntl
+except ImportError: fcntl = None
+try: import msvcrt
+except ImportError: msvcrt = None
 APP_TITLE, DATA_DIR = "SessionSlice Productivity Tracker", "data"
 os.makedirs(DATA_DIR, exist_ok=True)
-FILES = {k: os.path.join(DATA_DIR, f"{k.lower()}.json") for k in ['SESSIONS', 'TASKS', 'SESSION_TYPES', 'GOALS', 'ACHIEVEMENTS', 'USER_PROFILE', 'THEMES', 'THEME_SETTINGS']}
-SESSION_FILE, TASKS_FILE, SESSION_TYPES_FILE, GOALS_FILE, ACHIEVEMENTS_FILE, USER_PROFILE_FILE, THEMES_FILE, THEME_SETTINGS_FILE = FILES.values()
+FILES = {k: os.path.join(DATA_DIR, f"{k.lower()}.json") for k in ['SESSIONS', 'TASKS', 'SESSION_TYPES', 'GOALS', 'ACHIEVEMENTS', 'USER_PROFILE', 'THEMES', 'THEME_SETTINGS', 'ROLLUPS', 'APP_SETTINGS']}
+SESSION_FILE, TASKS_FILE, SESSION_TYPES_FILE, GOALS_FILE, ACHIEVEMENTS_FILE, USER_PROFILE_FILE, THEMES_FILE, THEME_SETTINGS_FILE, ROLLUPS_FILE, APP_SETTINGS_FILE = FILES.values()
+REPORTS_DIR, REPORT_CACHE_DIR = os.path.join(DATA_DIR, "reports"), os.path.join(DATA_DIR, "report_cache")
+SESSION_EVENTS_FILE = os.path.join(DATA_DIR, "session_events.jsonl")
+SYNC_STATE_FILE = os.path.join(DATA_DIR, "sync_state.json")
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+XP_LEDGER_FILE = os.path.join(DATA_DIR, "xp_ledger.jsonl")
+COMMAND_LOG_FILE = os.path.join(DATA_DIR, "command_log.json")
+API_TOKEN_FILE = os.path.join(DATA_DIR, "api_token")
 COLORS = {
     'primary': "#4474db",        # Modern blue
     'primary_dark': '#1d4ed8',   # Darker blue for hover
@@ -32,7 +47,11 @@ COLORS = {
     'timer': '#dc2626'           # Timer color
 }
 DEFAULT_TASK_COLOR = COLORS['primary']
+DEFAULT_APP_SETTINGS = {"idle_auto_pause": True, "idle_threshold_minutes": 5, "os_notifications": True,
+                        "api_enabled": False, "api_port": 8765, "metrics_textfile": "", "sync_folder": "",
+                        "archive_after_days": 365}
 DEFAULT_BREAK_COLOR = COLORS['secondary']
+XP_RULES = {"session": 10, "goal": 50}  # achievements award their own xp_reward
 FONT_FAMILY = "Segoe UI"
 FONT_SIZES = {
     'small': 9,
@@ -45,7 +64,123 @@ FONT_SIZES = {
     'timer': 28
 }
 def load_json(filepath, default): return json.load(open(filepath, "r")) if os.path.exists(filepath) else default
-def save_json(filepath, data): json.dump(data, open(filepath, "w"), indent=2)
+def save_json(filepath, data): write_atomic(filepath, json.dumps(data, indent=2))
+def write_atomic(filepath, text):
+    """Write via a temp file and rename so readers never see a half-written file"""
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, filepath)
+def file_stamp(filepath):
+    """(mtime_ns, size) of a file, or None if missing; used to detect writes by other processes"""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+def new_id():
+    return uuid.uuid4().hex[:16]
+def env_int(name, default):
+    """Integer value of an environment variable, or ``default`` (with a warning) if it is unset or not a number"""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Ignoring {name}={value!r}: expected a whole number, using {default}")
+        return default
+def stable_id(*parts):
+    """Deterministic id for legacy records, so every instance migrating the same file agrees"""
+    return hashlib.sha1("\x1f".join(map(str, parts)).encode("utf-8")).hexdigest()[:16]
+def assign_session_ids(sessions):
+    """Give id-less (legacy) sessions a deterministic id derived from their content"""
+    seen = defaultdict(int)
+    for s in sessions:
+        if "id" not in s:
+            key = session_key(s)
+            seen[key] += 1
+            s["id"] = stable_id("session", *key, seen[key])
+    return sessions
+def session_key(session):
+    """Identity of a session for merging: its id, or its content for legacy records"""
+    return session.get("id") or (session.get("date"), session.get("start"), session.get("end"),
+                                 session.get("name"), session.get("duration"), session.get("session_type"))
+class DataDirLock:
+    """Advisory inter-process lock on the data directory (flock on POSIX, msvcrt on Windows)"""
+    def __init__(self, data_dir=DATA_DIR):
+        self.path = os.path.join(data_dir, ".lock")
+        self._file = None
+    def __enter__(self):
+        self._file = open(self.path, "a+")
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        elif msvcrt:
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        return self
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        elif msvcrt:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+class SingleInstanceGuard:
+    """Lets the first instance own the data dir; later launches ask it to focus its window over localhost IPC"""
+    def __init__(self, data_dir=DATA_DIR):
+        self.port_file = os.path.join(data_dir, ".instance")
+        self.server = None
+        self.port = None
+    def acquire(self):
+        """Return True if this process is the primary instance, otherwise notify the running one"""
+        with DataDirLock(os.path.dirname(self.port_file)):
+            port = load_json(self.port_file, {}).get("port")
+            if port and self._notify(port):
+                return False
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.bind(("127.0.0.1", 0))
+            self.server.listen(5)
+            self.port = self.server.getsockname()[1]
+            save_json(self.port_file, {"port": self.port, "pid": os.getpid()})
+        return True
+    @staticmethod
+    def _notify(port):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as conn:
+                conn.sendall(b"focus\n")
+                return conn.recv(16).startswith(b"ok")
+        except OSError:
+            return False
+    def serve(self, on_focus):
+        """Answer focus requests on a daemon thread; ``on_focus`` must be thread-safe"""
+        def loop():
+            while self.server:
+                try:
+                    conn, _ = self.server.accept()
+                except OSError:
+                    return
+                with conn:
+                    conn.settimeout(1)
+                    try:
+                        if conn.recv(64).startswith(b"focus"):
+                            conn.sendall(b"ok\n")
+                            on_focus()
+                    except OSError:
+                        pass
+        threading.Thread(target=loop, name="single-instance", daemon=True).start()
+    def release(self):
+        if self.server:
+            self.server.close()
+            self.server = None
+            if load_json(self.port_file, {}).get("port") == self.port:
+                os.remove(self.port_file)
 class ThemeManager:
     def __init__(self):
         self.themes = self._create_default_themes()
@@ -142,6 +277,548 @@ class ThemeManager:
         except Exception as e:
             return False, f"Failed to import theme: {str(e)}"
 theme_manager = ThemeManager()
+class Instrumentation:
+    """Toggleable latency recorder for UI paths, keeping recent samples in a ring buffer"""
+    def __init__(self, capacity=2000):
+        self.enabled = bool(os.environ.get("SESSIONSLICE_PROFILE"))
+        self.samples = deque(maxlen=capacity)
+        self.call_counts = defaultdict(int)
+        self.profile_path = None
+        self._profiler = None
+        self._depth = 0
+    def record(self, name, seconds):
+        self.samples.append((name, seconds))
+        self.call_counts[name] += 1
+    @contextmanager
+    def measure(self, name):
+        """Time the wrapped block; the outermost block also feeds a pending cProfile request"""
+        if not self.enabled:
+            yield
+            return
+        if self._depth == 0 and self.profile_path and self._profiler is None:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+            self._depth -= 1
+            if self._depth == 0 and self._profiler is not None:
+                self._profiler.disable()
+                try:
+                    self._profiler.dump_stats(self.profile_path)
+                except OSError as e:
+                    print(f"Profile dump error: {e}")
+                self._profiler, self.profile_path = None, None
+    def instrumented(self, name=None):
+        """Decorator form of measure(); defaults to the function's qualified name"""
+        def decorator(func):
+            label = name or func.__qualname__
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.measure(label):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+    def profile_next(self, path):
+        """Dump a cProfile/pstats file for the next measured interaction"""
+        self.enabled = True
+        self.profile_path = path
+    def clear(self):
+        self.samples.clear()
+        self.call_counts.clear()
+    def summary(self):
+        """Return (name, calls, p50_ms, p95_ms, max_ms) rows sorted by p95, slowest first"""
+        by_name = defaultdict(list)
+        for name, seconds in self.samples:
+            by_name[name].append(seconds * 1000)
+        rows = []
+        for name, values in by_name.items():
+            values.sort()
+            pick = lambda q: values[int(round(q * (len(values) - 1)))]
+            rows.append((name, self.call_counts[name], pick(0.5), pick(0.95), values[-1]))
+        return sorted(rows, key=lambda r: r[3], reverse=True)
+instrumentation = Instrumentation()
+class MetricsRegistry:
+    """OpenMetrics counters, gauges and summaries for Prometheus, updated as events happen.
+
+    Producers update values in place under a lock; a scrape or a textfile write only formats the
+    current values, so nothing is recomputed from session history per scrape.
+    """
+    FAMILIES = {
+        "sessionslice_sessions": ("counter", "Completed focus sessions"),
+        "sessionslice_focus_minutes": ("counter", "Minutes spent in completed sessions"),
+        "sessionslice_perfect_sessions": ("counter", "Completed sessions without interruptions"),
+        "sessionslice_interruptions": ("counter", "Interruptions logged in completed sessions"),
+        "sessionslice_breaks": ("counter", "Breaks logged in completed sessions"),
+        "sessionslice_task_minutes": ("counter", "Minutes spent per task"),
+        "sessionslice_streak_days": ("gauge", "Current daily streak"),
+        "sessionslice_level": ("gauge", "User level"),
+        "sessionslice_xp": ("gauge", "Total XP earned"),
+        "sessionslice_goals_completed": ("gauge", "Completed goals"),
+        "sessionslice_session_active": ("gauge", "1 while a session is running"),
+        "sessionslice_session_paused": ("gauge", "1 while the running session is paused"),
+        "sessionslice_session_start_timestamp_seconds": ("gauge", "Unix time the running session started, 0 if none"),
+        "sessionslice_save_duration_seconds": ("summary", "Time spent in SessionSliceData.save_all"),
+        "sessionslice_page_refresh_duration_seconds": ("summary", "Time spent refreshing a page when it is shown"),
+        "sessionslice_data_file_size_bytes": ("gauge", "Size of each data file after the last save"),
+    }
+    CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(dict)
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+    def inc(self, name, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[name][key] = self._values[name].get(key, 0) + amount
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[name][self._key(labels)] = value
+    def observe(self, name, seconds, **labels):
+        key = self._key(labels)
+        with self._lock:
+            count, total = self._values[name].get(key, (0, 0.0))
+            self._values[name][key] = (count + 1, total + seconds)
+    @contextmanager
+    def time(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+    def timed(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+    @staticmethod
+    def _labels(key, extra=()):
+        pairs = list(key) + list(extra)
+        if not pairs:
+            return ""
+        escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+    def render(self, openmetrics=True):
+        """OpenMetrics for /metrics; ``openmetrics=False`` gives the classic Prometheus text format,
+        where counter families are named with their ``_total`` suffix and there is no ``# EOF``"""
+        with self._lock:
+            values = {name: dict(samples) for name, samples in self._values.items()}
+        lines = []
+        for name, (kind, help_text) in self.FAMILIES.items():
+            samples = values.get(name)
+            if not samples:
+                continue
+            family = name if openmetrics or kind != "counter" else f"{name}_total"
+            lines.append(f"# TYPE {family} {kind}")
+            lines.append(f"# HELP {family} {help_text}")
+            for key, value in sorted(samples.items()):
+                if kind == "summary":
+                    lines.append(f"{name}_count{self._labels(key)} {value[0]}")
+                    lines.append(f"{name}_sum{self._labels(key)} {value[1]:.6f}")
+                else:
+                    number = round(value, 6) if isinstance(value, float) else value
+                    lines.append(f"{name}{'_total' if kind == 'counter' else ''}{self._labels(key)} {number}")
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+    def write_textfile(self, path):
+        """Atomically write the classic text exposition node_exporter's textfile collector parses"""
+        write_atomic(path, self.render(openmetrics=False))
+metrics_registry = MetricsRegistry()
+class MainLoopWatchdog:
+    """Measures Tk main-loop lag with an after() heartbeat and logs stalls with the handler that caused them"""
+    def __init__(self, root, interval_ms=50, threshold_ms=200):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.threshold_ms = threshold_ms
+        self.stalls = deque(maxlen=200)
+        self.running = False
+        self.log_path = os.path.join(DATA_DIR, "stalls.log")
+        self._main_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._handler = None
+        self._generation = 0
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._generation += 1
+        self._last_beat = time.perf_counter()
+        self.root.after(self.interval_ms, self._beat, self._generation)
+        threading.Thread(target=self._sample, args=(self._generation,), name="mainloop-watchdog", daemon=True).start()
+    def stop(self):
+        self.running = False
+    def _beat(self, generation):
+        if not self.running or generation != self._generation:
+            return
+        now = time.perf_counter()
+        lag_ms = (now - self._last_beat) * 1000 - self.interval_ms
+        if lag_ms > self.threshold_ms:
+            self._report(lag_ms)
+        self._last_beat = now
+        self._handler = None
+        self.root.after(self.interval_ms, self._beat, generation)
+    def _sample(self, generation):
+        """Background thread: once a beat is overdue, capture what the Tk thread is running"""
+        while self.running and generation == self._generation:
+            time.sleep(self.threshold_ms / 2000)
+            overdue_ms = (time.perf_counter() - self._last_beat) * 1000 - self.interval_ms
+            if overdue_ms > self.threshold_ms / 2 and self._handler is None:
+                frame = sys._current_frames().get(self._main_thread_id)
+                if frame is not None:
+                    self._handler = self._describe(frame)
+    @staticmethod
+    def _describe(frame):
+        """Summarise the app frames on a stack as 'Outer.handler > ... > Inner.call'"""
+        names = []
+        while frame is not None:
+            if frame.f_code.co_filename == __file__:
+                names.append(getattr(frame.f_code, "co_qualname", frame.f_code.co_name))
+            frame = frame.f_back
+        if not names:
+            return "Tk (layout/redraw)"
+        names.reverse()
+        return " > ".join(names if len(names) <= 4 else names[:2] + ["…"] + names[-2:])
+    def _report(self, lag_ms):
+        handler = self._handler or "unknown"
+        entry = {"time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "lag_ms": round(lag_ms), "handler": handler}
+        self.stalls.append(entry)
+        if instrumentation.enabled:
+            instrumentation.record("mainloop.stall", lag_ms / 1000)
+        print(f"⚠️ Main loop stalled {entry['lag_ms']} ms in {handler}")
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(f"{entry['time']}\t{entry['lag_ms']}ms\t{handler}\n")
+        except OSError as e:
+            print(f"Stall log error: {e}")
+class IdleMonitor:
+    """Seconds since the last keyboard or mouse input.
+
+    Queries the XScreenSaver extension on X11 or GetLastInputInfo on Windows, both system-wide and
+    a single cheap call per sample. Elsewhere (e.g. Wayland) it falls back to Tk event hooks, which
+    only see input to this window.
+    """
+    def __init__(self, root):
+        self.root = root
+        self._last_input = time.monotonic()
+        self._query = None
+        self.backend = "tk"
+        for backend, factory in (("x11", self._x11_query), ("windows", self._windows_query)):
+            try:
+                self._query = factory()
+            except (OSError, AttributeError) as e:
+                print(f"Idle detection via {backend} unavailable: {e}")
+            if self._query:
+                self.backend = backend
+                break
+        else:
+            for sequence in ("<KeyPress>", "<Motion>", "<ButtonPress>", "<MouseWheel>"):
+                root.bind_all(sequence, self._touch, add="+")
+    def _touch(self, event=None):
+        self._last_input = time.monotonic()
+    def idle_seconds(self):
+        if self._query:
+            return self._query()
+        return time.monotonic() - self._last_input
+    @staticmethod
+    def _x11_query():
+        if sys.platform.startswith("win") or not os.environ.get("DISPLAY"):
+            return None
+        xlib_path, xss_path = ctypes.util.find_library("X11"), ctypes.util.find_library("Xss")
+        if not xlib_path or not xss_path:
+            return None
+        xlib, xss = ctypes.cdll.LoadLibrary(xlib_path), ctypes.cdll.LoadLibrary(xss_path)
+        class XScreenSaverInfo(ctypes.Structure):
+            _fields_ = [("window", ctypes.c_ulong), ("state", ctypes.c_int), ("kind", ctypes.c_int),
+                        ("til_or_since", ctypes.c_ulong), ("idle", ctypes.c_ulong), ("eventMask", ctypes.c_ulong)]
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(XScreenSaverInfo)
+        xss.XScreenSaverQueryInfo.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XScreenSaverInfo)]
+        display = xlib.XOpenDisplay(None)
+        if not display:
+            return None
+        window, info = xlib.XDefaultRootWindow(display), xss.XScreenSaverAllocInfo()
+        if not xss.XScreenSaverQueryInfo(display, window, info):
+            return None
+        def query():
+            xss.XScreenSaverQueryInfo(display, window, info)
+            return info.contents.idle / 1000
+        return query
+    @staticmethod
+    def _windows_query():
+        if not sys.platform.startswith("win"):
+            return None
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+        last_input = LASTINPUTINFO(cbSize=ctypes.sizeof(LASTINPUTINFO))
+        user32, kernel32 = ctypes.windll.user32, ctypes.windll.kernel32
+        def query():
+            user32.GetLastInputInfo(ctypes.byref(last_input))
+            return ((kernel32.GetTickCount() - last_input.dwTime) & 0xFFFFFFFF) / 1000
+        return query
+class ToastManager:
+    """Non-blocking notifications: stacked in-app toasts plus optional OS notifications through plyer.
+
+    Notices arriving within COALESCE_MS of each other are grouped by title into a single toast, so a
+    burst of unlocks never stacks modal dialogs or stalls the event loop; plyer calls run on a worker thread.
+    """
+    COALESCE_MS, DURATION_MS, MAX_VISIBLE, MAX_LINES = 250, 6000, 4, 4
+    KIND_COLORS = {"info": "primary", "success": "success", "warning": "warning", "error": "error"}
+    def __init__(self, root, settings):
+        self.root = root
+        self.settings = settings
+        self._pending = []
+        self._flush_job = None
+        self._visible = []
+        self._os_queue = None
+        if NOTIFICATIONS_AVAILABLE:
+            self._os_queue = queue.Queue()
+            threading.Thread(target=self._os_worker, name="os-notifications", daemon=True).start()
+    def notify(self, title, message, kind="info", system=False):
+        """Queue a notice; ``system`` also sends it to the desktop when OS notifications are enabled"""
+        self._pending.append((title, message, kind, system))
+        if self._flush_job is None:
+            self._flush_job = self.root.after(self.COALESCE_MS, self._flush)
+    def notify_unlocks(self, newly_unlocked, level):
+        for info in newly_unlocked:
+            achievement = info["achievement"]
+            message = f"{achievement['name']}: +{info['xp_gained']} XP"
+            if achievement["badge"]:
+                message += f"  🏅 {achievement['badge']}"
+            self.notify("🎉 Achievement Unlocked!", message, "success", system=True)
+            if info["level_up"]:
+                self.notify("🌟 Level Up!", f"You are now Level {level}", "success", system=True)
+    def _flush(self):
+        self._flush_job = None
+        pending, self._pending = self._pending, []
+        groups = {}
+        for title, message, kind, system in pending:
+            group = groups.setdefault(title, {"messages": [], "kind": kind, "system": False})
+            group["messages"].append(message)
+            group["system"] = group["system"] or system
+        for title, group in groups.items():
+            messages = group["messages"]
+            text = "\n".join(messages[:self.MAX_LINES])
+            if len(messages) > self.MAX_LINES:
+                text += f"\n…and {len(messages) - self.MAX_LINES} more"
+            shown_title = title if len(messages) == 1 else f"{title} ×{len(messages)}"
+            self._show(shown_title, text, group["kind"])
+            if group["system"] and self._os_queue and self.settings.get("os_notifications", True):
+                self._os_queue.put((shown_title, text))
+    def _show(self, title, message, kind):
+        toast = tk.Toplevel(self.root)
+        toast.overrideredirect(True)
+        toast.attributes("-topmost", True)
+        accent = COLORS[self.KIND_COLORS.get(kind, "primary")]
+        frame = tk.Frame(toast, bg=COLORS['surface'], highlightbackground=accent, highlightthickness=2)
+        frame.pack(fill=tk.BOTH, expand=True)
+        tk.Label(frame, text=title, bg=COLORS['surface'], fg=accent, anchor=tk.W,
+                 font=(FONT_FAMILY, FONT_SIZES['normal'], 'bold')).pack(fill=tk.X, padx=12, pady=(8, 2))
+        tk.Label(frame, text=message, bg=COLORS['surface'], fg=COLORS['text_primary'], justify=tk.LEFT,
+                 anchor=tk.W, wraplength=320, font=(FONT_FAMILY, FONT_SIZES['small'])).pack(fill=tk.X, padx=12, pady=(0, 8))
+        for widget in (toast, frame, *frame.winfo_children()):
+            widget.bind("<Button-1>", lambda e, t=toast: self._dismiss(t))
+        self._visible.append(toast)
+        while len(self._visible) > self.MAX_VISIBLE:
+            self._dismiss(self._visible[0])
+        self.root.after(self.DURATION_MS, lambda: self._dismiss(toast))
+        self._reposition()
+    def _dismiss(self, toast):
+        if toast in self._visible:
+            self._visible.remove(toast)
+            toast.destroy()
+            self._reposition()
+    def _reposition(self):
+        """Stack toasts upwards from the bottom-right corner of the main window"""
+        right = self.root.winfo_rootx() + self.root.winfo_width() - 16
+        bottom = self.root.winfo_rooty() + self.root.winfo_height() - 16
+        for toast in reversed(self._visible):
+            toast.update_idletasks()
+            bottom -= toast.winfo_reqheight()
+            toast.geometry(f"+{right - toast.winfo_reqwidth()}+{bottom}")
+            bottom -= 8
+    def _os_worker(self):
+        while True:
+            title, message = self._os_queue.get()
+            try:
+                notification.notify(title=title, message=message[:256], app_name=APP_TITLE, timeout=5)
+            except Exception as e:
+                print(f"OS notification failed: {e}")
+class LocalApiServer:
+    """Optional localhost HTTP/JSON API with a Server-Sent Events stream, served by asyncio on its own thread.
+
+    GETs are answered from the snapshot the Tk thread publishes once a second, so polling clients never
+    touch live data or wait on the UI. Session commands go through ``bridge(action, params)``, which must
+    return a concurrent Future resolved on the Tk thread. Requests must name a loopback ``Host`` on the
+    bound port (so a DNS-rebinding page cannot reach the API), and session commands must also carry
+    the per-install token from ``API_TOKEN_FILE`` in an ``X-SessionSlice-Token`` header.
+    """
+    COMMANDS = ("start", "pause", "resume", "stop")
+    SECTIONS = ("timer", "today", "streak", "goals", "profile")
+    MAX_BODY = 64 * 1024
+    LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+    TOKEN_HEADER = "x-sessionslice-token"
+    def __init__(self, bridge, host="127.0.0.1", port=8765, token=None):
+        self.bridge = bridge
+        self.host, self.port = host, port
+        self.token = token or self.load_token()
+        self.snapshot = {}
+        self.loop = None
+        self.server = None
+        self._subscribers = set()
+    @staticmethod
+    def load_token(path=API_TOKEN_FILE):
+        """The per-install secret required on session commands, created on first use"""
+        try:
+            with open(path) as f:
+                token = f.read().strip()
+        except OSError:
+            token = ""
+        if not token:
+            token = uuid.uuid4().hex
+            write_atomic(path, token)
+        return token
+    def _host_allowed(self, host):
+        allowed = {f"{name}:{self.port}" for name in self.LOOPBACK_HOSTS}
+        if self.port == 80:
+            allowed.update(self.LOOPBACK_HOSTS)
+        return host.lower() in allowed
+    def start(self):
+        """Start serving; returns the bound port, or None if the port could not be bound"""
+        ready = threading.Event()
+        threading.Thread(target=self._run, args=(ready,), name="local-api", daemon=True).start()
+        ready.wait(5)
+        return self.port if self.server else None
+    def _run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, backlog=512))
+        except OSError as e:
+            print(f"Local API could not listen on {self.host}:{self.port}: {e}")
+            ready.set()
+            return
+        self.port = self.server.sockets[0].getsockname()[1]
+        ready.set()
+        self.loop.run_forever()
+    def stop(self):
+        if self.loop and self.server:
+            self.loop.call_soon_threadsafe(self.server.close)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+    def publish(self, snapshot):
+        """Tk thread: swap in a new read snapshot and push it to SSE subscribers"""
+        self.snapshot = snapshot
+        if self.loop and self._subscribers:
+            self.loop.call_soon_threadsafe(self._broadcast, snapshot)
+    def _broadcast(self, snapshot):
+        for subscriber in self._subscribers:
+            if subscriber.full():
+                subscriber.get_nowait()  # slow client: drop its oldest tick rather than buffer
+            subscriber.put_nowait(snapshot)
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, target, _ = (await asyncio.wait_for(reader.readline(), 10)).decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), 10)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                if length < 0:
+                    raise ValueError(f"negative Content-Length {length}")
+            except ValueError:
+                self._respond(writer, 400, {"error": "Malformed request"})
+                await writer.drain()
+                return
+            if not self._host_allowed(headers.get("host", "")):
+                self._respond(writer, 403, {"error": "Host not allowed"})
+                await writer.drain()
+                return
+            if length > self.MAX_BODY:
+                self._respond(writer, 413, {"error": "Request body too large"})
+                await writer.drain()
+                return
+            body = await asyncio.wait_for(reader.readexactly(length), 10) if length else b""
+            path = target.split("?", 1)[0].rstrip("/") or "/"
+            if method == "GET" and path == "/events":
+                await self._stream(writer)
+                return
+            status, payload = await self._route(method, path, headers, body)
+            self._respond(writer, status, payload)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    async def _route(self, method, path, headers, body):
+        if method == "GET":
+            if path in ("/", "/state"):
+                return 200, self.snapshot
+            if path == "/metrics":
+                return 200, metrics_registry.render()
+            if path.strip("/") in self.SECTIONS:
+                return 200, self.snapshot.get(path.strip("/"))
+            return 404, {"error": f"No such endpoint: {path}"}
+        if method == "POST" and path.startswith("/session/"):
+            action = path.rsplit("/", 1)[1]
+            if action not in self.COMMANDS:
+                return 404, {"error": f"Unknown session command: {action}"}
+            if not hmac.compare_digest(headers.get(self.TOKEN_HEADER, "").encode("latin-1"), self.token.encode("latin-1")):
+                return 401, {"error": f"Missing or wrong X-SessionSlice-Token header (see {API_TOKEN_FILE})"}
+            if not headers.get("content-type", "").startswith("application/json"):
+                return 415, {"error": "Content-Type must be application/json"}  # also blocks browser form posts
+            try:
+                params = json.loads(body or b"{}")
+            except ValueError:
+                return 400, {"error": "Body is not valid JSON"}
+            if not isinstance(params, dict):
+                return 400, {"error": "Body must be a JSON object"}
+            try:
+                ok, message = await asyncio.wait_for(asyncio.wrap_future(self.bridge(action, params)), 5)
+            except asyncio.TimeoutError:
+                return 504, {"error": "The application did not respond in time"}
+            return (200 if ok else 409), {"ok": ok, "message": message}
+        return 405, {"error": f"{method} not allowed on {path}"}
+    @staticmethod
+    def _respond(writer, status, payload):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), MetricsRegistry.CONTENT_TYPE
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        reason = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+                  405: "Method Not Allowed", 409: "Conflict",
+                  413: "Payload Too Large", 415: "Unsupported Media Type", 504: "Gateway Timeout"}.get(status, "")
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                     f"Cache-Control: no-store\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+    async def _stream(self, writer):
+        """Server-Sent Events: one ``tick`` event with the timer state per published snapshot"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-store\r\n"
+                     b"Connection: keep-alive\r\n\r\n")
+        subscriber = asyncio.Queue(maxsize=4)
+        subscriber.put_nowait(self.snapshot)
+        self._subscribers.add(subscriber)
+        try:
+            while True:
+                snapshot = await subscriber.get()
+                writer.write(f"event: tick\ndata: {json.dumps(snapshot.get('timer'))}\n\n".encode("utf-8"))
+                await writer.drain()
+        finally:
+            self._subscribers.discard(subscriber)
 class ThemedDialog(tk.Toplevel):
     """Base class for themed dialog windows that automatically apply and respond to theme changes"""
     def __init__(self, parent, *args, **kwargs):
@@ -183,7 +860,9 @@ class ThemedDialog(tk.Toplevel):
         super().destroy()
 class SessionSliceData:
     def __init__(self):
-        self.sessions = load_json(SESSION_FILE, [])
+        self._sessions_stamp = file_stamp(SESSION_FILE)
+        self.archive = SessionArchive()
+        self.sessions = self.archive.drop_archived(load_json(SESSION_FILE, []))
         self.tasks = load_json(TASKS_FILE, [{"name": "Sample Task", "color": DEFAULT_TASK_COLOR, "project": "General"}])
         self.session_types = load_json(SESSION_TYPES_FILE, [
             {"name": "Focus", "icon": "🔥", "color": DEFAULT_TASK_COLOR, "hours": 0, "minutes": 25},
@@ -207,7 +886,533 @@ class SessionSliceData:
         }
         self.user_profile = load_json(USER_PROFILE_FILE, default_profile)
         self.achievements = load_json(ACHIEVEMENTS_FILE, self._create_default_achievements())
+        self.app_settings = {**DEFAULT_APP_SETTINGS, **load_json(APP_SETTINGS_FILE, {})}
+        self._achievement_rewards = {a["id"]: a["xp_reward"] for a in self.achievements}
+        self.xp_ledger = XpLedger(self._xp_value, self._xp_rules())
+        if not self.xp_ledger.entries and self.user_profile.get("total_xp", 0) > 0:
+            self.xp_ledger.migrate_legacy(self.user_profile["total_xp"])
+        self._sync_profile_xp()
+        self.notifications = []
+        self.session_callbacks = []
+        command_log = load_json(COMMAND_LOG_FILE, {})
+        self.undo_log, self.redo_log = command_log.get("undo", []), command_log.get("redo", [])
+        self._command_log_changed = False
+        self._dirty = set()
+        self.sync_dirty = set()
+        self.data_version = 0
+        self.tasks_version = 0
+        self._metrics, self._metrics_key = None, None
+        self.session_events = SessionEventLog()
+        self.search_index = SessionSearchIndex(self)
+        self.add_session_callback(self.search_index.add)
+        self.heatmap = FocusHeatmap(self)
+        self.add_session_callback(self.heatmap.add)
+        self._assign_ids()
+        self._rebuild_indexes()
+        if self._prune_command_log():
+            self._save_command_log()
         self._update_user_stats()
+        self.rollups = RollupStore(self)
+        self.add_session_callback(self.rollups.add)
+        self._seed_metrics()
+        self.add_session_callback(self._count_session_metrics)
+        self.sync = SyncManager(self)
+    def _assign_ids(self):
+        """Give legacy tasks, session types and sessions stable ids and link sessions to them"""
+        for task in self.tasks:
+            task.setdefault("id", stable_id("task", task["name"]))
+        for st in self.session_types:
+            st.setdefault("id", stable_id("type", st.get("name", "")))
+        self._reindex_tasks()
+        self._reindex_session_types()
+        assign_session_ids(self.sessions)
+        for s in self.sessions:
+            self._link_session(s)
+    def _link_session(self, session):
+        """Fill in task_id/type_id from the denormalised name and label if they are missing"""
+        if "task_id" not in session:
+            task = self.task_by_name.get(session.get("name"))
+            if task:
+                session["task_id"] = task["id"]
+        if "type_id" not in session:
+            st = self.type_by_label.get(session.get("session_type"))
+            if st:
+                session["type_id"] = st["id"]
+    def _reindex_tasks(self):
+        self.task_by_id = {t["id"]: t for t in self.tasks}
+        self.task_by_name = {t["name"]: t for t in self.tasks}
+        self.tasks_version += 1
+    def _reindex_session_types(self):
+        self.type_by_id = {st["id"]: st for st in self.session_types}
+        self.type_by_label = {self.type_label(st): st for st in self.session_types}
+    def _rebuild_indexes(self):
+        """Rebuild the id maps, task/type→sessions indexes and per-date minute totals"""
+        self.session_by_id = {}
+        self.sessions_by_task = defaultdict(dict)
+        self.sessions_by_type = defaultdict(dict)
+        self.sessions_by_date = defaultdict(list)
+        self._minutes_by_date = self.archive.minutes_by_date()
+        for s in self.sessions:
+            self._index_session(s)
+    def _index_session(self, session):
+        self.session_by_id[session["id"]] = session
+        self.sessions_by_task[session.get("task_id")][session["id"]] = session
+        self.sessions_by_type[session.get("type_id")][session["id"]] = session
+        self.sessions_by_date[session["date"]].append(session)
+        self._minutes_by_date[session["date"]] += session.get("duration", 0)
+    @staticmethod
+    def type_label(session_type):
+        return f"{session_type.get('icon', '')} {session_type.get('name', '')}"
+    def session_task_name(self, session):
+        """Current name of the session's task, following renames through task_id"""
+        task = self.task_by_id.get(session.get("task_id"))
+        return task["name"] if task else session.get("name", "")
+    def session_type_label(self, session):
+        """Current label of the session's type, following renames through type_id"""
+        st = self.type_by_id.get(session.get("type_id"))
+        return self.type_label(st) if st else session.get("session_type", "Unknown")
+    def add_task(self, name, project="", color=DEFAULT_TASK_COLOR, task_id=None):
+        task = {"id": task_id or new_id(), "name": name, "project": project, "color": color}
+        self.tasks.append(task)
+        self.task_by_id[task["id"]] = task
+        self.task_by_name[name] = task
+        self.tasks_version += 1
+        self.search_index.invalidate()
+        return task
+    def update_task(self, task_id, **fields):
+        """Update a task in place; sessions follow renames through task_id"""
+        task = self.task_by_id[task_id]
+        if "name" in fields and fields["name"] != task["name"]:
+            self.task_by_name.pop(task["name"], None)
+            self.task_by_name[fields["name"]] = task
+        task.update(fields)
+        self.tasks_version += 1
+        self.search_index.invalidate()
+        return task
+    def _insert_task(self, task, position):
+        self.tasks.insert(position, task)
+        self.task_by_id[task["id"]] = task
+        self.task_by_name[task["name"]] = task
+        self.tasks_version += 1
+        self.search_index.invalidate()
+    def _task_position(self, task):
+        """Index of ``task`` in the catalog, checking the end first since imports and their undo work there"""
+        if self.tasks and self.tasks[-1] is task:
+            return len(self.tasks) - 1
+        return self.tasks.index(task)
+    def delete_task(self, task_id):
+        task = self.task_by_id.pop(task_id, None)
+        if task:
+            del self.tasks[self._task_position(task)]
+            self.task_by_name.pop(task["name"], None)
+            self.tasks_version += 1
+            self.search_index.invalidate()
+        return task
+    def project_names(self):
+        return sorted({t.get("project") or "General" for t in self.tasks})
+    TASK_COLOR_RE = re.compile(r"#[0-9a-fA-F]{6}")
+    def tasks_from_csv(self, filepath):
+        """Read name,project,color rows (header optional) into new task records; returns (tasks, skipped rows).
+
+        Blank names and names already in the catalog or earlier in the file are skipped, and invalid
+        colours fall back to the default, so the result can be inserted as a single batch.
+        """
+        tasks, seen, skipped = [], set(self.task_by_name), 0
+        with open(filepath, newline="", encoding="utf-8-sig") as f:
+            for i, row in enumerate(csv.reader(f)):
+                name, project, color = ([cell.strip() for cell in row] + ["", "", ""])[:3]
+                if i == 0 and name.lower() == "name":
+                    continue
+                if not name or name in seen:
+                    skipped += 1
+                    continue
+                seen.add(name)
+                tasks.append({"id": new_id(), "name": name, "project": project,
+                              "color": color if self.TASK_COLOR_RE.fullmatch(color) else DEFAULT_TASK_COLOR})
+        return tasks, skipped
+    UNDO_LIMIT = 50
+    OPERATION_DIRTY = {"rename_task": {"tasks"}, "update_task": {"tasks"}, "reassign_sessions": set(), "restore_session_tasks": set(),
+                       "merge_tasks": {"tasks"}, "restore_task": {"tasks"}, "insert_task": {"tasks"}, "delete_task": {"tasks"},
+                       "update_type": {"session_types"}, "merge_types": {"session_types"}, "restore_type": {"session_types"},
+                       "insert_type": {"session_types"}, "delete_type": {"session_types"},
+                       "insert_goal": {"goals"}, "delete_goal": {"goals"}}
+    DIRTY_FILES = {"tasks": TASKS_FILE, "session_types": SESSION_TYPES_FILE, "goals": GOALS_FILE}
+    def apply_batch(self, operations, label="", undoable=True):
+        """Apply task/type/goal mutations as one undoable command with one save.
+
+        Operations are tuples: ("rename_task", task_id, name), ("update_task", task_id, fields),
+        ("merge_tasks", source_id, target_id), ("reassign_sessions", session_ids, task_id),
+        ("update_type", type_id, fields), ("merge_types", source_id, target_id),
+        ("insert_task"/"insert_type"/"insert_goal", record, position) and
+        ("delete_task"/"delete_type"/"delete_goal", id). Sessions are found through the
+        task/type→sessions indexes, so cost scales with the sessions touched. If any operation
+        fails, the ones already applied are rolled back. The undo log keeps only the inverse
+        operations, which reference the removed records rather than copies of the lists.
+        """
+        inverse = self._execute(operations)
+        if undoable:
+            self.undo_log.append({"label": label or f"{len(operations)} change(s)", "ops": inverse})
+            del self.undo_log[:-self.UNDO_LIMIT]
+            self.redo_log.clear()
+            self._command_log_changed = True
+        self.save_dirty()
+        return inverse
+    def _execute(self, operations):
+        """Apply operations and return the operations that revert them, in the order to apply them"""
+        inverse = []
+        try:
+            for op in operations:
+                inverse.extend(self._apply_operation(op))
+                self._dirty |= self.OPERATION_DIRTY[op[0]]
+        except Exception:
+            for op in reversed(inverse):
+                self._apply_operation(op)
+            raise
+        self.search_index.invalidate()
+        self.mark_changed()
+        return inverse[::-1]
+    def undo(self):
+        """Revert the most recent command; returns its label, or None if there is nothing to undo"""
+        return self._replay(self.undo_log, self.redo_log)
+    def redo(self):
+        """Re-apply the most recently undone command; returns its label, or None if there is nothing to redo"""
+        return self._replay(self.redo_log, self.undo_log)
+    def _replay(self, source, target):
+        if not source:
+            return None
+        entry = source.pop()
+        self._command_log_changed = True
+        try:
+            ops = self._execute(entry["ops"])
+        except Exception:
+            self._save_command_log()  # a command that no longer applies is dropped, not retried forever
+            raise
+        target.append({"label": entry["label"], "ops": ops})
+        self.save_dirty()
+        return entry["label"]
+    def save_dirty(self):
+        """Persist only the collections commands touched, plus the command log; session edits need the full save"""
+        if "sessions" in self._dirty:
+            self.save_all()
+            return
+        for name in sorted(self._dirty):
+            save_json(self.DIRTY_FILES[name], getattr(self, name))
+        self._dirty.clear()
+        self._save_command_log()
+        self._push_sync()
+    def _save_command_log(self):
+        """Rewrite the compact command log, but only after a command, undo, redo or prune changed it"""
+        if self._command_log_changed:
+            write_atomic(COMMAND_LOG_FILE, json.dumps({"undo": self.undo_log, "redo": self.redo_log}, separators=(",", ":")))
+            self._command_log_changed = False
+    def _move_sessions(self, session_ids, task_id=None, type_id=None):
+        """Point sessions at another task or type, rewriting their denormalised name/label"""
+        self.sync_dirty.update(session_ids)
+        if session_ids:
+            self._dirty.add("sessions")
+        for sid in session_ids:
+            session = self.session_by_id[sid]
+            self.rollups.add(session, -1)
+            if task_id is not None:
+                self.sessions_by_task[session.get("task_id")].pop(sid, None)
+                session["task_id"] = task_id
+                session["name"] = self.task_by_id[task_id]["name"]
+                self.sessions_by_task[task_id][sid] = session
+            if type_id is not None:
+                self.sessions_by_type[session.get("type_id")].pop(sid, None)
+                session["type_id"] = type_id
+                session["session_type"] = self.type_label(self.type_by_id[type_id])
+                self.sessions_by_type[type_id][sid] = session
+            self.rollups.add(session)
+    SESSION_ID_ARGS = {"reassign_sessions": 1, "restore_task": 3, "restore_type": 3}
+    def _hot_session_ids(self, session_ids):
+        """The ids still in the hot set; archived or deleted sessions are left where they are"""
+        return [sid for sid in session_ids if sid in self.session_by_id]
+    def _session_tasks(self, session_ids):
+        """(id, task_id, stored name) per session, so a reassignment can be undone exactly, even from a deleted task"""
+        return [(sid, self.session_by_id[sid].get("task_id"), self.session_by_id[sid].get("name", "")) for sid in session_ids]
+    def _prune_command_log(self):
+        """Drop session ids that left the hot set from logged commands; returns whether anything changed"""
+        changed = False
+        for entry in self.undo_log + self.redo_log:
+            for i, op in enumerate(entry["ops"]):
+                if op[0] == "restore_session_tasks":
+                    live = [item for item in op[1] if item[0] in self.session_by_id]
+                    if len(live) != len(op[1]):
+                        entry["ops"][i] = [op[0], live]
+                        changed = True
+                    continue
+                arg = self.SESSION_ID_ARGS.get(op[0])
+                if arg is not None:
+                    live = self._hot_session_ids(op[arg])
+                    if len(live) != len(op[arg]):
+                        entry["ops"][i] = [*op[:arg], live, *op[arg + 1:]]
+                        changed = True
+        self._command_log_changed |= changed
+        return changed
+    def _apply_operation(self, op):
+        """Apply one batch operation and return the operations that undo it.
+
+        Every operation checks its preconditions before mutating anything, so one that raises
+        leaves the data untouched and ``_execute`` only has to revert the operations before it.
+        """
+        kind = op[0]
+        if kind == "rename_task":
+            _, task_id, name = op
+            return self._apply_operation(("update_task", task_id, {"name": name}))
+        if kind == "update_task":
+            _, task_id, fields = op
+            task = self.task_by_id[task_id]
+            if "name" in fields and fields["name"] != task["name"] and fields["name"] in self.task_by_name:
+                raise ValueError(f"Task '{fields['name']}' already exists")
+            old = {k: task.get(k) for k in fields}
+            self.update_task(task_id, **fields)
+            if "name" in fields and self.sessions_by_task.get(task_id):
+                self._dirty.add("sessions")
+                for session in self.sessions_by_task[task_id].values():
+                    session["name"] = task["name"]
+            return [("update_task", task_id, old)]
+        if kind == "reassign_sessions":
+            _, session_ids, task_id = op
+            if task_id not in self.task_by_id:
+                raise KeyError(f"Unknown task id {task_id}")
+            session_ids = self._hot_session_ids(session_ids)
+            previous = self._session_tasks(session_ids)
+            self._move_sessions(session_ids, task_id=task_id)
+            return [("restore_session_tasks", previous)]
+        if kind == "restore_session_tasks":
+            _, previous = op
+            previous = [item for item in previous if item[0] in self.session_by_id]
+            current = self._session_tasks([sid for sid, _, _ in previous])
+            self.sync_dirty.update(sid for sid, _, _ in previous)
+            if previous:
+                self._dirty.add("sessions")
+            for sid, task_id, name in previous:
+                session = self.session_by_id[sid]
+                self.rollups.add(session, -1)
+                self.sessions_by_task[session.get("task_id")].pop(sid, None)
+                if task_id is None:
+                    session.pop("task_id", None)
+                else:
+                    session["task_id"] = task_id
+                session["name"] = name
+                self.sessions_by_task[task_id][sid] = session
+                self.rollups.add(session)
+            return [("restore_session_tasks", current)]
+        if kind == "merge_tasks":
+            _, source_id, target_id = op
+            if source_id == target_id or target_id not in self.task_by_id:
+                raise ValueError("Merge target must be a different existing task")
+            session_ids = list(self.sessions_by_task.get(source_id, {}))
+            position = self._task_position(self.task_by_id[source_id])
+            self._move_sessions(session_ids, task_id=target_id)
+            task = self.delete_task(source_id)
+            self.archive.alias("task", source_id, target_id)
+            return [("restore_task", task, position, session_ids, target_id)]
+        if kind == "restore_task":
+            _, task, position, session_ids, target_id = op
+            if task["id"] in self.task_by_id or task["name"] in self.task_by_name:
+                raise ValueError(f"Task '{task['name']}' already exists")
+            session_ids = self._hot_session_ids(session_ids)
+            self._insert_task(task, position)
+            self.archive.alias("task", task["id"])
+            self._move_sessions(session_ids, task_id=task["id"])
+            return [("merge_tasks", task["id"], target_id)]
+        if kind == "insert_task":
+            _, task, position = op
+            if task["name"] in self.task_by_name:
+                raise ValueError(f"Task '{task['name']}' already exists")
+            self._insert_task(task, position)
+            return [("delete_task", task["id"])]
+        if kind == "delete_task":
+            _, task_id = op
+            if task_id not in self.task_by_id:
+                raise KeyError(f"Unknown task id {task_id}")
+            position = self._task_position(self.task_by_id[task_id])
+            return [("insert_task", self.delete_task(task_id), position)]
+        if kind == "update_type":
+            _, type_id, fields = op
+            st = self.type_by_id[type_id]
+            old = {k: st.get(k) for k in fields}
+            self.update_session_type(type_id, **fields)
+            label = self.type_label(st)
+            if self.sessions_by_type.get(type_id):
+                self._dirty.add("sessions")
+            for session in self.sessions_by_type.get(type_id, {}).values():
+                session["session_type"] = label
+            return [("update_type", type_id, old)]
+        if kind == "merge_types":
+            _, source_id, target_id = op
+            if source_id == target_id or target_id not in self.type_by_id:
+                raise ValueError("Merge target must be a different existing session type")
+            session_ids = list(self.sessions_by_type.get(source_id, {}))
+            st = self.type_by_id[source_id]
+            position = self.session_types.index(st)
+            self._move_sessions(session_ids, type_id=target_id)
+            self.delete_session_type(source_id)
+            self.archive.alias("type", source_id, target_id)
+            return [("restore_type", st, position, session_ids, target_id)]
+        if kind == "restore_type":
+            _, st, position, session_ids, target_id = op
+            if st["id"] in self.type_by_id:
+                raise ValueError(f"Session type '{st.get('name', '')}' already exists")
+            session_ids = self._hot_session_ids(session_ids)
+            self.session_types.insert(position, st)
+            self._reindex_session_types()
+            self.archive.alias("type", st["id"])
+            self._move_sessions(session_ids, type_id=st["id"])
+            return [("merge_types", st["id"], target_id)]
+        if kind == "insert_type":
+            _, st, position = op
+            self.session_types.insert(position, st)
+            self._reindex_session_types()
+            return [("delete_type", st["id"])]
+        if kind == "delete_type":
+            _, type_id = op
+            if type_id not in self.type_by_id:
+                raise KeyError(f"Unknown session type id {type_id}")
+            position = self.session_types.index(self.type_by_id[type_id])
+            return [("insert_type", self.delete_session_type(type_id), position)]
+        if kind == "insert_goal":
+            _, goal, position = op
+            self.goals.insert(position, goal)
+            return [("delete_goal", goal["id"])]
+        if kind == "delete_goal":
+            _, goal_id = op
+            position = next((i for i, g in enumerate(self.goals) if g.get("id") == goal_id), None)
+            if position is None:
+                raise KeyError(f"Unknown goal id {goal_id}")
+            return [("insert_goal", self.goals.pop(position), position)]
+        raise ValueError(f"Unknown batch operation {kind!r}")
+    def add_session_type(self, icon, name, color, hours, minutes):
+        st = {"id": new_id(), "icon": icon, "name": name, "color": color, "hours": hours, "minutes": minutes}
+        self.session_types.append(st)
+        self._reindex_session_types()
+        return st
+    def update_session_type(self, type_id, **fields):
+        st = self.type_by_id[type_id]
+        st.update(fields)
+        self._reindex_session_types()
+        self.search_index.invalidate()
+        return st
+    def delete_session_type(self, type_id):
+        st = self.type_by_id.get(type_id)
+        if st:
+            self.session_types.remove(st)
+            self._reindex_session_types()
+        return st
+    def add_session_callback(self, callback):
+        self.session_callbacks.append(callback)
+    def sessions_between(self, start_date, end_date):
+        """Sessions in an inclusive YYYY-MM-DD range; archived segments are opened only if the range reaches them"""
+        day, last = date.fromisoformat(start_date), date.fromisoformat(end_date)
+        hot = []
+        while day <= last:
+            hot.extend(self.sessions_by_date.get(day.isoformat(), ()))
+            day += timedelta(days=1)
+        return self.archive.sessions_between(start_date, end_date) + hot
+    def archive_old_sessions(self, today=None):
+        """Move sessions of whole years older than the ``archive_after_days`` horizon into cold segments"""
+        days = self.app_settings["archive_after_days"]
+        if not days:
+            return 0
+        boundary = f"{((today or date.today()) - timedelta(days=days)).year}-01-01"
+        by_year = defaultdict(list)
+        for s in self.sessions:
+            if s["date"] < boundary:
+                by_year[s["date"][:4]].append(s)
+        if not by_year:
+            return 0
+        if self.sync.folder:
+            try:
+                self.sync.push()  # other devices must see these sessions before they leave the hot set
+            except OSError as e:
+                print(f"Archive skipped, sync failed: {e}")
+                return 0
+        self.archive.write(by_year)
+        archived = {s["id"] for sessions in by_year.values() for s in sessions}
+        exported = self.sessions[:self.sync.state["exported_upto"]]
+        self.sync.state["exported_upto"] = sum(1 for s in exported if s["id"] not in archived)
+        self.sync.save_state()
+        self.sessions = [s for s in self.sessions if s["id"] not in archived]
+        self.sync_dirty -= archived
+        self._rebuild_indexes()
+        self._prune_command_log()
+        self.search_index.invalidate()
+        self.heatmap.invalidate()
+        self.mark_changed()
+        self.save_all()
+        return len(archived)
+    def current_streak(self):
+        return streak_from_dates(self._minutes_by_date)
+    def minutes_between(self, start_date_str, end_date_str):
+        """Sum recorded minutes for an inclusive YYYY-MM-DD date range"""
+        day = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+        total = 0
+        while day <= end:
+            total += self._minutes_by_date.get(day.strftime("%Y-%m-%d"), 0)
+            day += timedelta(days=1)
+        return total
+    def record_session(self, session):
+        """Append a finished session and update stats, goals and achievements in one pass"""
+        session.setdefault("id", new_id())
+        self._link_session(session)
+        self.sessions.append(session)
+        self._index_session(session)
+        self.mark_changed()
+        stats = self.user_profile["stats"]
+        stats["total_sessions"] = stats.get("total_sessions", 0) + 1
+        stats["total_minutes"] = stats.get("total_minutes", 0) + session.get("duration", 0)
+        stats["longest_streak"] = self.current_streak()
+        if session.get("interruptions", 0) == 0:
+            stats["perfect_sessions"] = stats.get("perfect_sessions", 0) + 1
+        self.update_goal_progress()
+        newly_unlocked = self.check_and_unlock_achievements()
+        for callback in self.session_callbacks:
+            callback(session)
+        return newly_unlocked
+    def update_goal_progress(self):
+        """Update progress for all open goals and queue a notification for each completed one"""
+        now = datetime.now()
+        today = now.strftime("%Y-%m-%d")
+        week_start = (now - timedelta(days=now.weekday())).strftime("%Y-%m-%d")
+        completed = []
+        for goal in self.goals:
+            if goal["completed"]:
+                continue
+            if goal["type"] == "daily":
+                goal["current"] = int(self._minutes_by_date.get(today, 0))
+            elif goal["type"] == "weekly":
+                goal["current"] = int(self.minutes_between(week_start, today))
+            elif goal["type"] == "streak":
+                goal["current"] = self.metrics()["streak"]
+            if goal["current"] >= goal["target"]:
+                goal["completed"] = True
+                goal["completed_date"] = today
+                completed.append(goal)
+                self.mark_changed()
+                self.add_xp(XP_RULES["goal"], f"Goal: {goal['name']}", "goal", goal.get("id"))
+                self.notifications.append({"title": "🎉 Goal Achieved!",
+                                           "message": f"Congratulations! You've completed: {goal['name']} (+{XP_RULES['goal']} XP)"})
+        return completed
+    def mark_changed(self):
+        """Bump the data version after sessions or goals change, invalidating derived snapshots"""
+        self.data_version += 1
+    def metrics(self):
+        """Current value of every achievement category, computed once per data version (and day, for the streak)"""
+        key = (self.data_version, date.today())
+        if self._metrics_key != key:
+            stats = self.user_profile["stats"]
+            self._metrics = {"sessions": stats["total_sessions"], "time": stats["total_minutes"],
+                             "streak": self.current_streak(), "quality": stats["perfect_sessions"],
+                             "goals": sum(1 for g in self.goals if g.get("completed", False))}
+            self._metrics_key = key
+        return self._metrics
+    def drain_notifications(self):
+        """Return and clear the queued UI notifications"""
+        pending, self.notifications = self.notifications, []
+        return pending
     def _create_default_achievements(self):
         """Create the default achievement definitions"""
         base = {"unlocked": False, "unlock_date": None}
@@ -227,13 +1432,14 @@ class SessionSliceData:
         ]
     def _update_user_stats(self):
         """Update user statistics based on current session data"""
-        if not self.sessions:
+        archived = self.archive.totals()
+        if not self.sessions and not archived["sessions"]:
             return
         stats = self.user_profile["stats"]
-        stats["total_sessions"] = len(self.sessions)
-        stats["total_minutes"] = sum(s.get("duration", 0) for s in self.sessions)
-        stats["longest_streak"] = calculate_streak(self.sessions)
-        stats["perfect_sessions"] = sum(1 for s in self.sessions if s.get("interruptions", 0) == 0)
+        stats["total_sessions"] = len(self.sessions) + archived["sessions"]
+        stats["total_minutes"] = sum(s.get("duration", 0) for s in self.sessions) + archived["minutes"]
+        stats["longest_streak"] = self.current_streak()
+        stats["perfect_sessions"] = sum(1 for s in self.sessions if s.get("interruptions", 0) == 0) + archived["perfect"]
     def calculate_level_from_xp(self, xp):
         """Calculate user level based on total XP (100 XP per level)"""
         return max(1, xp // 100 + 1)
@@ -243,35 +1449,32 @@ class SessionSliceData:
         xp_for_current_level = (current_level - 1) * 100
         xp_for_next_level = current_level * 100
         return xp_for_next_level - self.user_profile["total_xp"]
-    def add_xp(self, amount, reason=""):
-        """Add XP to user profile and check for level up"""
+    def add_xp(self, amount, reason="", source="session", ref=None):
+        """Record an XP award in the ledger and check for level up"""
         old_level = self.user_profile["level"]
-        self.user_profile["xp"] += amount
-        self.user_profile["total_xp"] += amount
-        new_level = self.calculate_level_from_xp(self.user_profile["total_xp"])
-        level_up = False
-        if new_level > old_level:
-            self.user_profile["level"] = new_level
-            level_up = True
-        return level_up, amount, reason
+        self.xp_ledger.award(source, ref, amount, reason)
+        self._sync_profile_xp()
+        return self.user_profile["level"] > old_level, amount, reason
+    def _xp_rules(self):
+        return stable_id("xp", json.dumps(XP_RULES, sort_keys=True), *sorted(self._achievement_rewards.items()))
+    def _xp_value(self, entry):
+        """Price a ledger entry under the current rules; legacy balances keep their recorded amount"""
+        if entry["src"] == "achievement":
+            return self._achievement_rewards.get(entry["ref"], entry["xp"])
+        return XP_RULES.get(entry["src"], entry["xp"])
+    def _sync_profile_xp(self):
+        """Mirror the ledger total into the profile fields the UI and API read"""
+        total = self.xp_ledger.current_total()
+        self.user_profile["xp"] = self.user_profile["total_xp"] = total
+        self.user_profile["level"] = self.calculate_level_from_xp(total)
     def check_and_unlock_achievements(self):
         """Check all achievements and unlock any that meet requirements"""
         newly_unlocked = []
+        metrics = self.metrics()
         for achievement in self.achievements:
             if achievement["unlocked"]:
                 continue                
-            current_value = 0
-            category = achievement["category"]  
-            if category == "sessions":
-                current_value = self.user_profile["stats"]["total_sessions"]
-            elif category == "time":
-                current_value = self.user_profile["stats"]["total_minutes"]
-            elif category == "streak":
-                current_value = calculate_streak(self.sessions)
-            elif category == "quality":
-                current_value = self.user_profile["stats"]["perfect_sessions"]
-            elif category == "goals":
-                current_value = len([g for g in self.goals if g.get("completed", False)])     
+            current_value = metrics.get(achievement["category"], 0)
             if current_value >= achievement["requirement"]:
                 achievement["unlocked"] = True
                 achievement["unlock_date"] = datetime.now().strftime("%Y-%m-%d")
@@ -282,8 +1485,8 @@ class SessionSliceData:
                 if achievement["id"] not in self.user_profile["achievements_unlocked"]:
                     self.user_profile["achievements_unlocked"].append(achievement["id"])
                 
-                level_up, xp_gained, _ = self.add_xp(achievement["xp_reward"], 
-                                                   f"Achievement: {achievement['name']}")
+                level_up, xp_gained, _ = self.add_xp(achievement["xp_reward"], f"Achievement: {achievement['name']}",
+                                                     "achievement", achievement["id"])
                 
                 newly_unlocked.append({
                     "achievement": achievement,
@@ -291,14 +1494,1090 @@ class SessionSliceData:
                     "level_up": level_up
                 })
         return newly_unlocked
+    def _merge_external_sessions(self):
+        """Absorb sessions another process appended to the sessions file since we last read or wrote it"""
+        stamp = file_stamp(SESSION_FILE)
+        if stamp == self._sessions_stamp:
+            return stamp
+        self.absorb_sessions([s for s in assign_session_ids(load_json(SESSION_FILE, []))
+                              if s["id"] not in self.session_by_id and not self.archive.contains(s)])
+        self._sessions_stamp = stamp
+        return stamp
+    def absorb_sessions(self, sessions):
+        """Add sessions recorded elsewhere (another process or device) without goal/achievement side effects"""
+        for session in sessions:
+            self._link_session(session)
+            self.sessions.append(session)
+            self._index_session(session)
+            for callback in self.session_callbacks:
+                callback(session)
+        if sessions:
+            self._update_user_stats()
+            self.mark_changed()
+    def _seed_metrics(self):
+        """Load the exported counters once from stats and rollups; sessions then update them incrementally"""
+        stats, registry = self.user_profile["stats"], metrics_registry
+        registry.set("sessionslice_sessions", stats["total_sessions"])
+        registry.set("sessionslice_focus_minutes", round(stats["total_minutes"], 1))
+        registry.set("sessionslice_perfect_sessions", stats["perfect_sessions"])
+        task_minutes, interruptions, breaks = defaultdict(float), 0, 0
+        for _, row in self.rollups.rows("year"):
+            interruptions += row["interruptions"]
+            breaks += row["breaks"]
+            for task_key, minutes in row["by_task"].items():
+                task_minutes[self.rollups.task_name(task_key)] += minutes
+        registry.set("sessionslice_interruptions", interruptions)
+        registry.set("sessionslice_breaks", breaks)
+        for task, minutes in task_minutes.items():
+            registry.set("sessionslice_task_minutes", round(minutes, 1), task=task)
+        self._update_metric_gauges()
+    def _count_session_metrics(self, session):
+        registry, duration = metrics_registry, session.get("duration", 0)
+        registry.inc("sessionslice_sessions")
+        registry.inc("sessionslice_focus_minutes", duration)
+        registry.inc("sessionslice_perfect_sessions", int(session.get("interruptions", 0) == 0))
+        registry.inc("sessionslice_interruptions", session.get("interruptions", 0))
+        registry.inc("sessionslice_breaks", session.get("breaks", 0))
+        registry.inc("sessionslice_task_minutes", duration, task=self.session_task_name(session))
+        self._update_metric_gauges()
+    def _update_metric_gauges(self):
+        metrics = self.metrics()
+        metrics_registry.set("sessionslice_streak_days", metrics["streak"])
+        metrics_registry.set("sessionslice_goals_completed", metrics["goals"])
+        metrics_registry.set("sessionslice_level", self.user_profile["level"])
+        metrics_registry.set("sessionslice_xp", self.user_profile["total_xp"])
+    @instrumentation.instrumented()
+    @metrics_registry.timed("sessionslice_save_duration_seconds")
     def save_all(self):
-        save_json(SESSION_FILE, self.sessions)
+        """Persist everything; sessions use optimistic concurrency so parallel writers never lose data.
+
+        The sessions file is serialised outside the lock and only swapped in if nobody wrote it in
+        the meantime; otherwise the other writer's sessions are merged by identity and we retry.
+        """
+        for attempt in range(3):
+            expected = self._merge_external_sessions()
+            payload = json.dumps(self.sessions, indent=2)
+            with DataDirLock():
+                if file_stamp(SESSION_FILE) == expected:
+                    write_atomic(SESSION_FILE, payload)
+                    self._sessions_stamp = file_stamp(SESSION_FILE)
+                    break
+        else:
+            with DataDirLock():
+                self._merge_external_sessions()
+                save_json(SESSION_FILE, self.sessions)
+                self._sessions_stamp = file_stamp(SESSION_FILE)
+        self.rollups.save()
         save_json(TASKS_FILE, self.tasks)
         save_json(SESSION_TYPES_FILE, self.session_types)
         save_json(GOALS_FILE, self.goals)
         save_json(ACHIEVEMENTS_FILE, self.achievements)
         save_json(USER_PROFILE_FILE, self.user_profile)
+        save_json(APP_SETTINGS_FILE, self.app_settings)
+        self._update_metric_gauges()
+        for path in (*FILES.values(), SESSION_EVENTS_FILE):
+            stamp = file_stamp(path)
+            if stamp:
+                metrics_registry.set("sessionslice_data_file_size_bytes", stamp[1], file=os.path.basename(path))
+        self._dirty.clear()
+        self._save_command_log()
+        self._push_sync()
+    def _push_sync(self):
+        if self.sync.folder:
+            try:
+                self.sync.push()
+            except OSError as e:
+                print(f"Sync error: {e}")
+class SessionSearchIndex:
+    """Inverted index over session history with facet counts and date-range filtering.
+
+    Postings and per-session facet codes are append-only arrays, so new sessions are indexed
+    incrementally; queries run as NumPy set and mask operations over session positions.
+    """
+    FACETS = ("task", "project", "type", "weekday", "hour")
+    WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    TOKEN_RE = re.compile(r"\w+")
+    def __init__(self, data):
+        self.data = data
+        self.built = False
+    def invalidate(self):
+        """Drop the index; it is rebuilt on the next query (e.g. after tasks change project)"""
+        self.built = False
+    def _reset(self):
+        self.postings = defaultdict(lambda: array("i"))
+        self.vocabulary = []
+        self.facet_values = {f: [] for f in self.FACETS}
+        self.facet_codes = {f: {} for f in self.FACETS}
+        self.codes = {f: array("i") for f in self.FACETS}
+        self.ordinals = array("i")
+        self.sort_keys = array("q")
+        self.sessions = []
+        self.archived_years = set()
+        self.size = 0
+        self._arrays = None
+        self._projects = {t["id"]: t.get("project") or "General" for t in self.data.tasks}
+    def build(self):
+        self._reset()
+        self.built = True
+        notes = self.data.session_events.all_notes()
+        for session in self.data.sessions:
+            self._index(session, notes.get(session.get("id"), ""))
+        self.vocabulary = sorted(self.postings)
+    def add(self, session):
+        """Session-append hook: index one new session if the index has been built"""
+        if not self.built:
+            return
+        if self._index(session, self.data.session_events.notes(session.get("id"))):
+            self.vocabulary = sorted(self.postings)
+        self._arrays = None
+    def _facet_code(self, facet, value):
+        codes = self.facet_codes[facet]
+        if value not in codes:
+            codes[value] = len(self.facet_values[facet])
+            self.facet_values[facet].append(value)
+        return codes[value]
+    def _index(self, session, notes=""):
+        """Index one session at the next position; returns True if it introduced new tokens"""
+        position = self.size
+        self.sessions.append(session)
+        name = self.data.session_task_name(session)
+        project = self._projects.get(session.get("task_id"), "General")
+        session_type = self.data.session_type_label(session)
+        text = " ".join((name, project, session_type, session.get("notes", ""), notes)).lower()
+        new_tokens = False
+        for token in set(self.TOKEN_RE.findall(text)):
+            new_tokens = new_tokens or token not in self.postings
+            self.postings[token].append(position)
+        day = date.fromisoformat(session["date"])
+        start = session.get("start") or "00:00"
+        hour = int(start[:2]) if start[:2].isdigit() else 0
+        for facet, value in (("task", name), ("project", project), ("type", session_type),
+                             ("weekday", self.WEEKDAYS[day.weekday()]), ("hour", f"{hour:02d}:00")):
+            self.codes[facet].append(self._facet_code(facet, value))
+        self.ordinals.append(day.toordinal())
+        self.sort_keys.append(day.toordinal() * 1440 + hour * 60)
+        self.size += 1
+        return new_tokens
+    def _index_archive(self, start_date, end_date):
+        """Index the archived years a query's date range reaches, releasing any it no longer reaches"""
+        wanted = self.data.archive.years_between(start_date, end_date)
+        if not self.archived_years.issubset(wanted):
+            self.build()
+        years = [y for y in wanted if y not in self.archived_years]
+        if not years:
+            return
+        notes = self.data.session_events.all_notes()
+        for year in years:
+            for session in self.data.archive.load(year):
+                self._index(session, notes.get(session.get("id"), ""))
+            self.archived_years.add(year)
+        self.vocabulary = sorted(self.postings)
+        self._arrays = None
+    def _numpy_arrays(self):
+        if self._arrays is None:
+            self._arrays = {f: np.array(self.codes[f], dtype=np.int32) for f in self.FACETS}
+            self._arrays["ordinal"] = np.array(self.ordinals, dtype=np.int32)
+            self._arrays["sort_key"] = np.array(self.sort_keys, dtype=np.int64)
+        return self._arrays
+    def _match_term(self, term):
+        """Positions whose tokens start with ``term`` (prefix match over the sorted vocabulary)"""
+        lo = bisect.bisect_left(self.vocabulary, term)
+        hi = bisect.bisect_left(self.vocabulary, term + "\uffff")
+        tokens = self.vocabulary[lo:hi]
+        if len(tokens) == 1:
+            return np.array(self.postings[tokens[0]], dtype=np.int32)
+        mask = np.zeros(self.size, dtype=bool)
+        for token in tokens:
+            mask[np.array(self.postings[token], dtype=np.int32)] = True
+        return np.flatnonzero(mask).astype(np.int32)
+    def search(self, query="", start_date=None, end_date=None, filters=None, limit=200):
+        """Return matching sessions (newest first), the total match count and facet counts.
+
+        ``start_date``/``end_date`` are inclusive YYYY-MM-DD strings, ``filters`` maps a facet
+        name to the value it must equal.
+        """
+        if not self.built:
+            self.build()
+        self._index_archive(start_date, end_date)
+        arrays = self._numpy_arrays()
+        candidates = None
+        for term in self.TOKEN_RE.findall(query.lower()):
+            matched = self._match_term(term)
+            if candidates is None:
+                candidates = matched
+            else:
+                mask = np.zeros(self.size, dtype=bool)
+                mask[matched] = True
+                candidates = candidates[mask[candidates]]
+        if candidates is None:
+            candidates = np.arange(self.size, dtype=np.int32)
+        if start_date or end_date:
+            ordinals = arrays["ordinal"][candidates]
+            mask = np.ones(len(candidates), dtype=bool)
+            if start_date:
+                mask &= ordinals >= date.fromisoformat(start_date).toordinal()
+            if end_date:
+                mask &= ordinals <= date.fromisoformat(end_date).toordinal()
+            candidates = candidates[mask]
+        for facet, value in (filters or {}).items():
+            code = self.facet_codes[facet].get(value)
+            if code is None:
+                candidates = candidates[:0]
+                break
+            candidates = candidates[arrays[facet][candidates] == code]
+        facets = {}
+        for facet in self.FACETS:
+            counts = np.bincount(arrays[facet][candidates], minlength=len(self.facet_values[facet]))
+            nonzero = np.flatnonzero(counts)
+            order = nonzero[np.argsort(-counts[nonzero], kind="stable")]
+            facets[facet] = [(self.facet_values[facet][i], int(counts[i])) for i in order]
+        keys = arrays["sort_key"][candidates]
+        if len(candidates) > limit:
+            top = np.argpartition(-keys, limit)[:limit]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-keys[top], kind="stable")]
+        results = [self.sessions[i] for i in candidates[top].tolist()]
+        return {"total": int(len(candidates)), "results": results, "facets": facets}
+class SessionEventLog:
+    """Append-only stream of per-session break/interruption timestamps and notes (data/session_events.jsonl).
+
+    Each stopped session adds one compact line: event offsets in seconds from the start, a string of
+    event kinds and optional notes, so sessions.json keeps only the counters. The file is scanned
+    incrementally into a byte-offset index and running interruption histograms; events themselves
+    are never held in memory and single sessions are read back with a seek.
+    """
+    KINDS = {"b": "break", "i": "interruption", "p": "idle auto-pause"}
+    BIN_MINUTES, MAX_MINUTES = 5, 180
+    def __init__(self, path=SESSION_EVENTS_FILE):
+        self.path = path
+        self.offsets = {}
+        self._notes = {}
+        self._scanned = 0
+        self.version = 0
+        self.by_elapsed = np.zeros(self.MAX_MINUTES // self.BIN_MINUTES + 1)
+        self.by_hour = np.zeros(24)
+    def append(self, session_id, started, events, notes=""):
+        """Record a session's ``[(offset_seconds, kind), ...]`` events; no-op if there is nothing to store"""
+        if not events and not notes:
+            return
+        record = {"id": session_id, "s": started.strftime("%Y-%m-%dT%H:%M:%S"),
+                  "t": [int(offset) for offset, _ in events], "k": "".join(kind for _, kind in events)}
+        if notes:
+            record["notes"] = notes
+        with DataDirLock():
+            with open(self.path, "ab") as f:
+                f.write((json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+    def _scan(self):
+        """Index lines appended since the last scan, by this or another process"""
+        stamp = file_stamp(self.path)
+        if stamp is None or stamp[1] <= self._scanned:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._scanned)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a writer is mid-append; pick the line up next time
+                offset, self._scanned = self._scanned, self._scanned + len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self.offsets[record["id"]] = offset
+                if record.get("notes"):
+                    self._notes[record["id"]] = record["notes"]
+                self._fold(record)
+        self.version += 1
+    def _fold(self, record):
+        started = datetime.fromisoformat(record["s"])
+        start_second = started.hour * 3600 + started.minute * 60 + started.second
+        for offset, kind in zip(record["t"], record["k"]):
+            if kind != "i":
+                continue
+            self.by_elapsed[min(offset // 60 // self.BIN_MINUTES, len(self.by_elapsed) - 1)] += 1
+            self.by_hour[(start_second + offset) // 3600 % 24] += 1
+    def get(self, session_id):
+        """``{"started", "events": [(offset_seconds, kind)], "notes"}`` for one session, or None"""
+        self._scan()
+        offset = self.offsets.get(session_id)
+        if offset is None:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            record = json.loads(f.readline())
+        return {"started": record["s"], "events": list(zip(record["t"], record["k"])), "notes": record.get("notes", "")}
+    def notes(self, session_id):
+        self._scan()
+        return self._notes.get(session_id, "")
+    def all_notes(self):
+        self._scan()
+        return self._notes
+    def interruption_profile(self):
+        """Interruption counts by minutes into the session (``BIN_MINUTES`` bins) and by hour of day"""
+        self._scan()
+        return self.by_elapsed, self.by_hour
+class XpLedger:
+    """Append-only record of every XP award (data/xp_ledger.jsonl) with checkpoints of the running total.
+
+    ``value`` prices an entry under the current rules and ``rules`` fingerprints those rules. A
+    checkpoint stores the total and byte offset after every ``CHECKPOINT_EVERY`` entries, so loading
+    replays only the entries after the last checkpoint taken under the same rules. Changing the
+    rules (or ``recompute`` after a data fix) falls back to the last checkpoint that is still valid.
+    """
+    CHECKPOINT_EVERY = 100
+    def __init__(self, value, rules, path=XP_LEDGER_FILE):
+        self.value = value
+        self.rules = rules
+        self.path = path
+        self.checkpoints_path = path + ".checkpoints.json"
+        self.checkpoints = load_json(self.checkpoints_path, [])
+        self._series = None
+        self._load()
+    def _load(self):
+        size = (file_stamp(self.path) or (0, 0))[1]
+        self.checkpoints = [cp for cp in self.checkpoints if cp["rules"] == self.rules and cp["offset"] <= size]
+        last = self.checkpoints[-1] if self.checkpoints else {"entries": 0, "offset": 0, "total": 0}
+        self.entries, self._scanned, self.total = last["entries"], last["offset"], last["total"]
+        self._scan()
+    def _scan(self):
+        """Fold in entries appended since the last scan, checkpointing as the count passes each multiple"""
+        stamp = file_stamp(self.path)
+        if stamp is None or stamp[1] <= self._scanned:
+            return
+        checkpointed = False
+        with open(self.path, "rb") as f:
+            f.seek(self._scanned)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._scanned += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.total += self.value(entry)
+                self.entries += 1
+                if self.entries % self.CHECKPOINT_EVERY == 0:
+                    self.checkpoints.append({"entries": self.entries, "offset": self._scanned, "total": self.total,
+                                             "rules": self.rules, "at": entry["t"]})
+                    checkpointed = True
+        if checkpointed:
+            save_json(self.checkpoints_path, self.checkpoints)
+        self._series = None
+    def _append(self, source, ref, amount, reason):
+        """Write one entry; callers hold the DataDirLock"""
+        entry = {"t": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"), "src": source, "ref": ref, "xp": amount, "why": reason}
+        with open(self.path, "ab") as f:
+            f.write((json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+    def award(self, source, ref, amount, reason=""):
+        """Append one award; ``source`` is "session", "achievement", "goal" or "legacy"""
+        with DataDirLock():
+            self._append(source, ref, amount, reason)
+        self._scan()
+    def migrate_legacy(self, amount):
+        """One-time seed with the XP earned before the ledger existed.
+
+        The emptiness check is repeated on the file under the lock, so two processes starting on a
+        data dir without a ledger (e.g. the GUI and a --report run) cannot both seed it.
+        """
+        with DataDirLock():
+            if (file_stamp(self.path) or (0, 0))[1] == 0:
+                self._append("legacy", None, amount, "XP earned before the ledger")
+        self._scan()
+    def recompute(self, rules=None, after_entries=None):
+        """Re-derive the total under new rules, or after fixing entries past ``after_entries``"""
+        if rules is not None:
+            self.rules = rules
+        if after_entries is not None:
+            self.checkpoints = [cp for cp in self.checkpoints if cp["entries"] <= after_entries]
+        self._load()
+        save_json(self.checkpoints_path, self.checkpoints)
+    def current_total(self):
+        self._scan()
+        return self.total
+    def series(self):
+        """Cumulative XP at the end of each day with awards, as ``[(YYYY-MM-DD, total)]``; reads the ledger, not sessions"""
+        self._scan()
+        if self._series is None:
+            daily = defaultdict(int)
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as f:
+                    for line in f:
+                        if line.endswith(b"\n"):
+                            entry = json.loads(line)
+                            daily[entry["t"][:10]] += self.value(entry)
+            total, self._series = 0, []
+            for day in sorted(daily):
+                total += daily[day]
+                self._series.append((day, total))
+        return self._series
+class SessionArchive:
+    """Cold tier: sessions from whole years past the archive horizon, in immutable compressed segments.
+
+    Each archival run writes one ``sessions-<year>-<part>.json.xz`` per year it moves out of the hot
+    set and records a summary in ``index.json`` — totals, per-date minutes, rollup rows and the
+    weekday × hour grid — so stats, streaks, analytics and the heatmap never open a segment. Raw
+    sessions are decompressed only for queries whose date range reaches an archived year, and the
+    most recently used years stay cached. Merges made after archival are recorded as id aliases in
+    the index and applied when reading, so segments never need rewriting.
+    """
+    CODECS = {".xz": lzma, ".gz": gzip}
+    CODEC = ".xz"
+    CACHE_YEARS = 2
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        index = load_json(self.index_path, {"segments": []})
+        self.segments = index["segments"]
+        self.aliases = index.get("aliases", {"task": {}, "type": {}})
+        self._cache = {}
+    def _save_index(self):
+        save_json(self.index_path, {"segments": self.segments, "aliases": self.aliases})
+    def resolve(self, kind, key):
+        """The task/type id that archived sessions of ``key`` count towards after later merges"""
+        aliases, seen = self.aliases[kind], set()
+        while key in aliases and key not in seen:
+            seen.add(key)
+            key = aliases[key]
+        return key
+    def alias(self, kind, source_id, target_id=None):
+        """Record that archived ``source_id`` sessions now belong to ``target_id``; with no target, forget it"""
+        if not self.segments:
+            return
+        if target_id is None:
+            if self.aliases[kind].pop(source_id, None) is None:
+                return
+        else:
+            self.aliases[kind][source_id] = target_id
+        self._cache.clear()
+        self._save_index()
+    @property
+    def years(self):
+        return sorted({segment["year"] for segment in self.segments})
+    def fingerprint(self):
+        return len(self.segments)
+    def totals(self):
+        return {key: sum(segment[key] for segment in self.segments) for key in ("sessions", "minutes", "perfect")}
+    def minutes_by_date(self):
+        minutes = defaultdict(float)
+        for segment in self.segments:
+            for day, value in segment["minutes_by_date"].items():
+                minutes[day] += value
+        return minutes
+    def rollup_rows(self):
+        """(level, key, row) for every precomputed rollup row of every segment"""
+        for segment in self.segments:
+            for level, table in segment["rollups"].items():
+                for key, row in table.items():
+                    yield level, key, row
+    def labels(self):
+        """Last-known task/type names of the rollup keys, for tasks and types deleted since"""
+        labels = {"task": {}, "type": {}}
+        for segment in self.segments:
+            for kind, names in segment.get("labels", {}).items():
+                labels[kind].update(names)
+        return labels
+    def heatmap(self):
+        grid = np.zeros((7, 24))
+        for segment in self.segments:
+            grid += np.array(segment["heatmap"])
+        return grid
+    def load(self, year):
+        """All archived sessions of one year; decompressed on first use and kept in a small LRU cache"""
+        if year in self._cache:
+            self._cache[year] = self._cache.pop(year)
+        else:
+            sessions = []
+            for segment in self.segments:
+                if segment["year"] == year:
+                    with self.CODECS[os.path.splitext(segment["file"])[1]].open(os.path.join(self.directory, segment["file"]), "rb") as f:
+                        sessions.extend(json.loads(f.read()))
+            for kind, field in (("task", "task_id"), ("type", "type_id")):
+                if self.aliases[kind]:
+                    for s in sessions:
+                        if s.get(field) in self.aliases[kind]:
+                            s[field] = self.resolve(kind, s[field])
+            self._cache[year] = (sessions, {s["id"] for s in sessions})
+            while len(self._cache) > self.CACHE_YEARS:
+                del self._cache[next(iter(self._cache))]
+        return self._cache[year][0]
+    def hot_start(self):
+        """First date not covered by a segment, or "" when nothing is archived"""
+        return f"{int(self.years[-1]) + 1}-01-01" if self.segments else ""
+    def years_between(self, start_date=None, end_date=None):
+        return [year for year in self.years
+                if (not start_date or year >= start_date[:4]) and (not end_date or year <= end_date[:4])]
+    def sessions_between(self, start_date=None, end_date=None):
+        return [s for year in self.years_between(start_date, end_date) for s in self.load(year)
+                if (not start_date or s["date"] >= start_date) and (not end_date or s["date"] <= end_date)]
+    def contains(self, session):
+        year = session.get("date", "")[:4]
+        if not any(segment["year"] == year for segment in self.segments):
+            return False
+        self.load(year)
+        return session.get("id") in self._cache[year][1]
+    def drop_archived(self, sessions):
+        """Filter out hot sessions already in a segment, e.g. after a crash between archiving and saving"""
+        years = set(self.years)
+        return [s for s in sessions if s.get("date", "")[:4] not in years or not self.contains(s)]
+    def write(self, sessions_by_year):
+        """Append one new segment per year and its summary; existing segments are never rewritten"""
+        os.makedirs(self.directory, exist_ok=True)
+        for year, sessions in sorted(sessions_by_year.items()):
+            part = sum(1 for segment in self.segments if segment["year"] == year)
+            name = f"sessions-{year}-{part}.json{self.CODEC}"
+            path = os.path.join(self.directory, name)
+            with self.CODECS[self.CODEC].open(path + ".tmp", "wb") as f:
+                f.write(json.dumps(sessions, separators=(",", ":")).encode("utf-8"))
+            os.replace(path + ".tmp", path)
+            minutes_by_date = defaultdict(float)
+            for s in sessions:
+                minutes_by_date[s["date"]] += s.get("duration", 0)
+            rollups, labels = RollupStore.tables_for(sessions)
+            self.segments.append({
+                "year": year, "file": name, "sessions": len(sessions),
+                "minutes": round(sum(minutes_by_date.values()), 4),
+                "perfect": sum(1 for s in sessions if s.get("interruptions", 0) == 0),
+                "minutes_by_date": {day: round(value, 4) for day, value in sorted(minutes_by_date.items())},
+                "rollups": rollups, "labels": labels,
+                "heatmap": np.round(FocusHeatmap.bin_sessions(sessions), 4).tolist()})
+            self._cache.pop(year, None)
+        self._save_index()
+class SyncManager:
+    """Shared-folder sync: every device appends its changes to ``<folder>/<device>/{sessions,goals}.log``.
+
+    Other devices' logs are replayed from saved byte cursors, so a sync reads and writes only the
+    records added since the last one. Records carry a ``(timestamp, device)`` version and merge
+    last-writer-wins per id, so all devices converge whatever order logs are read in. Session
+    creations use version 0 and never override an edit; goal deletions travel as tombstones.
+    """
+    LOGS = ("sessions", "goals")
+    def __init__(self, data, state_path=SYNC_STATE_FILE):
+        self.data = data
+        self.state_path = state_path
+        self.state = load_json(state_path, {})
+        host = socket.gethostname()
+        if self.state.get("host") != host:  # a copied data/ dir must not impersonate the original device
+            self.state = {"device": f"{re.sub(r'[^A-Za-z0-9_-]', '', host)[:24] or 'device'}-{new_id()[:8]}", "host": host}
+        self.state.setdefault("exported_upto", 0)
+        self.state.setdefault("cursors", {})
+        self.state.setdefault("session_versions", {})
+        self.state.setdefault("goal_versions", {})
+        self.state.setdefault("goal_hashes", {})
+        self.device = self.state["device"]
+        self.last_sync = None
+    @property
+    def folder(self):
+        folder = self.data.app_settings.get("sync_folder", "")
+        return os.path.expanduser(folder) if folder else ""
+    @staticmethod
+    def _line(record):
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+    @staticmethod
+    def _goal_hash(goal):
+        return hashlib.sha1(json.dumps(goal, sort_keys=True).encode("utf-8")).hexdigest()
+    def push(self):
+        """Append this device's new sessions, edited sessions and changed or deleted goals to its logs"""
+        own = os.path.join(self.folder, self.device)
+        os.makedirs(own, exist_ok=True)
+        data, state, now = self.data, self.state, round(time.time(), 3)
+        lines = []
+        for session in data.sessions[state["exported_upto"]:]:
+            if session.get("device", self.device) == self.device:  # synced-in sessions are their origin's to publish
+                lines.append(self._line({"op": "put", "id": session["id"], "v": [0, self.device], "session": session}))
+        for sid in sorted(data.sync_dirty):
+            session = data.session_by_id.get(sid)
+            if session is not None:
+                state["session_versions"][sid] = [now, self.device]
+                record = {k: v for k, v in session.items() if k != "device"}
+                lines.append(self._line({"op": "put", "id": sid, "v": [now, self.device], "session": record}))
+        self._append(os.path.join(own, "sessions.log"), lines)
+        state["exported_upto"] = len(data.sessions)
+        data.sync_dirty.clear()
+        lines, hashes, live = [], state["goal_hashes"], set()
+        for goal in data.goals:
+            gid = goal.get("id")
+            if gid is None:
+                continue
+            live.add(gid)
+            digest = self._goal_hash(goal)
+            if hashes.get(gid) != digest:
+                hashes[gid] = digest
+                state["goal_versions"][gid] = [now, self.device]
+                lines.append(self._line({"op": "put", "id": gid, "v": [now, self.device], "goal": goal}))
+        for gid in sorted(set(hashes) - live):
+            del hashes[gid]
+            state["goal_versions"][gid] = [now, self.device, "deleted"]
+            lines.append(self._line({"op": "del", "id": gid, "v": [now, self.device]}))
+        self._append(os.path.join(own, "goals.log"), lines)
+        self.save_state()
+    @staticmethod
+    def _append(path, lines):
+        if lines:
+            with open(path, "ab") as f:
+                f.write("".join(lines).encode("utf-8"))
+    def pull(self):
+        """Replay records other devices appended since the last pull; returns how many changed local data"""
+        folder = self.folder
+        if not os.path.isdir(folder):
+            return 0
+        changed, pending = 0, {}
+        for device in sorted(os.listdir(folder)):
+            if device == self.device or not os.path.isdir(os.path.join(folder, device)):
+                continue
+            cursors = self.state["cursors"].setdefault(device, {})
+            for log in self.LOGS:
+                path = os.path.join(folder, device, f"{log}.log")
+                for record in self._read_new(path, cursors, log):
+                    if log == "sessions":
+                        changed += self._apply_session(record, pending)
+                    else:
+                        changed += self._apply_goal(record)
+        if pending:
+            self.data.absorb_sessions(list(pending.values()))
+        if changed:
+            self.data.update_goal_progress()
+            self.data.mark_changed()
+        self.save_state()
+        self.last_sync = datetime.now()
+        return changed
+    @staticmethod
+    def _read_new(path, cursors, log):
+        """Complete lines after the saved cursor; a line still being written is picked up next time"""
+        stamp = file_stamp(path)
+        start = cursors.get(log, 0)
+        if stamp is None or stamp[1] <= start:
+            return
+        with open(path, "rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                cursors[log] = cursors.get(log, 0) + len(line)
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    def _apply_session(self, record, pending):
+        data, sid, version = self.data, record["id"], record["v"]
+        versions = self.state["session_versions"]
+        if sid not in data.session_by_id and sid not in pending and data.archive.contains(record["session"]):
+            return 0  # archived segments are immutable
+        if sid in data.session_by_id or sid in pending:
+            if not version[0] or version <= versions.get(sid, [0, ""]):
+                return 0
+        if version[0]:
+            versions[sid] = version
+        session = dict(record["session"])
+        self._resolve(session)
+        if sid not in data.session_by_id:
+            pending[sid] = dict(session, device=pending[sid]["device"] if sid in pending else version[1])
+            return 1
+        current = data.session_by_id[sid]
+        task_id = session["task_id"] if session["task_id"] != current.get("task_id") else None
+        type_id = session.get("type_id") if session.get("type_id") not in (None, current.get("type_id")) else None
+        if task_id or type_id:
+            data._move_sessions([sid], task_id=task_id, type_id=type_id)
+            data.sync_dirty.discard(sid)
+            data.search_index.invalidate()
+        return 1
+    def _resolve(self, session):
+        """Map an incoming session's task/type ids onto this device's, adding tasks it has never seen"""
+        data = self.data
+        if session.get("task_id") not in data.task_by_id:
+            task = data.task_by_name.get(session.get("name"))
+            if task is None:
+                task = data.add_task(session.get("name", "Untitled"), task_id=session.get("task_id"))
+            session["task_id"] = task["id"]
+        if session.get("type_id") not in data.type_by_id:
+            st = data.type_by_label.get(session.get("session_type"))
+            if st:
+                session["type_id"] = st["id"]
+            else:
+                session.pop("type_id", None)
+    def _apply_goal(self, record):
+        gid, version = record["id"], record["v"]
+        if version <= self.state["goal_versions"].get(gid, [0, ""])[:2]:
+            return 0
+        goals = self.data.goals
+        index = next((i for i, g in enumerate(goals) if g.get("id") == gid), None)
+        if record["op"] == "del":
+            self.state["goal_versions"][gid] = version + ["deleted"]
+            self.state["goal_hashes"].pop(gid, None)
+            if index is not None:
+                del goals[index]
+            return 1
+        self.state["goal_versions"][gid] = version
+        self.state["goal_hashes"][gid] = self._goal_hash(record["goal"])
+        if index is None:
+            goals.append(record["goal"])
+        else:
+            goals[index] = record["goal"]
+        return 1
+    def save_state(self):
+        save_json(self.state_path, self.state)
+class RollupStore:
+    """Pre-aggregated day / ISO-week / month / year totals, broken down by task and session type.
+
+    Rows are updated incrementally as sessions are appended or moved and persisted next to the
+    sessions, so period queries read a few hundred rollup rows instead of scanning history. Rows
+    are keyed by task/type id; ``labels`` keeps each key's last-known name for tasks and types
+    that have since been deleted.
+    """
+    LEVELS = ("day", "week", "month", "year")
+    def __init__(self, data):
+        self.data = data
+        self._sorted_keys = {}
+        stored = load_json(ROLLUPS_FILE, None)
+        if stored and stored.get("fingerprint") == self._fingerprint() and "labels" in stored:
+            self.tables, self.labels = stored["tables"], stored["labels"]
+        else:
+            self.rebuild()
+    def _fingerprint(self):
+        """Cheap staleness check: the rollups were built from exactly this many sessions ending in this one"""
+        sessions, archive = self.data.sessions, self.data.archive
+        fingerprint = [len(sessions), sessions[-1]["id"] if sessions else None]
+        return fingerprint + [archive.fingerprint()] if archive.segments else fingerprint
+    def rebuild(self):
+        self.tables = {level: {} for level in self.LEVELS}
+        self.labels = self.data.archive.labels()
+        self._sorted_keys = {}
+        for level, key, row in self.data.archive.rollup_rows():
+            target = self.tables[level].setdefault(key, {"minutes": 0, "sessions": 0, "interruptions": 0, "breaks": 0,
+                                                         "by_task": {}, "by_type": {}})
+            for field in ("minutes", "sessions", "interruptions", "breaks"):
+                target[field] += row[field]
+            for breakdown in ("by_task", "by_type"):
+                for item, minutes in row[breakdown].items():
+                    target[breakdown][item] = round(target[breakdown].get(item, 0) + minutes, 4)
+        for session in self.data.sessions:
+            self.add(session)
+    @classmethod
+    def tables_for(cls, sessions):
+        """Rollup tables and key labels of a batch of sessions, built apart from the live store (archive segment summaries)"""
+        store = cls.__new__(cls)
+        store.tables, store.labels, store._sorted_keys = {level: {} for level in cls.LEVELS}, {"task": {}, "type": {}}, {}
+        for session in sessions:
+            store.add(session)
+        return store.tables, store.labels
+    def save(self):
+        save_json(ROLLUPS_FILE, {"fingerprint": self._fingerprint(), "tables": self.tables, "labels": self.labels})
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def period_keys(date_str):
+        year, week, _ = date.fromisoformat(date_str).isocalendar()
+        return date_str, f"{year}-W{week:02d}", date_str[:7], date_str[:4]
+    def add(self, session, sign=1):
+        """Fold a session into every level (``sign=-1`` removes it again)"""
+        duration = sign * session.get("duration", 0)
+        task_key = session.get("task_id") or session.get("name", "")
+        type_key = session.get("type_id") or session.get("session_type", "Unknown")
+        if sign > 0:
+            self.labels["task"][task_key] = session.get("name", task_key)
+            self.labels["type"][type_key] = session.get("session_type", type_key)
+        for level, key in zip(self.LEVELS, self.period_keys(session["date"])):
+            table = self.tables[level]
+            row = table.get(key)
+            if row is None:
+                row = table[key] = {"minutes": 0, "sessions": 0, "interruptions": 0, "breaks": 0, "by_task": {}, "by_type": {}}
+                self._sorted_keys.pop(level, None)
+            row["minutes"] = round(row["minutes"] + duration, 4)
+            row["sessions"] += sign
+            row["interruptions"] += sign * session.get("interruptions", 0)
+            row["breaks"] += sign * session.get("breaks", 0)
+            for breakdown, item in ((row["by_task"], task_key), (row["by_type"], type_key)):
+                value = round(breakdown.get(item, 0) + duration, 4)
+                if sign < 0 and abs(value) < 1e-6:
+                    breakdown.pop(item, None)
+                else:
+                    breakdown[item] = value
+    def rows(self, level, start_key=None, end_key=None):
+        """(key, row) pairs of one level whose key lies in the inclusive range, in key order"""
+        keys = self._sorted_keys.get(level)
+        if keys is None:
+            keys = self._sorted_keys[level] = sorted(self.tables[level])
+        lo = bisect.bisect_left(keys, start_key) if start_key else 0
+        hi = bisect.bisect_right(keys, end_key) if end_key else len(keys)
+        table = self.tables[level]
+        return [(k, table[k]) for k in keys[lo:hi]]
+    def summarize(self, start_date=None, end_date=None):
+        """Totals for an inclusive YYYY-MM-DD range, read from day rows"""
+        summary = {"type_time": defaultdict(float), "task_time": defaultdict(float), "daily_time": {},
+                   "total_sessions": 0, "total_minutes": 0, "interruptions": 0, "breaks": 0}
+        for key, row in self.rows("day", start_date, end_date):
+            if not row["sessions"]:
+                continue
+            summary["daily_time"][key] = row["minutes"]
+            summary["total_sessions"] += row["sessions"]
+            summary["total_minutes"] += row["minutes"]
+            summary["interruptions"] += row["interruptions"]
+            summary["breaks"] += row["breaks"]
+            for type_key, minutes in row["by_type"].items():
+                summary["type_time"][self.type_name(type_key)] += minutes
+            for task_key, minutes in row["by_task"].items():
+                summary["task_time"][self.task_name(task_key)] += minutes
+        return summary
+    def range_rows(self, start_date, end_date):
+        """Cover an inclusive YYYY-MM-DD range with the fewest rows: whole years, then whole months, then days"""
+        day, last = date.fromisoformat(start_date), date.fromisoformat(end_date)
+        rows = []
+        while day <= last:
+            if day.month == 1 and day.day == 1 and date(day.year, 12, 31) <= last:
+                level, key, day = "year", f"{day.year}", date(day.year + 1, 1, 1)
+            elif day.day == 1 and day.replace(day=cal.monthrange(day.year, day.month)[1]) <= last:
+                level, key = "month", f"{day.year}-{day.month:02d}"
+                day = date(day.year + day.month // 12, day.month % 12 + 1, 1)
+            else:
+                level, key, day = "day", day.isoformat(), day + timedelta(days=1)
+            row = self.tables[level].get(key)
+            if row:
+                rows.append(row)
+        return rows
+    def range_totals(self, start_date, end_date):
+        """Totals plus per-task minutes for an inclusive range, without a daily series"""
+        totals = {"minutes": 0, "sessions": 0, "interruptions": 0, "by_task": defaultdict(float)}
+        for row in self.range_rows(start_date, end_date):
+            totals["minutes"] += row["minutes"]
+            totals["sessions"] += row["sessions"]
+            totals["interruptions"] += row["interruptions"]
+            for task_key, minutes in row["by_task"].items():
+                totals["by_task"][self.task_name(task_key)] += minutes
+        minutes = totals["minutes"]
+        return {"total_minutes": minutes, "sessions": totals["sessions"],
+                "avg_session": minutes / totals["sessions"] if totals["sessions"] else 0,
+                "interruptions_per_hour": totals["interruptions"] / (minutes / 60) if minutes > 0 else 0,
+                "task_share": {name: m / minutes for name, m in totals["by_task"].items()} if minutes > 0 else {}}
+    def compare(self, start_date, end_date):
+        """Metrics for a range next to those of the equally long period just before it"""
+        start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+        prev_end = start - timedelta(days=1)
+        prev_start = prev_end - (end - start)
+        return {"current": self.range_totals(start_date, end_date),
+                "previous": self.range_totals(prev_start.isoformat(), prev_end.isoformat()),
+                "previous_range": (prev_start.isoformat(), prev_end.isoformat())}
+    def task_name(self, key):
+        key = self.data.archive.resolve("task", key)
+        task = self.data.task_by_id.get(key)
+        return task["name"] if task else self.labels["task"].get(key, key)
+    def type_name(self, key):
+        key = self.data.archive.resolve("type", key)
+        st = self.data.type_by_id.get(key)
+        return self.data.type_label(st) if st else self.labels["type"].get(key, key)
+class FocusHeatmap:
+    """Weekday × hour-of-day minute totals over the whole history, binned with NumPy.
+
+    Sessions spanning several hours are split across bins in proportion to the minutes spent
+    in each (wrapping from Sunday night into Monday); new sessions are added to the cached grid.
+    """
+    WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    CHUNK = 200000
+    def __init__(self, data):
+        self.data = data
+        self.grid = None
+        self.version = 0
+    def get_grid(self):
+        if self.grid is None:
+            self.grid = self.bin_sessions(self.data.sessions) + self.data.archive.heatmap()
+            self.version += 1
+        return self.grid
+    def invalidate(self):
+        self.grid = None
+    def add(self, session):
+        """Session-append hook: fold one session into the cached grid"""
+        if self.grid is not None:
+            self.grid += self.bin_sessions([session])
+            self.version += 1
+    @classmethod
+    def bin_sessions(cls, sessions):
+        week_minutes = 7 * 24 * 60
+        totals = np.zeros(7 * 24)
+        for offset in range(0, len(sessions), cls.CHUNK):
+            chunk = sessions[offset:offset + cls.CHUNK]
+            days = np.array([s["date"] for s in chunk], dtype="datetime64[D]").astype(np.int64)
+            weekday = (days + 3) % 7  # 1970-01-01 was a Thursday
+            start_of_day = np.array([cls._minute_of_day(s.get("start")) for s in chunk], dtype=np.float64)
+            duration = np.array([s.get("duration", 0) for s in chunk], dtype=np.float64).clip(0, week_minutes)
+            start = weekday * 1440 + start_of_day
+            end = start + duration
+            first_bin = (start // 60).astype(np.int64)
+            spans = int(np.ceil(((start % 60) + duration).max() / 60)) if len(chunk) else 0
+            for k in range(max(spans, 1)):
+                hour_bin = first_bin + k
+                overlap = np.minimum(end, (hour_bin + 1) * 60) - np.maximum(start, hour_bin * 60)
+                totals += np.bincount(hour_bin % (7 * 24), weights=overlap.clip(0), minlength=7 * 24)
+        return totals.reshape(7, 24)
+    @staticmethod
+    def _minute_of_day(hhmm):
+        try:
+            return int(hhmm[:2]) * 60 + int(hhmm[3:5])
+        except (TypeError, ValueError):
+            return 0
+def render_report_chart(kind, payload, fmt):
+    """Process-pool worker: draw one report chart on an off-screen Agg canvas and return the encoded bytes"""
+    fig = Figure(figsize=(8, 3.6) if kind == "heatmap" else (6, 4), dpi=100)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    if kind == "pie":
+        if payload["sizes"]:
+            cmap = plt.get_cmap("Set3", len(payload["labels"]))
+            ax.pie(payload["sizes"], labels=payload["labels"], autopct='%1.1f%%', startangle=90,
+                   colors=[cmap(i) for i in range(len(payload["labels"]))])
+        else:
+            ax.text(0.5, 0.5, "No sessions", ha="center", va="center", transform=ax.transAxes)
+            ax.axis("off")
+    elif kind == "trend":
+        dates = np.array(payload["dates"], dtype="datetime64[D]")
+        ax.plot(dates, payload["hours"], marker='o' if len(dates) <= 60 else None, linewidth=2, markersize=4)
+        ax.set_ylabel(payload["ylabel"])
+        ax.grid(True, alpha=0.3)
+        fig.autofmt_xdate()
+    elif kind == "heatmap":
+        image = ax.imshow(np.array(payload["grid"]), aspect="auto", cmap="YlOrRd", extent=(-0.5, 23.5, 6.5, -0.5))
+        ax.set_yticks(range(7))
+        ax.set_yticklabels(FocusHeatmap.WEEKDAYS)
+        ax.set_xticks(range(0, 24, 2))
+        ax.set_xlabel("Hour of day")
+        fig.colorbar(image, ax=ax, label="Hours")
+    ax.set_title(payload["title"])
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt)
+    return buffer.getvalue()
+class ReportGenerator:
+    """Headless weekly/monthly productivity reports (HTML, PDF, PNG or SVG) built from the rollups.
+
+    Charts are rendered on Agg canvases in a process pool, so no display is needed, and each rendered
+    chart is cached under data/report_cache keyed by a hash of the aggregates it was drawn from.
+    """
+    PERIODS = {"weekly": 7, "monthly": 30}
+    FORMATS = ("html", "pdf", "png", "svg")
+    CHARTS = ("pie", "trend", "heatmap")
+    CACHE_LIMIT = 200
+    def __init__(self, data, cache_dir=REPORT_CACHE_DIR, workers=None):
+        self.data = data
+        self.cache_dir = cache_dir
+        self.workers = workers
+        os.makedirs(cache_dir, exist_ok=True)
+    def period_range(self, period, today=None):
+        end = today or datetime.now().date()
+        return (end - timedelta(days=self.PERIODS[period] - 1)).isoformat(), end.isoformat()
+    def payloads(self, start_date, end_date):
+        """Plain, picklable chart inputs plus the stats rows for an inclusive date range"""
+        summary = self.data.rollups.summarize(start_date, end_date)
+        type_time = sorted(summary["type_time"].items(), key=lambda item: item[1], reverse=True)
+        charts = {"pie": {"title": "Time by Session Type", "labels": [label for label, _ in type_time],
+                          "sizes": [round(minutes, 2) for _, minutes in type_time]}}
+        if summary["daily_time"]:
+            dates, hours, bucket = AnalyticsPage.line_series(summary["daily_time"], AnalyticsPage.LINE_POINT_BUDGET)
+        else:
+            dates, hours, bucket = np.array([], dtype="datetime64[D]"), np.array([]), "day"
+        charts["trend"] = {"title": "Daily Productivity" if bucket == "day" else f"Productivity, {bucket}ly average",
+                           "dates": [str(d) for d in dates], "hours": [round(float(h), 3) for h in hours],
+                           "ylabel": "Hours" if bucket == "day" else "Hours / day"}
+        in_range = self.data.sessions_between(start_date, end_date)
+        grid = FocusHeatmap.bin_sessions(in_range) / 60
+        charts["heatmap"] = {"title": "Hours by Weekday and Time of Day", "grid": np.round(grid, 3).tolist()}
+        comparison = self.data.rollups.compare(start_date, end_date)
+        current, previous = comparison["current"], comparison["previous"]
+        total_minutes = summary["total_minutes"]
+        best_day = max(summary["daily_time"].items(), key=lambda item: item[1]) if summary["daily_time"] else None
+        top_tasks = sorted(summary["task_time"].items(), key=lambda item: item[1], reverse=True)[:5]
+        stats = [("Sessions", f"{summary['total_sessions']}"),
+                 ("Total time", f"{int(total_minutes // 60)}h {int(total_minutes % 60)}m "
+                                f"{AnalyticsPage._format_delta(current['total_minutes'], previous['total_minutes'])}"),
+                 ("Avg session", f"{current['avg_session']:.0f}m "
+                                 f"{AnalyticsPage._format_delta(current['avg_session'], previous['avg_session'])}"),
+                 ("Interruptions / hour", f"{current['interruptions_per_hour']:.1f}"),
+                 ("Breaks", f"{summary['breaks']}"),
+                 ("Most productive day", f"{best_day[0]} ({int(best_day[1])}m)" if best_day else "N/A"),
+                 ("Top tasks", ", ".join(f"{name} ({int(minutes)}m)" for name, minutes in top_tasks) or "None")]
+        return charts, stats
+    def _cache_path(self, kind, payload, fmt):
+        digest = hashlib.sha1(json.dumps([kind, fmt, payload], sort_keys=True).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{kind}-{digest[:20]}.{fmt}")
+    def render(self, charts, fmt):
+        """Rendered bytes for every chart, drawing only cache misses and those in parallel"""
+        rendered, missing = {}, {}
+        for kind, payload in charts.items():
+            path = self._cache_path(kind, payload, fmt)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    rendered[kind] = f.read()
+            else:
+                missing[kind] = path
+        if missing:
+            try:
+                # spawn, not fork: the GUI process has API/watchdog/toast threads whose locks a fork would copy
+                with ProcessPoolExecutor(max_workers=self.workers or min(len(missing), os.cpu_count() or 1),
+                                         mp_context=multiprocessing.get_context("spawn")) as pool:
+                    futures = {kind: pool.submit(render_report_chart, kind, charts[kind], fmt) for kind in missing}
+                    results = {kind: future.result() for kind, future in futures.items()}
+            except (OSError, RuntimeError) as e:
+                print(f"Process pool unavailable, rendering report charts in-process: {e}")
+                results = {kind: render_report_chart(kind, charts[kind], fmt) for kind in missing}
+            for kind, content in results.items():
+                tmp_path = f"{missing[kind]}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(content)
+                os.replace(tmp_path, missing[kind])
+                rendered[kind] = content
+            self._prune_cache()
+        return rendered
+    def _prune_cache(self):
+        entries = sorted((os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)), key=os.path.getmtime)
+        for path in entries[:-self.CACHE_LIMIT]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    def generate(self, period="weekly", fmt="html", output_dir=REPORTS_DIR, today=None):
+        """Write one report file and return its path"""
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unsupported report format: {fmt}")
+        start_date, end_date = self.period_range(period, today)
+        charts, stats = self.payloads(start_date, end_date)
+        title = f"SessionSlice {period.title()} Report: {start_date} – {end_date}"
+        return self.write(os.path.join(output_dir, f"sessionslice-{period}-{end_date}.{fmt}"), title, charts, stats, fmt)
+    def write(self, path, title, charts, stats, fmt):
+        """Render and save prepared payloads; touches no live data, so it may run off the UI thread"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if fmt == "html":
+            images = self.render(charts, "svg")
+            write_atomic(path, self._html(title, images, stats))
+        else:
+            images = self.render(charts, "png")
+            fig = self._compose(title, images, stats)
+            fig.savefig(path, format=fmt)
+        return path
+    def _compose(self, title, images, stats):
+        """Lay the rendered charts and the stats summary out on one A4 landscape page"""
+        fig = Figure(figsize=(11.69, 8.27), dpi=150)
+        FigureCanvasAgg(fig)
+        fig.suptitle(title, fontsize=14, fontweight="bold")
+        grid = fig.add_gridspec(2, 2, height_ratios=[1.1, 1])
+        for kind, spec in zip(self.CHARTS, (grid[0, 0], grid[0, 1], grid[1, 0])):
+            ax = fig.add_subplot(spec)
+            ax.imshow(mpimg.imread(io.BytesIO(images[kind]), format="png"))
+            ax.axis("off")
+        stats_ax = fig.add_subplot(grid[1, 1])
+        stats_ax.axis("off")
+        for row, (label, value) in enumerate(stats):
+            y = 0.95 - row * 0.13
+            stats_ax.text(0.02, y, label, fontweight="bold", va="top", transform=stats_ax.transAxes)
+            stats_ax.text(0.42, y, value, va="top", wrap=True, transform=stats_ax.transAxes)
+        return fig
+    @staticmethod
+    def _html(title, images, stats):
+        rows = "".join(f"<tr><th>{html.escape(label)}</th><td>{html.escape(value)}</td></tr>" for label, value in stats)
+        charts = "".join(f'<div class="chart">{content.decode("utf-8")[content.decode("utf-8").find("<svg"):]}</div>'
+                         for content in images.values())
+        return (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title><style>"
+                f"body{{font-family:'Segoe UI',sans-serif;color:{COLORS['text_primary']};margin:2em}}"
+                f"th{{text-align:left;padding:4px 16px 4px 0}}.chart{{display:inline-block;vertical-align:top}}"
+                f".chart svg{{max-width:100%;height:auto}}</style></head><body><h1>{html.escape(title)}</h1>"
+                f"<table>{rows}</table>{charts}</body></html>")
 class SessionSliceApp(tk.Tk):
+    SYNC_INTERVAL_MS = 5 * 60 * 1000
     def __init__(self):
         super().__init__()
         self.title(APP_TITLE)
@@ -312,7 +2591,28 @@ class SessionSliceApp(tk.Tk):
         COLORS.update(self.theme_manager.get_theme_colors())
         self.theme_manager.add_theme_change_callback(self._on_theme_change)
         self._init_style()
+        self.idle_monitor = IdleMonitor(self)
+        self.toasts = ToastManager(self, self.data.app_settings)
+        self._ui_calls = queue.Queue()
+        self.api_server = None
+        settings = self.data.app_settings
+        if os.environ.get("SESSIONSLICE_API") or settings["api_enabled"]:
+            self.start_api(env_int("SESSIONSLICE_API", settings["api_port"]))
+        self.metrics_textfile = os.environ.get("SESSIONSLICE_METRICS_FILE") or settings["metrics_textfile"]
+        if self.metrics_textfile:
+            self._write_metrics_textfile()
         self._create_main_widgets()
+        self.bind_all("<Control-Shift-D>", lambda e: self.show_diagnostics())
+        self.bind_all("<Control-z>", self.undo)
+        self.bind_all("<Control-y>", self.redo)
+        self.bind_all("<Control-Shift-Z>", self.redo)
+        if self.data.sync.folder:
+            self.after_idle(self.sync_now, True)
+        self.after_idle(self.archive_old_sessions)
+        self._drain_ui_calls()
+        self.watchdog = MainLoopWatchdog(self, threshold_ms=env_int("SESSIONSLICE_WATCHDOG", 200))
+        if os.environ.get("SESSIONSLICE_WATCHDOG"):
+            self.watchdog.start()
     def _init_style(self):
         style = ttk.Style(self)
         self.configure(bg=COLORS['background'])
@@ -418,6 +2718,8 @@ class SessionSliceApp(tk.Tk):
         nav_items = [
             ("📊 Dashboard", self.show_dashboard),
             ("📅 Calendar", self.show_calendar),
+            ("🕘 Timeline", self.show_timeline),
+            ("🔍 Search", self.show_search),
             ("📝 Tasks", self.show_tasks),
             ("📈 Analytics", self.show_analytics),
             ("🏆 Goals", self.show_goals),
@@ -434,6 +2736,8 @@ class SessionSliceApp(tk.Tk):
         self.pages = {
             "Dashboard": DashboardPage(self.content_frame, self),
             "Calendar": CalendarPage(self.content_frame, self),
+            "Timeline": TimelinePage(self.content_frame, self),
+            "Search": SearchPage(self.content_frame, self),
             "Tasks": TasksPage(self.content_frame, self),
             "Analytics": AnalyticsPage(self.content_frame, self),
             "Goals": GoalsPage(self.content_frame, self),
@@ -450,9 +2754,12 @@ class SessionSliceApp(tk.Tk):
         for button in self.nav_buttons.values():
             button.state(["!pressed"])
         self.nav_buttons[name].state(["pressed"])
+    @instrumentation.instrumented()
     def _show_page(self, page_name, button_name, refresh=True):
         self._clear_content()
-        if refresh and hasattr(self.pages[page_name], 'refresh'): self.pages[page_name].refresh()
+        if refresh and hasattr(self.pages[page_name], 'refresh'):
+            with metrics_registry.time("sessionslice_page_refresh_duration_seconds", page=page_name):
+                self.pages[page_name].refresh()
         self.pages[page_name].pack(fill=tk.BOTH, expand=True)
         self._highlight_button(button_name)
     def show_dashboard(self): self._show_page("Dashboard", "📊 Dashboard")
@@ -461,9 +2768,15 @@ class SessionSliceApp(tk.Tk):
     def show_settings(self): self._show_page("Settings", "⚙️ Settings")
     def show_about(self): self._show_page("About", "ℹ️ About", False)
     def show_calendar(self): self._show_page("Calendar", "📅 Calendar")
+    def show_timeline(self, day=None):
+        if day:
+            self.pages["Timeline"].show_day(day)
+        self._show_page("Timeline", "🕘 Timeline")
     def show_analytics(self): self._show_page("Analytics", "📈 Analytics")
     def show_goals(self): self._show_page("Goals", "🏆 Goals")
     def show_achievements(self): self._show_page("Achievements", "🎖️ Achievements")
+    def show_search(self): self._show_page("Search", "🔍 Search")
+    @instrumentation.instrumented()
     def _on_theme_change(self):
         """Called when theme is changed to update all UI components"""
         self._init_style()
@@ -480,11 +2793,288 @@ class SessionSliceApp(tk.Tk):
         for dialog in dialogs_to_remove:
             self._open_dialogs.discard(dialog)
         self.update_idletasks()
+    def call_in_main_thread(self, func, *args):
+        """Thread-safe: queue ``func(*args)`` to run on the Tk thread"""
+        self._ui_calls.put((func, args))
+    def _drain_ui_calls(self):
+        while True:
+            try:
+                func, args = self._ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
+        self.after(100, self._drain_ui_calls)
+    def start_api(self, port):
+        """Serve the local HTTP API and publish a fresh read snapshot every second"""
+        self.api_server = LocalApiServer(self._api_command, port=port)
+        bound = self.api_server.start()
+        if bound is None:
+            self.api_server = None
+            return
+        print(f"🔌 Local API listening on http://127.0.0.1:{bound}")
+        self.after_idle(self._publish_api_state)
+    def api_snapshot(self):
+        """Everything the API serves, as plain data; Tk thread only"""
+        data = self.data
+        today = date.today().isoformat()
+        profile = data.user_profile
+        return {"timer": self.pages["Dashboard"].timer_state(),
+                "today": {"date": today, "minutes": round(data._minutes_by_date.get(today, 0), 1),
+                          "sessions": data.rollups.tables["day"].get(today, {}).get("sessions", 0)},
+                "streak": {"days": data.metrics()["streak"]},
+                "goals": [{key: goal.get(key) for key in ("id", "name", "type", "target", "current", "unit", "completed")}
+                          for goal in data.goals],
+                "profile": {"level": profile["level"], "total_xp": profile["total_xp"]}}
+    def _write_metrics_textfile(self):
+        """Refresh the Prometheus textfile-collector file every 15 seconds"""
+        try:
+            metrics_registry.write_textfile(self.metrics_textfile)
+        except OSError as e:
+            print(f"Metrics textfile error: {e}")
+        self.after(15000, self._write_metrics_textfile)
+    def refresh_visible_pages(self):
+        for page in self.pages.values():
+            if page.winfo_ismapped() and hasattr(page, "refresh"):
+                page.refresh()
+    def undo(self, event=None):
+        return self._replay_command(event, redo=False)
+    def redo(self, event=None):
+        return self._replay_command(event, redo=True)
+    def _replay_command(self, event, redo):
+        """Ctrl+Z / Ctrl+Y (and the Undo button): replay the command log, leaving text fields their own shortcuts"""
+        if event is not None and isinstance(event.widget, (tk.Entry, tk.Text, tk.Spinbox, ttk.Entry)):
+            return None
+        action = "Redo" if redo else "Undo"
+        try:
+            label = self.data.redo() if redo else self.data.undo()
+        except (KeyError, ValueError) as e:
+            messagebox.showerror(action, f"Could not {action.lower()} the last change: {e}")
+            return "break"
+        if label:
+            self.toasts.notify("Redone" if redo else "Undone", label)
+            self.refresh_visible_pages()
+        else:
+            self.toasts.notify(action, f"Nothing to {action.lower()}.")
+        return "break"
+    def archive_old_sessions(self):
+        archived = self.data.archive_old_sessions()
+        if archived:
+            print(f"🗄️ Archived {archived} sessions into {len(self.data.archive.segments)} yearly segments")
+        return archived
+    def sync_now(self, reschedule=False):
+        """Pull other devices' changes from the sync folder, push ours and refresh the visible page"""
+        if not self.data.sync.folder:
+            return 0
+        try:
+            changed = self.data.sync.pull()
+            self.data.save_all()
+        except OSError as e:
+            print(f"Sync error: {e}")
+            changed = 0
+        if changed:
+            self.refresh_visible_pages()
+        if reschedule:
+            self.after(self.SYNC_INTERVAL_MS, self.sync_now, True)
+        return changed
+    def _publish_api_state(self, reschedule=True):
+        if not self.api_server:
+            return
+        self.api_server.publish(self.api_snapshot())
+        if reschedule:
+            self.after(1000, self._publish_api_state)
+    def _api_command(self, action, params):
+        """API thread: run a session command on the Tk thread and return a Future of (ok, message)"""
+        future = Future()
+        def run():
+            try:
+                future.set_result(self.pages["Dashboard"].remote_command(action, params))
+                self._publish_api_state(reschedule=False)
+            except Exception as e:
+                future.set_exception(e)
+        self.call_in_main_thread(run)
+        return future
+    def focus_window(self):
+        self.deiconify()
+        self.lift()
+        self.focus_force()
+    def show_diagnostics(self):
+        """Open the hidden latency diagnostics panel (Ctrl+Shift+D)"""
+        DiagnosticsDialog(self, self)
     def on_closing(self):
         if messagebox.askokcancel("Quit", "Save changes and quit?"):
             self.data.save_all()
+            if self.api_server:
+                self.api_server.stop()
             self.destroy()
+class DiagnosticsDialog(ThemedDialog):
+    def __init__(self, parent, app):
+        super().__init__(parent)
+        self.app = app
+        self.title("Diagnostics")
+        self.geometry("620x540")
+        self._build_widgets()
+        self._refresh_loop()
+    def _build_widgets(self):
+        ttk.Label(self, text="🩺 Latency Diagnostics", font=(FONT_FAMILY, FONT_SIZES['large'], 'bold')).pack(pady=10)
+        self.enabled_var = tk.BooleanVar(value=instrumentation.enabled)
+        ttk.Checkbutton(self, text="Record timings", variable=self.enabled_var,
+                        command=lambda: setattr(instrumentation, "enabled", self.enabled_var.get())).pack(anchor=tk.W, padx=12)
+        columns = ("Calls", "p50", "p95", "Max")
+        self.tree = ttk.Treeview(self, columns=columns, show="tree headings")
+        self.tree.heading("#0", text="Path")
+        self.tree.column("#0", width=260)
+        for col in columns:
+            self.tree.heading(col, text=col if col == "Calls" else f"{col} (ms)")
+            self.tree.column(col, width=80, anchor=tk.E)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=12, pady=8)
+        self.watchdog_var = tk.BooleanVar(value=self.app.watchdog.running)
+        ttk.Checkbutton(self, text=f"Watch main loop (stalls over {self.app.watchdog.threshold_ms} ms)",
+                        variable=self.watchdog_var, command=self.toggle_watchdog).pack(anchor=tk.W, padx=12)
+        self.stalls_listbox = tk.Listbox(self, height=5, font=(FONT_FAMILY, FONT_SIZES['small']),
+                                         bg=COLORS['surface'], fg=COLORS['text_primary'], borderwidth=0)
+        self.stalls_listbox.pack(fill=tk.X, padx=12, pady=(4, 8))
+        self.profile_var = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.profile_var, font=(FONT_FAMILY, FONT_SIZES['small']),
+                  foreground=COLORS['text_secondary']).pack(anchor=tk.W, padx=12)
+        btn_frame = ttk.Frame(self)
+        btn_frame.pack(pady=8)
+        ttk.Button(btn_frame, text="Clear", command=self.clear).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Profile Next Interaction…", command=self.profile_next).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Close", command=self.destroy).pack(side=tk.LEFT, padx=5)
+    def _refresh_loop(self):
+        if self._destroyed:
+            return
+        self.tree.delete(*self.tree.get_children())
+        for name, calls, p50, p95, worst in instrumentation.summary():
+            self.tree.insert("", tk.END, text=name, values=(calls, f"{p50:.1f}", f"{p95:.1f}", f"{worst:.1f}"))
+        self.stalls_listbox.delete(0, tk.END)
+        for stall in reversed(self.app.watchdog.stalls):
+            self.stalls_listbox.insert(tk.END, f"{stall['time']}  {stall['lag_ms']} ms  {stall['handler']}")
+        if instrumentation.profile_path:
+            self.profile_var.set(f"Waiting to profile next interaction → {instrumentation.profile_path}")
+        else:
+            self.profile_var.set("")
+        self.after(1000, self._refresh_loop)
+    def clear(self):
+        instrumentation.clear()
+        self.app.watchdog.stalls.clear()
+    def toggle_watchdog(self):
+        if self.watchdog_var.get():
+            self.app.watchdog.start()
+        else:
+            self.app.watchdog.stop()
+    def profile_next(self):
+        filepath = filedialog.asksaveasfilename(
+            title="Save Profile",
+            defaultextension=".pstats",
+            filetypes=[("pstats files", "*.pstats"), ("All files", "*.*")],
+            initialfile="sessionslice.pstats"
+        )
+        if filepath:
+            instrumentation.profile_next(filepath)
+            self.enabled_var.set(True)
+class TaskPicker(ttk.Frame):
+    """Type-ahead task entry: prefix matches come from a sorted name index, then a bounded substring scan.
+
+    The index is rebuilt only when the task catalog changes (``tasks_version``), so refreshing the
+    dashboard no longer copies every task name into a combobox.
+    """
+    MAX_RESULTS = 50
+    def __init__(self, parent, app, textvariable, width=30):
+        super().__init__(parent)
+        self.app, self.var = app, textvariable
+        self._index_version, self._keys, self._names, self._haystacks = None, [], [], []
+        self.popup = self.listbox = None
+        self.entry = ttk.Entry(self, textvariable=textvariable, width=width)
+        self.entry.pack(side=tk.LEFT)
+        ttk.Button(self, text="▾", width=2, command=lambda: self.show_popup(show_all=True)).pack(side=tk.LEFT)
+        self.entry.bind("<KeyRelease>", self._on_key)
+        self.entry.bind("<Down>", self._focus_list)
+        self.entry.bind("<Return>", lambda e: self._choose(0))
+        self.entry.bind("<Escape>", lambda e: self.hide_popup())
+        self.entry.bind("<FocusOut>", lambda e: self.after(150, self._hide_unless_focused))
+    def _ensure_index(self):
+        data = self.app.data
+        if self._index_version == data.tasks_version:
+            return
+        active = sorted((t["name"].lower(), t["name"], f"{t['name']} {t.get('project', '')}".lower())
+                        for t in data.tasks if not t.get("archived"))
+        self._keys = [key for key, _, _ in active]
+        self._names = [name for _, name, _ in active]
+        self._haystacks = [haystack for _, _, haystack in active]
+        self._index_version = data.tasks_version
+    def matches(self, query, limit=None):
+        """Active task names starting with ``query``, then those whose name or project contains it"""
+        self._ensure_index()
+        limit = limit or self.MAX_RESULTS
+        query = query.strip().lower()
+        if not query:
+            return self._names[:limit]
+        found = []
+        for i in range(bisect.bisect_left(self._keys, query), len(self._keys)):
+            if len(found) >= limit or not self._keys[i].startswith(query):
+                break
+            found.append(self._names[i])
+        if len(found) < limit:
+            prefixed = set(found)
+            for name, haystack in zip(self._names, self._haystacks):
+                if query in haystack and name not in prefixed:
+                    found.append(name)
+                    if len(found) >= limit:
+                        break
+        return found
+    def _on_key(self, event):
+        if event.keysym not in ("Down", "Up", "Return", "Escape", "Tab"):
+            self.show_popup()
+    def show_popup(self, show_all=False):
+        names = self.matches("" if show_all else self.var.get())
+        if not names:
+            self.hide_popup()
+            return
+        if self.popup is None:
+            self.popup = tk.Toplevel(self)
+            self.popup.overrideredirect(True)
+            self.listbox = tk.Listbox(self.popup, height=10, width=self.entry.cget("width"), exportselection=False,
+                                      bg=COLORS['surface'], fg=COLORS['text_primary'], selectbackground=COLORS['primary'],
+                                      selectforeground='white', borderwidth=1, highlightthickness=0)
+            self.listbox.pack(fill=tk.BOTH, expand=True)
+            self.listbox.bind("<ButtonRelease-1>", lambda e: self._choose(self.listbox.nearest(e.y)))
+            self.listbox.bind("<Return>", lambda e: self._choose(self.listbox.index(tk.ACTIVE)))
+            self.listbox.bind("<Escape>", lambda e: self.hide_popup())
+            self.listbox.bind("<FocusOut>", lambda e: self.after(150, self._hide_unless_focused))
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(tk.END, *names)
+        self.listbox.configure(height=min(10, len(names)))
+        self.popup.geometry(f"+{self.entry.winfo_rootx()}+{self.entry.winfo_rooty() + self.entry.winfo_height()}")
+        self.popup.lift()
+    def hide_popup(self):
+        if self.popup is not None:
+            self.popup.destroy()
+            self.popup = self.listbox = None
+    def _hide_unless_focused(self):
+        try:
+            focus = self.focus_get()
+        except (KeyError, tk.TclError):
+            focus = None
+        if focus is not self.entry and (self.listbox is None or focus is not self.listbox):
+            self.hide_popup()
+    def _focus_list(self, event=None):
+        if self.popup is None:
+            self.show_popup()
+        if self.listbox is not None:
+            self.listbox.focus_set()
+            self.listbox.selection_set(0)
+            self.listbox.activate(0)
+        return "break"
+    def _choose(self, index):
+        if self.listbox is not None and self.listbox.size():
+            self.var.set(self.listbox.get(index))
+        self.hide_popup()
+        self.entry.focus_set()
+        self.entry.icursor(tk.END)
+        return "break"
 class DashboardPage(ttk.Frame):
+    IDLE_SAMPLE_MS = 5000
     def __init__(self, parent, app):
         super().__init__(parent)
         self.app = app
@@ -494,6 +3084,11 @@ class DashboardPage(ttk.Frame):
         self.session_start_time = None
         self.break_count = 0
         self.interrupt_count = 0
+        self.session_events = []
+        self.paused_seconds = 0
+        self._paused_at = None
+        self._timer_job = None
+        self._idle_job = None
         self._build_widgets()
     def _build_widgets(self):
         ttk.Label(self, text="📊 Dashboard", style="Heading.TLabel").pack(pady=(0, 20))
@@ -516,9 +3111,8 @@ class DashboardPage(ttk.Frame):
         task_frame.pack(fill=tk.X, pady=5)
         ttk.Label(task_frame, text="Task:", width=12).pack(side=tk.LEFT, anchor=tk.W)
         self.task_var = tk.StringVar()
-        self.task_select = ttk.Combobox(task_frame, textvariable=self.task_var, state="readonly", width=30)
+        self.task_select = TaskPicker(task_frame, self.app, self.task_var, width=30)
         self.task_select.pack(side=tk.LEFT, padx=(5, 0))
-        self.task_select["values"] = self._task_names()
         type_frame = ttk.Frame(config_content)
         type_frame.pack(fill=tk.X, pady=5)
         ttk.Label(type_frame, text="Type:", width=12).pack(side=tk.LEFT, anchor=tk.W)
@@ -526,6 +3120,11 @@ class DashboardPage(ttk.Frame):
         self.type_select = ttk.Combobox(type_frame, textvariable=self.type_var, state="readonly", width=20)
         self.type_select.pack(side=tk.LEFT, padx=(5, 0))
         self.type_select["values"] = self._session_type_labels()
+        notes_frame = ttk.Frame(config_content)
+        notes_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(notes_frame, text="Notes:", width=12).pack(side=tk.LEFT, anchor=tk.W)
+        self.notes_var = tk.StringVar()
+        ttk.Entry(notes_frame, textvariable=self.notes_var, width=50).pack(side=tk.LEFT, padx=(5, 0))
         button_frame = ttk.Frame(self)
         button_frame.pack(pady=15)
         self.start_btn = ttk.Button(button_frame, text="▶️ Start Session", command=self.start_session, style="Modern.TButton")
@@ -562,17 +3161,20 @@ class DashboardPage(ttk.Frame):
         self.recent_listbox.configure(yscrollcommand=scrollbar.set)
         self.recent_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-    def _task_names(self):
-        return [t["name"] for t in self.app.data.tasks]
     def _session_type_labels(self):
-        return [f"{st['icon']} {st['name']}" for st in self.app.data.session_types]
+        return [self.app.data.type_label(st) for st in self.app.data.session_types]
     def start_session(self):
         task_name = self.task_var.get()
         if not task_name:
             messagebox.showwarning("Select Task", "Please select a task before starting the session.")
             return
+        if task_name not in self.app.data.task_by_name:
+            if not messagebox.askyesno("New Task", f"There is no task named '{task_name}'. Create it?"):
+                return
+            task = {"id": new_id(), "name": task_name, "project": "", "color": DEFAULT_TASK_COLOR}
+            self.app.data.apply_batch([("insert_task", task, len(self.app.data.tasks))], f"Add task '{task_name}'")
         session_type_label = self.type_var.get()
-        session_type = next((st for st in self.app.data.session_types if f"{st['icon']} {st['name']}" == session_type_label), None)
+        session_type = self.app.data.type_by_label.get(session_type_label)
         if not session_type:
             session_type = self.app.data.session_types[0]
         self.session_left = session_type.get("hours", 0) * 3600 + session_type.get("minutes", 25) * 60
@@ -584,59 +3186,145 @@ class DashboardPage(ttk.Frame):
         self.session_paused = False
         self.break_count = 0
         self.interrupt_count = 0
+        self.session_events = []
+        self.paused_seconds = 0
+        self._paused_at = None
         self.status_var.set(f"Working on: {task_name}")
         self.progress_bar.pack(pady=(10, 0))
         self.update_buttons_state()
         self.update_timer()
+        self._schedule_idle_check()
+        self._update_session_gauges()
         self.update_stats_labels()
-    def pause_resume_session(self):
+    def pause_resume_session(self, paused_at=None):
         if not self.session_running:
             return
         self.session_paused = not self.session_paused
+        if self.session_paused:
+            self._paused_at = paused_at or datetime.now()
+            if self._timer_job:
+                self.after_cancel(self._timer_job)
+                self._timer_job = None
+        else:
+            self.paused_seconds += (datetime.now() - self._paused_at).total_seconds()
+            self._paused_at = None
         self.pause_btn.config(text="▶️ Resume" if self.session_paused else "⏸️ Pause")
         self.status_var.set("Session paused" if self.session_paused else f"Working on: {self.task_var.get()}")
         if not self.session_paused:
             self.update_timer()
+        self._schedule_idle_check()
+        self._update_session_gauges()
+    def _update_session_gauges(self):
+        metrics_registry.set("sessionslice_session_active", int(self.session_running))
+        metrics_registry.set("sessionslice_session_paused", int(self.session_paused))
+        metrics_registry.set("sessionslice_session_start_timestamp_seconds",
+                             self.session_start_time.timestamp() if self.session_running else 0)
+    def timer_state(self):
+        """Plain snapshot of the current session for the local API"""
+        elapsed = 0
+        if self.session_running:
+            ended = self._paused_at if self.session_paused else datetime.now()
+            elapsed = int((ended - self.session_start_time).total_seconds() - self.paused_seconds)
+        return {"running": self.session_running, "paused": self.session_paused,
+                "task": self.task_var.get() if self.session_running else None,
+                "type": self.type_var.get() if self.session_running else None,
+                "remaining_seconds": self.session_left if self.session_running else 0,
+                "elapsed_seconds": elapsed, "breaks": self.break_count, "interruptions": self.interrupt_count}
+    def remote_command(self, action, params):
+        """Apply a start/pause/resume/stop request from the local API; returns (ok, message)"""
+        if action == "start":
+            if self.session_running:
+                return False, "A session is already running"
+            task, session_type = params.get("task") or self.task_var.get(), params.get("type")
+            if task not in self.app.data.task_by_name:
+                return False, f"Unknown task: {task}" if task else "No task given"
+            if session_type and session_type not in self.app.data.type_by_label:
+                return False, f"Unknown session type: {session_type}"
+            self.task_var.set(task)
+            if session_type:
+                self.type_var.set(session_type)
+            self.start_session()
+            return True, f"Started '{task}'"
+        if not self.session_running:
+            return False, "No session is running"
+        if action == "stop":
+            self.stop_session()
+            return True, "Session stopped"
+        if self.session_paused == (action == "pause"):
+            return False, f"Session is already {'paused' if self.session_paused else 'running'}"
+        self.pause_resume_session()
+        return True, "Session paused" if self.session_paused else "Session resumed"
+    def _schedule_idle_check(self):
+        """Sample input idleness every few seconds, only while a session is actively running"""
+        if self._idle_job:
+            self.after_cancel(self._idle_job)
+            self._idle_job = None
+        if self.session_running and not self.session_paused and self.app.data.app_settings["idle_auto_pause"]:
+            self._idle_job = self.after(self.IDLE_SAMPLE_MS, self._check_idle)
+    def _check_idle(self):
+        """Auto-pause past the idle threshold, backdating the pause to the last input so the idle tail isn't counted"""
+        self._idle_job = None
+        if not self.session_running or self.session_paused:
+            return
+        idle = self.app.idle_monitor.idle_seconds()
+        if idle < self.app.data.app_settings["idle_threshold_minutes"] * 60:
+            self._schedule_idle_check()
+            return
+        now = datetime.now()
+        idle_since = max(now - timedelta(seconds=idle), self.session_start_time)
+        self.session_left = min(self.total_session_time, self.session_left + int((now - idle_since).total_seconds()))
+        self._log_event("p", idle_since)
+        self.pause_resume_session(paused_at=idle_since)
+        mins, secs = divmod(self.session_left, 60)
+        self.timer_var.set(f"{mins:02d}:{secs:02d}")
+        self.status_var.set(f"Paused automatically: idle since {idle_since:%H:%M}")
     def stop_session(self):
         if not self.session_running or self.session_start_time is None:
             return
-        elapsed_minutes = round((datetime.now() - self.session_start_time).total_seconds() / 60, 1)
+        ended = self._paused_at if self.session_paused else datetime.now()  # a trailing pause is trimmed off
+        active_seconds = (ended - self.session_start_time).total_seconds() - self.paused_seconds
+        elapsed_minutes = round(max(active_seconds, 0) / 60, 1)
         session_type_label = self.type_var.get()
         task_name = self.task_var.get()
         session_date = self.session_start_time.strftime("%Y-%m-%d") if self.session_start_time else ""
         session_start = self.session_start_time.strftime("%H:%M") if self.session_start_time else ""
-        self.app.data.sessions.append({
+        task = self.app.data.task_by_name.get(task_name)
+        session_type = self.app.data.type_by_label.get(session_type_label)
+        session_id = new_id()
+        self.app.data.session_events.append(session_id, self.session_start_time, self.session_events,
+                                            self.notes_var.get().strip())
+        newly_unlocked = self.app.data.record_session({
+            "id": session_id,
+            "task_id": task["id"] if task else None,
+            "type_id": session_type["id"] if session_type else None,
             "name": task_name,
             "date": session_date,
             "start": session_start,
-            "end": datetime.now().strftime("%H:%M"),
+            "end": ended.strftime("%H:%M"),
             "duration": elapsed_minutes,
             "breaks": self.break_count,
             "interruptions": self.interrupt_count,
             "session_type": session_type_label
         })
-        self.app.data._update_user_stats()
-        newly_unlocked = self.app.data.check_and_unlock_achievements()
-        level_up, xp_gained, _ = self.app.data.add_xp(10, "Session completed")
+        level_up, xp_gained, _ = self.app.data.add_xp(XP_RULES["session"], "Session completed", "session", session_id)
         self.app.data.save_all()
-        for achievement_info in newly_unlocked:
-            achievement = achievement_info["achievement"]
-            level_up_from_achievement = achievement_info["level_up"]
-            xp_from_achievement = achievement_info["xp_gained"]
-            message = f"🎉 Achievement Unlocked: {achievement['name']}\n\n"
-            message += f"{achievement['description']}\n\n"
-            message += f"Reward: {xp_from_achievement} XP"
-            if level_up_from_achievement:
-                message += f"\n🌟 LEVEL UP! You are now Level {self.app.data.user_profile['level']}"
-            if achievement["badge"]:
-                message += f"\n🏅 New Badge: {achievement['badge']}"
-            messagebox.showinfo("Achievement Unlocked!", message)
+        toasts = self.app.toasts
+        toasts.notify("Session Complete!", f"'{task_name}' saved: {elapsed_minutes} minutes", "success", system=True)
+        toasts.notify_unlocks(newly_unlocked, self.app.data.user_profile["level"])
+        for note in self.app.data.drain_notifications():
+            toasts.notify(note["title"], note["message"], "success", system=True)
         self.session_running = False
         self.session_paused = False
         self.session_left = 0
         self.session_start_time = None
         self.break_count = 0
         self.interrupt_count = 0
+        self.session_events = []
+        self.paused_seconds = 0
+        self._paused_at = None
+        self._schedule_idle_check()
+        self._update_session_gauges()
+        self.notes_var.set("")
         self.timer_var.set("00:00")
         self.status_var.set("Ready to start")
         self.progress_bar.pack_forget()  # Hide progress bar
@@ -645,7 +3333,6 @@ class DashboardPage(ttk.Frame):
         self.interrupt_btn.config(text="🚨 Interruption (0)")  # Reset interrupt button
         self.update_buttons_state()
         self.update_stats()
-        messagebox.showinfo("Session Complete!", f"Great work! Session '{task_name}' completed and saved.\n\nDuration: {elapsed_minutes} minutes")
     def update_buttons_state(self):
         state_running = tk.NORMAL if self.session_running else tk.DISABLED
         self.pause_btn.config(state=state_running)
@@ -654,93 +3341,251 @@ class DashboardPage(ttk.Frame):
         self.interrupt_btn.config(state=state_running)
         self.start_btn.config(state=tk.DISABLED if self.session_running else tk.NORMAL)
     def update_timer(self):
+        self._timer_job = None
         if self.session_running and not self.session_paused:
             mins, secs = divmod(self.session_left, 60)
             self.timer_var.set(f"{mins:02d}:{secs:02d}")
             if self.session_left > 0:
                 self.session_left -= 1
-                self.after(1000, self.update_timer)
+                self._timer_job = self.after(1000, self.update_timer)
             else:
-                messagebox.showinfo("Session Complete", "Your session has completed!")
                 self.stop_session()
     def log_break(self):
         if self.session_running and not self.session_paused:
             self.break_count += 1
+            self._log_event("b")
             self.break_btn.config(text=f"☕ Break ({self.break_count})")
     def log_interrupt(self):
         if self.session_running and not self.session_paused:
             self.interrupt_count += 1
+            self._log_event("i")
             self.interrupt_btn.config(text=f"🚨 Interruption ({self.interrupt_count})")
+    def _log_event(self, kind, at=None):
+        self.session_events.append((int(((at or datetime.now()) - self.session_start_time).total_seconds()), kind))
     def update_stats(self):
-        self.task_select["values"] = self._task_names()
         self.type_select["values"] = self._session_type_labels()
         self.update_stats_labels()
         self.update_recent_sessions()
     def update_stats_labels(self):
         today = datetime.now().strftime("%Y-%m-%d")
         total_today = round(sum(s["duration"] for s in self.app.data.sessions if s["date"] == today))
-        streak = calculate_streak(self.app.data.sessions)
+        streak = self.app.data.current_streak()
         self.label_today.config(text=f"Today: {total_today} min")
         self.label_streak.config(text=f"Streak: {streak} day{'s' if streak != 1 else ''}")
     def update_recent_sessions(self):
         self.recent_listbox.delete(0, tk.END)
         for session in reversed(self.app.data.sessions[-15:]):
             text = (
-                f"{session['date']} | {session.get('session_type', '')} | {session['name']} | "
+                f"{session['date']} | {self.app.data.session_type_label(session)} | {self.app.data.session_task_name(session)} | "
                 f"{round(session.get('duration', 0))} min | Breaks: {session.get('breaks', 0)} | "
                 f"Interruptions: {session.get('interruptions', 0)}"
             )
             self.recent_listbox.insert(tk.END, text)
+    @instrumentation.instrumented()
     def refresh(self):
         self.update_stats()
 class TasksPage(ttk.Frame):
+    """Task catalog: projects as tree nodes with their tasks beneath, multi-select bulk actions and CSV import.
+
+    ``refresh`` diffs the rows it last drew (keyed by task id) against the current catalog and filter,
+    and only inserts, moves, updates or deletes the Treeview items that changed.
+    """
+    PROJECT_PREFIX = "project:"
     def __init__(self, parent, app):
         super().__init__(parent)
         self.app = app
+        self._rows = {}
+        self._project_rows = {}
+        self._drawn_key = None
+        self._pending = None
         self._build_widgets()
     def _build_widgets(self):
         ttk.Label(self, text="Tasks Management", font=("Segoe UI", 16, "bold")).pack(pady=10)
-        self.tree = ttk.Treeview(self, columns=("Project", "Color"), show="headings", selectmode="browse")
-        for col, text, width in [("Project", "Project", 150), ("Color", "Color", 100)]:
-            self.tree.heading(col, text=text)
+        filter_frame = ttk.Frame(self)
+        filter_frame.pack(fill=tk.X, padx=12, pady=(0, 6))
+        ttk.Label(filter_frame, text="Filter:").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        filter_entry = ttk.Entry(filter_frame, textvariable=self.filter_var, width=30)
+        filter_entry.pack(side=tk.LEFT, padx=6)
+        filter_entry.bind("<KeyRelease>", lambda e: self._schedule_refresh())
+        self.show_archived_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(filter_frame, text="Show archived", variable=self.show_archived_var,
+                        command=self.refresh).pack(side=tk.LEFT, padx=10)
+        self.count_var = tk.StringVar()
+        ttk.Label(filter_frame, textvariable=self.count_var, foreground=COLORS['text_secondary']).pack(side=tk.RIGHT)
+        tree_frame = ttk.Frame(self)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=12)
+        self.tree = ttk.Treeview(tree_frame, columns=("Color", "Sessions"), show="tree headings", selectmode="extended")
+        self.tree.heading("#0", text="Project / Task")
+        self.tree.column("#0", width=320)
+        for col, width in [("Color", 100), ("Sessions", 90)]:
+            self.tree.heading(col, text=col)
             self.tree.column(col, width=width)
-        self.tree.pack(fill=tk.BOTH, expand=True, padx=12)
+        self.tree.tag_configure("archived", foreground=COLORS['text_secondary'])
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.bind("<Double-1>", lambda e: self.edit_task())
         btn_frame = ttk.Frame(self)
         btn_frame.pack(pady=8)
-        for text, cmd in [("Add Task", self.add_task), ("Edit Task", self.edit_task), ("Delete Task", self.delete_task)]:
-            ttk.Button(btn_frame, text=text, command=cmd).pack(side=tk.LEFT, padx=8)
+        for text, cmd in [("Add Task", self.add_task), ("Edit", self.edit_task), ("Bulk Edit…", self.bulk_edit),
+                          ("Archive / Restore", self.toggle_archive), ("Delete", self.delete_task),
+                          ("Merge Into…", self.merge_task), ("Import CSV…", self.import_csv),
+                          ("Undo", self.app.undo), ("Redo", self.app.redo)]:
+            ttk.Button(btn_frame, text=text, command=cmd).pack(side=tk.LEFT, padx=4)
         self.refresh()
+    def _schedule_refresh(self):
+        if self._pending:
+            self.after_cancel(self._pending)
+        self._pending = self.after(150, self.refresh)
+    @instrumentation.instrumented()
     def refresh(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        for task in self.app.data.tasks:
-            self.tree.insert(
-                "",
-                tk.END,
-                values=(task.get("project", "General"), task.get("color", DEFAULT_TASK_COLOR)),
-                text=task["name"]
-            )
+        self._pending = None
+        data = self.app.data
+        query = self.filter_var.get().strip().lower()
+        show_archived = self.show_archived_var.get()
+        key = (data.tasks_version, data.data_version, query, show_archived)
+        if key == self._drawn_key:
+            return
+        self._drawn_key = key
+        wanted = {}
+        for task in data.tasks:
+            project = task.get("project") or "General"
+            if task.get("archived") and not show_archived:
+                continue
+            if query and query not in task["name"].lower() and query not in project.lower():
+                continue
+            wanted[task["id"]] = (project, task["name"], (task.get("color", DEFAULT_TASK_COLOR),
+                                                          len(data.sessions_by_task.get(task["id"], ()))),
+                                  ("archived",) if task.get("archived") else ())
+        tree, counts = self.tree, defaultdict(int)
+        for project, *_ in wanted.values():
+            counts[project] += 1
+        for task_id in [tid for tid in self._rows if tid not in wanted]:
+            tree.delete(task_id)
+            del self._rows[task_id]
+        for project in sorted(counts):
+            row = (f"📁 {project}", ("", f"{counts[project]} tasks"))
+            iid = self.PROJECT_PREFIX + project
+            if project not in self._project_rows:
+                tree.insert("", tk.END, iid=iid, text=row[0], values=row[1], open=bool(query))
+            elif self._project_rows[project] != row:
+                tree.item(iid, text=row[0], values=row[1])
+            self._project_rows[project] = row
+        for task_id, row in wanted.items():
+            previous = self._rows.get(task_id)
+            if previous == row:
+                continue
+            project, name, values, tags = row
+            if previous is None:
+                tree.insert(self.PROJECT_PREFIX + project, tk.END, iid=task_id, text=name, values=values, tags=tags)
+            else:
+                if previous[0] != project:
+                    tree.move(task_id, self.PROJECT_PREFIX + project, tk.END)
+                tree.item(task_id, text=name, values=values, tags=tags)
+            self._rows[task_id] = row
+        for project in [p for p in self._project_rows if p not in counts]:
+            tree.delete(self.PROJECT_PREFIX + project)
+            del self._project_rows[project]
+        self.count_var.set(f"{len(wanted)} of {len(data.tasks)} tasks in {len(counts)} projects")
+    def selected_task_ids(self):
+        """Selected tasks, with a selected project node standing for all of its visible tasks"""
+        ids = []
+        for iid in self.tree.selection():
+            ids.extend(self.tree.get_children(iid) if iid.startswith(self.PROJECT_PREFIX) else (iid,))
+        return list(dict.fromkeys(ids))
+    def _single_selection(self, action):
+        ids = self.selected_task_ids()
+        if len(ids) != 1:
+            messagebox.showwarning("Select Task", f"Select a single task to {action}.")
+            return None
+        return ids[0]
     def add_task(self):
         TaskDialog(self, self.app, None, self.refresh).grab_set()
     def edit_task(self):
-        sel = self.tree.focus()
-        if not sel:
-            messagebox.showwarning("Select Task", "Select a task to edit.")
-            return
-        name = self.tree.item(sel, "text")
-        task = next((t for t in self.app.data.tasks if t["name"] == name), None)
+        if len(self.selected_task_ids()) > 1:
+            return self.bulk_edit()
+        sel = self._single_selection("edit")
+        task = self.app.data.task_by_id.get(sel)
         if task:
             TaskDialog(self, self.app, task, self.refresh).grab_set()
+    def bulk_edit(self):
+        ids = self.selected_task_ids()
+        if not ids:
+            messagebox.showwarning("Select Tasks", "Select tasks (or a project) to edit.")
+            return
+        BulkTaskDialog(self, self.app, ids, self.refresh).grab_set()
+    def toggle_archive(self):
+        """Archive the selected tasks, or restore them if they are all archived already"""
+        ids = self.selected_task_ids()
+        if not ids:
+            messagebox.showwarning("Select Tasks", "Select tasks (or a project) to archive.")
+            return
+        tasks = [self.app.data.task_by_id[i] for i in ids]
+        archive = not all(t.get("archived") for t in tasks)
+        self.app.data.apply_batch([("update_task", t["id"], {"archived": archive}) for t in tasks],
+                                  f"{'Archive' if archive else 'Restore'} {len(tasks)} task(s)")
+        self.refresh()
     def delete_task(self):
-        sel = self.tree.focus()
-        if not sel:
+        ids = self.selected_task_ids()
+        if not ids:
             messagebox.showwarning("Select Task", "Select a task to delete.")
             return
-        name = self.tree.item(sel, "text")
-        if messagebox.askyesno("Confirm Delete", f"Delete task '{name}'?"):
-            self.app.data.tasks = [t for t in self.app.data.tasks if t["name"] != name]
-            self.app.data.save_all()
+        data = self.app.data
+        if len(ids) > 1:
+            if messagebox.askyesno("Confirm Delete", f"Delete {len(ids)} tasks? Their sessions keep the old names. "
+                                                     "(Ctrl+Z undoes this)"):
+                data.apply_batch([("delete_task", i) for i in ids], f"Delete {len(ids)} tasks")
+                self.refresh()
+            return
+        sel = ids[0]
+        name = data.task_by_id[sel]["name"]
+        session_count = len(data.sessions_by_task.get(sel, {}))
+        if session_count:
+            target = simpledialog.askstring(
+                "Delete Task",
+                f"'{name}' has {session_count} recorded sessions.\n\n"
+                "Enter a task to move them to, or leave blank to keep them under the old name:", parent=self)
+            if target is None:
+                return
+            if target.strip():
+                self._merge_into(sel, target.strip())
+                return
+        if messagebox.askyesno("Confirm Delete", f"Delete task '{name}'? (Ctrl+Z undoes this)"):
+            data.apply_batch([("delete_task", sel)], f"Delete task '{name}'")
             self.refresh()
+    def merge_task(self):
+        sel = self._single_selection("merge")
+        if not sel:
+            return
+        target = simpledialog.askstring("Merge Task", f"Merge '{self.app.data.task_by_id[sel]['name']}' and its history into task:", parent=self)
+        if target and target.strip():
+            self._merge_into(sel, target.strip())
+    def import_csv(self):
+        """Add tasks from a name,project,color CSV as a single undoable command"""
+        filepath = filedialog.askopenfilename(title="Import tasks", filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not filepath:
+            return
+        try:
+            tasks, skipped = self.app.data.tasks_from_csv(filepath)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            messagebox.showerror("Import Failed", f"Could not read {os.path.basename(filepath)}: {e}")
+            return
+        if tasks:
+            start = len(self.app.data.tasks)
+            self.app.data.apply_batch([("insert_task", task, start + i) for i, task in enumerate(tasks)],
+                                      f"Import {len(tasks)} tasks")
+            self.refresh()
+        messagebox.showinfo("Import Tasks", f"Imported {len(tasks)} tasks." + (f" Skipped {skipped} blank or duplicate rows." if skipped else ""))
+    def _merge_into(self, source_id, target_name):
+        target = self.app.data.task_by_name.get(target_name)
+        if not target or target["id"] == source_id:
+            messagebox.showerror("Merge Task", f"No other task named '{target_name}'.")
+            return
+        self.app.data.apply_batch([("merge_tasks", source_id, target["id"])],
+                                  f"Merge '{self.app.data.task_by_id[source_id]['name']}' into '{target_name}'")
+        self.refresh()
 class TaskDialog(ThemedDialog):
     def __init__(self, parent, app, task, refresh_cb):
         super().__init__(parent)
@@ -753,7 +3598,7 @@ class TaskDialog(ThemedDialog):
         ttk.Label(self, text="Task Name:", font=("Segoe UI", 11, "bold")).pack(anchor=tk.W, padx=12, pady=6)
         ttk.Entry(self, textvariable=self.name_var).pack(fill=tk.X, padx=12)
         ttk.Label(self, text="Project (optional):", font=("Segoe UI", 11)).pack(anchor=tk.W, padx=12, pady=6)
-        ttk.Entry(self, textvariable=self.project_var).pack(fill=tk.X, padx=12)
+        ttk.Combobox(self, textvariable=self.project_var, values=app.data.project_names()).pack(fill=tk.X, padx=12)
         self.color = task.get("color", DEFAULT_TASK_COLOR) if task else DEFAULT_TASK_COLOR
         ttk.Button(self, text="Pick Color", command=self.pick_color).pack(pady=10)
         btn_frame = ttk.Frame(self)
@@ -770,32 +3615,80 @@ class TaskDialog(ThemedDialog):
             messagebox.showerror("Validation Error", "Task name is required.")
             return
         project = self.project_var.get().strip()
+        existing = self.app.data.task_by_name.get(name)
+        if existing and existing is not self.task:
+            messagebox.showerror("Duplicate Task", "Task with this name already exists.")
+            return
         if self.task:
-            self.task["name"] = name
-            self.task["project"] = project
-            self.task["color"] = self.color
+            self.app.data.apply_batch([("update_task", self.task["id"], {"name": name, "project": project, "color": self.color})],
+                                      f"Edit task '{name}'")
         else:
-            if any(t["name"] == name for t in self.app.data.tasks):
-                messagebox.showerror("Duplicate Task", "Task with this name already exists.")
-                return
-            self.app.data.tasks.append({"name": name, "project": project, "color": self.color})
-        self.app.data.save_all()
+            task = {"id": new_id(), "name": name, "project": project, "color": self.color}
+            self.app.data.apply_batch([("insert_task", task, len(self.app.data.tasks))], f"Add task '{name}'")
         self.refresh_cb()
         self.destroy()
+class BulkTaskDialog(ThemedDialog):
+    """Move several tasks to a project and/or recolour them as one undoable command"""
+    def __init__(self, parent, app, task_ids, refresh_cb):
+        super().__init__(parent)
+        self.app, self.task_ids, self.refresh_cb = app, task_ids, refresh_cb
+        self.title(f"Edit {len(task_ids)} Tasks")
+        self.geometry("350x200")
+        self.resizable(False, False)
+        self.move_var = tk.BooleanVar(value=False)
+        self.project_var = tk.StringVar()
+        ttk.Checkbutton(self, text="Move to project:", variable=self.move_var).pack(anchor=tk.W, padx=12, pady=6)
+        ttk.Combobox(self, textvariable=self.project_var, values=app.data.project_names()).pack(fill=tk.X, padx=12)
+        self.color = None
+        self.color_btn = ttk.Button(self, text="Pick Color (unchanged)", command=self.pick_color)
+        self.color_btn.pack(pady=10)
+        btn_frame = ttk.Frame(self)
+        btn_frame.pack(pady=8)
+        ttk.Button(btn_frame, text="Save", command=self.save).pack(side=tk.LEFT, padx=8)
+        ttk.Button(btn_frame, text="Cancel", command=self.destroy).pack(side=tk.LEFT, padx=8)
+    def pick_color(self):
+        c = colorchooser.askcolor(color=self.color or DEFAULT_TASK_COLOR)
+        if c[1]:
+            self.color = c[1]
+            self.color_btn.config(text=f"Pick Color ({self.color})")
+    def save(self):
+        fields = {}
+        if self.move_var.get():
+            fields["project"] = self.project_var.get().strip()
+        if self.color:
+            fields["color"] = self.color
+        if fields:
+            self.app.data.apply_batch([("update_task", task_id, dict(fields)) for task_id in self.task_ids],
+                                      f"Edit {len(self.task_ids)} tasks")
+            self.refresh_cb()
+        self.destroy()
 class ReportsPage(ttk.Frame):
     def __init__(self, parent, app):
         super().__init__(parent)
         self.app = app
+        self.generator = None
         ttk.Label(self, text="Reports & Analytics", font=("Segoe UI", 16, "bold")).pack(pady=10)
+        export_frame = ttk.Frame(self)
+        export_frame.pack(pady=(0, 5))
+        self.report_period_var = tk.StringVar(value="weekly")
+        ttk.Combobox(export_frame, textvariable=self.report_period_var, values=list(ReportGenerator.PERIODS),
+                     state="readonly", width=10).pack(side=tk.LEFT, padx=5)
+        self.report_format_var = tk.StringVar(value="html")
+        ttk.Combobox(export_frame, textvariable=self.report_format_var, values=list(ReportGenerator.FORMATS),
+                     state="readonly", width=6).pack(side=tk.LEFT, padx=5)
+        self.export_button = ttk.Button(export_frame, text="📄 Export Report", command=self.export_report,
+                                        style="Secondary.TButton")
+        self.export_button.pack(side=tk.LEFT, padx=5)
         self.fig = Figure(figsize=(7, 4), dpi=100)
         self.ax = self.fig.add_subplot(111)
         self.canvas = FigureCanvasTkAgg(self.fig, master=self)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=15)
+    @instrumentation.instrumented()
     def refresh(self):
         self.ax.clear()
         type_time = defaultdict(float)
         for s in self.app.data.sessions[-30:]:
-            type_time[s.get("session_type", "Unknown")] += s.get("duration", 0)
+            type_time[self.app.data.session_type_label(s)] += s.get("duration", 0)
         labels = list(type_time.keys())
         sizes = [type_time[l] for l in labels]
         if not labels:
@@ -803,7 +3696,34 @@ class ReportsPage(ttk.Frame):
             sizes = [1]
         self.ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
         self.ax.set_title("Time Distribution by Session Type (Last 30 Sessions)")
-        self.canvas.draw()
+        with instrumentation.measure("ReportsPage.draw"):
+            self.canvas.draw()
+    def export_report(self):
+        """Aggregate on the UI thread, then render and write the report in the background"""
+        output_dir = filedialog.askdirectory(title="Save report to", initialdir=os.path.abspath(REPORTS_DIR))
+        if not output_dir:
+            return
+        if self.generator is None:
+            self.generator = ReportGenerator(self.app.data)
+        period, fmt = self.report_period_var.get(), self.report_format_var.get()
+        start_date, end_date = self.generator.period_range(period)
+        charts, stats = self.generator.payloads(start_date, end_date)
+        title = f"SessionSlice {period.title()} Report: {start_date} – {end_date}"
+        path = os.path.join(output_dir, f"sessionslice-{period}-{end_date}.{fmt}")
+        self.export_button.config(state="disabled")
+        def worker():
+            try:
+                self.generator.write(path, title, charts, stats, fmt)
+                self.app.call_in_main_thread(self._export_finished, f"Report saved to {path}", None)
+            except Exception as e:
+                self.app.call_in_main_thread(self._export_finished, None, f"Could not write report: {e}")
+        threading.Thread(target=worker, daemon=True).start()
+    def _export_finished(self, message, error):
+        self.export_button.config(state="normal")
+        if error:
+            messagebox.showerror("Export Failed", error)
+        else:
+            messagebox.showinfo("Report Exported", message)
 class SettingsPage(ttk.Frame):
     def __init__(self, parent, app):
         super().__init__(parent)
@@ -821,6 +3741,15 @@ class SettingsPage(ttk.Frame):
         self.session_types_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.session_types_frame, text="⏱️ Session Types")
         self._build_session_types_tab()
+        self.idle_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.idle_frame, text="💤 Idle & Alerts")
+        self._build_idle_tab()
+        self.integrations_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.integrations_frame, text="🔌 Integrations")
+        self._build_integrations_tab()
+        self.storage_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.storage_frame, text="🗄️ Storage")
+        self._build_storage_tab()
     def _build_themes_tab(self):
         theme_card = ttk.Frame(self.themes_frame, style="Card.TFrame")
         theme_card.pack(fill=tk.X, padx=20, pady=(20, 10))
@@ -896,6 +3825,162 @@ class SettingsPage(ttk.Frame):
                   command=self.add_type, style="Modern.TButton").pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(btn_frame, text="🗑️ Delete Selected", 
                   command=self.del_type).pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="🔀 Merge Into…",
+                  command=self.merge_type).pack(side=tk.LEFT, padx=10)
+    def _build_idle_tab(self):
+        idle_card = ttk.Frame(self.idle_frame, style="Card.TFrame")
+        idle_card.pack(fill=tk.X, padx=20, pady=20)
+        ttk.Label(idle_card, text="💤 Idle Detection & Notifications",
+                 font=(FONT_FAMILY, FONT_SIZES['large'], 'bold')).pack(anchor=tk.W, padx=20, pady=(15, 10))
+        settings = self.app.data.app_settings
+        self.idle_enabled_var = tk.BooleanVar(value=settings["idle_auto_pause"])
+        ttk.Checkbutton(idle_card, text="Pause running sessions automatically when I'm away",
+                        variable=self.idle_enabled_var).pack(anchor=tk.W, padx=20, pady=5)
+        threshold_frame = ttk.Frame(idle_card)
+        threshold_frame.pack(fill=tk.X, padx=20, pady=5)
+        ttk.Label(threshold_frame, text="Idle after (minutes):", width=20).pack(side=tk.LEFT)
+        self.idle_threshold_var = tk.IntVar(value=settings["idle_threshold_minutes"])
+        ttk.Spinbox(threshold_frame, from_=1, to=120, textvariable=self.idle_threshold_var, width=6).pack(side=tk.LEFT)
+        self.os_notifications_var = tk.BooleanVar(value=settings["os_notifications"])
+        ttk.Checkbutton(idle_card, text="Also show desktop notifications" + ("" if NOTIFICATIONS_AVAILABLE else " (requires plyer)"),
+                        variable=self.os_notifications_var).pack(anchor=tk.W, padx=20, pady=5)
+        ttk.Label(idle_card, text=f"Activity source: {self.app.idle_monitor.backend}"
+                                  + (" (input to this window only)" if self.app.idle_monitor.backend == "tk" else ""),
+                  foreground=COLORS['text_secondary']).pack(anchor=tk.W, padx=20, pady=5)
+        ttk.Button(idle_card, text="💾 Save", command=self.save_idle_settings,
+                   style="Modern.TButton").pack(anchor=tk.W, padx=20, pady=(5, 15))
+    def save_idle_settings(self):
+        try:
+            threshold = int(self.idle_threshold_var.get())
+        except (tk.TclError, ValueError):
+            threshold = 0
+        if threshold < 1:
+            messagebox.showerror("Invalid Threshold", "Idle threshold must be a whole number of minutes (1 or more).")
+            return
+        self.app.data.app_settings.update(idle_auto_pause=self.idle_enabled_var.get(), idle_threshold_minutes=threshold,
+                                          os_notifications=self.os_notifications_var.get())
+        save_json(APP_SETTINGS_FILE, self.app.data.app_settings)
+        self.app.pages["Dashboard"]._schedule_idle_check()
+        self.app.toasts.notify("Settings Saved", "Session settings saved.")
+    def _build_integrations_tab(self):
+        api_card = ttk.Frame(self.integrations_frame, style="Card.TFrame")
+        api_card.pack(fill=tk.X, padx=20, pady=20)
+        ttk.Label(api_card, text="🔌 Local API & Metrics",
+                 font=(FONT_FAMILY, FONT_SIZES['large'], 'bold')).pack(anchor=tk.W, padx=20, pady=(15, 10))
+        settings = self.app.data.app_settings
+        self.api_enabled_var = tk.BooleanVar(value=settings["api_enabled"])
+        ttk.Checkbutton(api_card, text="Serve a JSON API on localhost for status bars and editor plugins",
+                        variable=self.api_enabled_var).pack(anchor=tk.W, padx=20, pady=5)
+        port_frame = ttk.Frame(api_card)
+        port_frame.pack(fill=tk.X, padx=20, pady=5)
+        ttk.Label(port_frame, text="Port:", width=20).pack(side=tk.LEFT)
+        self.api_port_var = tk.IntVar(value=settings["api_port"])
+        ttk.Spinbox(port_frame, from_=1024, to=65535, textvariable=self.api_port_var, width=8).pack(side=tk.LEFT)
+        server = self.app.api_server
+        status = f"Running on http://127.0.0.1:{server.port}" if server else "Not running"
+        ttk.Label(api_card, text=f"{status}. Changes apply on next start.",
+                  foreground=COLORS['text_secondary']).pack(anchor=tk.W, padx=20, pady=5)
+        token_frame = ttk.Frame(api_card)
+        token_frame.pack(fill=tk.X, padx=20, pady=5)
+        ttk.Label(token_frame, text="X-SessionSlice-Token:", width=20).pack(side=tk.LEFT)
+        token_var = tk.StringVar(value=server.token if server else LocalApiServer.load_token())
+        ttk.Entry(token_frame, textvariable=token_var, width=40, state="readonly").pack(side=tk.LEFT)
+        textfile_frame = ttk.Frame(api_card)
+        textfile_frame.pack(fill=tk.X, padx=20, pady=5)
+        ttk.Label(textfile_frame, text="Metrics textfile (.prom):", width=20).pack(side=tk.LEFT)
+        self.metrics_textfile_var = tk.StringVar(value=settings["metrics_textfile"])
+        ttk.Entry(textfile_frame, textvariable=self.metrics_textfile_var, width=40).pack(side=tk.LEFT)
+        ttk.Label(api_card, text="Prometheus can also scrape /metrics on the local API.",
+                  foreground=COLORS['text_secondary']).pack(anchor=tk.W, padx=20)
+        ttk.Button(api_card, text="💾 Save", command=self.save_integration_settings,
+                   style="Modern.TButton").pack(anchor=tk.W, padx=20, pady=(5, 15))
+        sync_card = ttk.Frame(self.integrations_frame, style="Card.TFrame")
+        sync_card.pack(fill=tk.X, padx=20, pady=(0, 20))
+        ttk.Label(sync_card, text="🔄 Device Sync",
+                 font=(FONT_FAMILY, FONT_SIZES['large'], 'bold')).pack(anchor=tk.W, padx=20, pady=(15, 10))
+        ttk.Label(sync_card, text="Point every device at the same shared folder (e.g. a synced cloud drive).",
+                  foreground=COLORS['text_secondary']).pack(anchor=tk.W, padx=20)
+        folder_frame = ttk.Frame(sync_card)
+        folder_frame.pack(fill=tk.X, padx=20, pady=5)
+        ttk.Label(folder_frame, text="Sync folder:", width=20).pack(side=tk.LEFT)
+        self.sync_folder_var = tk.StringVar(value=settings["sync_folder"])
+        ttk.Entry(folder_frame, textvariable=self.sync_folder_var, width=40).pack(side=tk.LEFT)
+        ttk.Button(folder_frame, text="Browse...", command=self._browse_sync_folder).pack(side=tk.LEFT, padx=5)
+        self.sync_status_label = ttk.Label(sync_card, text=f"This device: {self.app.data.sync.device}",
+                                           foreground=COLORS['text_secondary'])
+        self.sync_status_label.pack(anchor=tk.W, padx=20, pady=5)
+        ttk.Button(sync_card, text="🔄 Sync Now", command=self.sync_now,
+                   style="Modern.TButton").pack(anchor=tk.W, padx=20, pady=(5, 15))
+    def _browse_sync_folder(self):
+        folder = filedialog.askdirectory(title="Sync folder", initialdir=self.sync_folder_var.get() or os.path.expanduser("~"))
+        if folder:
+            self.sync_folder_var.set(folder)
+    def sync_now(self):
+        folder = self.sync_folder_var.get().strip()
+        if not folder or not os.path.isdir(os.path.expanduser(folder)):
+            messagebox.showerror("Sync Folder", "Choose an existing folder to sync through.")
+            return
+        self.app.data.app_settings["sync_folder"] = folder
+        changed = self.app.sync_now()
+        last = self.app.data.sync.last_sync
+        self.sync_status_label.config(text=f"This device: {self.app.data.sync.device} — last sync "
+                                           f"{last:%H:%M:%S}, {changed} change{'s' if changed != 1 else ''} received"
+                                      if last else "Sync failed; see the console for details.")
+    def _build_storage_tab(self):
+        storage_card = ttk.Frame(self.storage_frame, style="Card.TFrame")
+        storage_card.pack(fill=tk.X, padx=20, pady=20)
+        ttk.Label(storage_card, text="🗄️ Session Archive",
+                 font=(FONT_FAMILY, FONT_SIZES['large'], 'bold')).pack(anchor=tk.W, padx=20, pady=(15, 10))
+        ttk.Label(storage_card, text="Whole years older than the horizon move into compressed, read-only yearly files.\n"
+                                     "Statistics, analytics and the calendar still include them.",
+                  foreground=COLORS['text_secondary']).pack(anchor=tk.W, padx=20)
+        horizon_frame = ttk.Frame(storage_card)
+        horizon_frame.pack(fill=tk.X, padx=20, pady=5)
+        ttk.Label(horizon_frame, text="Archive after (days, 0 = never):", width=28).pack(side=tk.LEFT)
+        self.archive_days_var = tk.IntVar(value=self.app.data.app_settings["archive_after_days"])
+        ttk.Spinbox(horizon_frame, from_=0, to=3650, increment=30, textvariable=self.archive_days_var,
+                    width=6).pack(side=tk.LEFT)
+        self.archive_status_label = ttk.Label(storage_card, foreground=COLORS['text_secondary'])
+        self.archive_status_label.pack(anchor=tk.W, padx=20, pady=5)
+        self._update_archive_status()
+        ttk.Button(storage_card, text="🗄️ Save & Archive Now", command=self.archive_now,
+                   style="Modern.TButton").pack(anchor=tk.W, padx=20, pady=(5, 15))
+    def _update_archive_status(self):
+        data = self.app.data
+        archive = data.archive
+        size = sum(os.path.getsize(os.path.join(archive.directory, s["file"])) for s in archive.segments
+                   if os.path.exists(os.path.join(archive.directory, s["file"])))
+        years = archive.years
+        self.archive_status_label.config(
+            text=f"{len(data.sessions)} sessions in the active file; "
+                 + (f"{archive.totals()['sessions']} archived ({years[0]}–{years[-1]}, {size / 1024:.0f} KB)"
+                    if years else "nothing archived yet"))
+    def archive_now(self):
+        try:
+            days = int(self.archive_days_var.get())
+        except (tk.TclError, ValueError):
+            days = -1
+        if days < 0:
+            messagebox.showerror("Invalid Horizon", "The archive horizon must be 0 or a whole number of days.")
+            return
+        self.app.data.app_settings["archive_after_days"] = days
+        save_json(APP_SETTINGS_FILE, self.app.data.app_settings)
+        archived = self.app.archive_old_sessions()
+        self._update_archive_status()
+        self.app.toasts.notify("Archive", f"Archived {archived} sessions." if archived else "Nothing old enough to archive.")
+    def save_integration_settings(self):
+        try:
+            port = int(self.api_port_var.get())
+        except (tk.TclError, ValueError):
+            port = 0
+        if not 1024 <= port <= 65535:
+            messagebox.showerror("Invalid Port", "Port must be a number between 1024 and 65535.")
+            return
+        self.app.data.app_settings.update(api_enabled=self.api_enabled_var.get(), api_port=port,
+                                          metrics_textfile=self.metrics_textfile_var.get().strip(),
+                                          sync_folder=self.sync_folder_var.get().strip())
+        save_json(APP_SETTINGS_FILE, self.app.data.app_settings)
+        self.app.toasts.notify("Settings Saved", "Integration settings saved; restart to apply.")
     def _update_theme_preview(self):
         """Update the color preview based on current theme"""
         try:
@@ -1004,6 +4089,7 @@ class SettingsPage(ttk.Frame):
                 self.app.theme_manager.delete_custom_theme(selected)
                 self.refresh()
                 messagebox.showinfo("Theme Deleted", f"Custom theme '{selected}' has been deleted.")
+    @instrumentation.instrumented()
     def refresh(self):
         """Refresh all settings data"""
         self._refresh_themes()
@@ -1021,7 +4107,7 @@ class SettingsPage(ttk.Frame):
         for i in self.tree.get_children():
             self.tree.delete(i)
         for st in self.app.data.session_types:
-            self.tree.insert("", tk.END,
+            self.tree.insert("", tk.END, iid=st["id"],
                              values=(st.get("color", "#000000"), 
                                    st.get("hours", 0), 
                                    st.get("minutes", 25)),
@@ -1035,14 +4121,28 @@ class SettingsPage(ttk.Frame):
         if not sel:
             messagebox.showwarning("Select", "Please select a session type to delete.")
             return
-        idx = self.tree.index(sel)
-        if 0 <= idx < len(self.app.data.session_types):
-            st = self.app.data.session_types[idx]
-            label = f"{st.get('icon','')} {st.get('name','')}"
-            if messagebox.askyesno("Delete", f"Delete session type {label}?"):
-                del self.app.data.session_types[idx]
-                self.app.data.save_all()
+        st = self.app.data.type_by_id.get(sel)
+        if st:
+            label = self.app.data.type_label(st)
+            if messagebox.askyesno("Delete", f"Delete session type {label}? (Ctrl+Z undoes this)"):
+                self.app.data.apply_batch([("delete_type", sel)], f"Delete session type {label}")
                 self.refresh()
+    def merge_type(self):
+        """Merge the selected session type and its history into another type"""
+        sel = self.tree.focus()
+        if not sel:
+            messagebox.showwarning("Select", "Please select a session type to merge.")
+            return
+        target_name = simpledialog.askstring("Merge Session Type", "Merge into session type named:", parent=self)
+        if not target_name:
+            return
+        target = next((st for st in self.app.data.session_types if st.get("name") == target_name.strip()), None)
+        if not target or target["id"] == sel:
+            messagebox.showerror("Merge Session Type", f"No other session type named '{target_name}'.")
+            return
+        self.app.data.apply_batch([("merge_types", sel, target["id"])],
+                                  f"Merge session type {self.app.data.type_label(self.app.data.type_by_id[sel])} into {target_name.strip()}")
+        self.refresh()
 class ThemeEditorDialog(ThemedDialog):
     def __init__(self, parent, app, refresh_callback):
         super().__init__(parent)
@@ -1222,13 +4322,14 @@ class SessionTypeDialog(ThemedDialog):
         minutes = self.minutes_var.get()
         color = self.color
         if self.stype:
-            self.stype.update({"icon": icon, "name": name, "color": color, "hours": hours, "minutes": minutes})
+            self.app.data.apply_batch([("update_type", self.stype["id"], {"icon": icon, "name": name, "color": color, "hours": hours, "minutes": minutes})],
+                                      f"Edit session type {name}")
         else:
             if any(s.get("name") == name for s in self.app.data.session_types):
                 messagebox.showerror("Duplicate", "Session type with that name exists.")
                 return
-            self.app.data.session_types.append({"icon": icon, "name": name, "color": color, "hours": hours, "minutes": minutes})
-        self.app.data.save_all()
+            st = {"id": new_id(), "icon": icon, "name": name, "color": color, "hours": hours, "minutes": minutes}
+            self.app.data.apply_batch([("insert_type", st, len(self.app.data.session_types))], f"Add session type {name}")
         self.refresh_cb()
         self.destroy()
 class CalendarPage(ttk.Frame):
@@ -1276,6 +4377,7 @@ class CalendarPage(ttk.Frame):
         else:
             self.current_date = self.current_date.replace(month=self.current_date.month+1)
         self.refresh()
+    @instrumentation.instrumented()
     def refresh(self):
         self.month_var.set(self.current_date.strftime("%B %Y"))
         for widget in self.day_buttons.values():
@@ -1288,8 +4390,8 @@ class CalendarPage(ttk.Frame):
                 if day == 0:
                     continue
                 date_str = f"{self.current_date.year}-{self.current_date.month:02d}-{day:02d}"
-                session_count = month_sessions.get(date_str, 0)
-                session_time = sum(s["duration"] for s in self.app.data.sessions if s["date"] == date_str)
+                row = month_sessions.get(date_str)
+                session_count, session_time = (row["sessions"], row["minutes"]) if row else (0, 0)
                 btn_text = f"{day}"
                 if session_count > 0:
                     btn_text += f"\n{session_count}s, {int(session_time)}m"
@@ -1308,29 +4410,351 @@ class CalendarPage(ttk.Frame):
         for i in range(1, len(month_calendar)+1):
             self.calendar_frame.rowconfigure(i, weight=1)
     def _get_month_sessions(self):
-        """Get session count by date for current month"""
+        """Session count and minutes by date for the current month, from the day rollups (archive included)"""
         month_start = f"{self.current_date.year}-{self.current_date.month:02d}-01"
         month_end = f"{self.current_date.year}-{self.current_date.month:02d}-31"
-        sessions_by_date = defaultdict(int)
-        for session in self.app.data.sessions:
-            if month_start <= session["date"] <= month_end:
-                sessions_by_date[session["date"]] += 1
-        return sessions_by_date
+        return {key: row for key, row in self.app.data.rollups.rows("day", month_start, month_end) if row["sessions"]}
     def show_day_details(self, day):
-        date_str = f"{self.current_date.year}-{self.current_date.month:02d}-{day:02d}"
-        day_sessions = [s for s in self.app.data.sessions if s["date"] == date_str]
-        if not day_sessions:
-            messagebox.showinfo("No Sessions", f"No sessions recorded for {date_str}")
-            return
-        details = f"Sessions for {date_str}:\n\n"
-        for session in day_sessions:
-            details += f"• {session['name']} ({session.get('session_type', '')})\n"
-            details += f"  {session['start']} - {session['end']} ({session['duration']:.1f} min)\n\n"
-        messagebox.showinfo("Session Details", details)
+        """Open the timeline on the clicked day"""
+        self.app.show_timeline(date(self.current_date.year, self.current_date.month, day))
+class TimelinePage(ttk.Frame):
+    """Gantt-style timeline: one lane per task, time on the x axis, break/interruption markers on the bars.
+
+    The view is a window ``[view_start, view_start + span)`` in minutes since day 0 of the proleptic
+    calendar. Each redraw fetches only the days in that window through the data layer's date index
+    and clears and redraws a single canvas, so zooming and panning cost the same across years.
+    Lanes that do not fit scroll vertically; only the lanes in view are drawn.
+    """
+    SPANS = {"Day": 1440, "Week": 7 * 1440}
+    MIN_SPAN, MAX_SPAN = 30, 120 * 1440
+    TICK_STEPS = [15, 30, 60, 120, 180, 360, 720, 1440, 2 * 1440, 7 * 1440, 14 * 1440, 28 * 1440]
+    AXIS_HEIGHT, LABEL_WIDTH, MIN_LANE, MAX_LANE = 34, 130, 18, 34
+    MARKER_MIN_MINUTES_PER_PX = 2.0  # hide event markers when zoomed out further than this
+    MARKERS = {"b": ("secondary", "Break"), "i": ("error", "Interruption"), "p": ("text_secondary", "Idle pause")}
+    def __init__(self, parent, app):
+        super().__init__(parent)
+        self.app = app
+        self.span = self.SPANS["Day"]
+        self.view_start = date.today().toordinal() * 1440
+        self._pending = None
+        self._drag = None
+        self._bars = {}
+        self.lane_offset, self._lane_count, self._lanes_in_view = 0, 0, 1
+        self._build_widgets()
+    def _build_widgets(self):
+        header_frame = ttk.Frame(self)
+        header_frame.pack(fill=tk.X, pady=(0, 20))
+        ttk.Label(header_frame, text="🕘 Timeline", style="Heading.TLabel").pack()
+        controls_card = ttk.Frame(self, style="Card.TFrame")
+        controls_card.pack(fill=tk.X, pady=(0, 15), padx=20)
+        controls = ttk.Frame(controls_card)
+        controls.pack(fill=tk.X, padx=20, pady=10)
+        ttk.Button(controls, text="◀", command=lambda: self.pan(-self.span), style="Secondary.TButton").pack(side=tk.LEFT)
+        ttk.Button(controls, text="Today", command=self.go_today).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="▶", command=lambda: self.pan(self.span), style="Secondary.TButton").pack(side=tk.LEFT)
+        self.range_var = tk.StringVar()
+        ttk.Label(controls, textvariable=self.range_var, font=(FONT_FAMILY, FONT_SIZES['medium'], 'bold')).pack(side=tk.LEFT, padx=15)
+        for text, factor in (("＋", 0.5), ("－", 2.0)):
+            ttk.Button(controls, text=text, width=3, command=lambda f=factor: self.zoom(f)).pack(side=tk.RIGHT, padx=2)
+        self.view_var = tk.StringVar(value="Day")
+        for name in ("Week", "Day"):
+            ttk.Radiobutton(controls, text=name, value=name, variable=self.view_var,
+                            command=self._on_view_change).pack(side=tk.RIGHT, padx=5)
+        timeline_card = ttk.Frame(self, style="Card.TFrame")
+        timeline_card.pack(fill=tk.BOTH, expand=True, padx=20)
+        self.lane_scrollbar = ttk.Scrollbar(timeline_card, orient="vertical", command=self._on_lane_scroll)
+        self.lane_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
+        self.canvas = tk.Canvas(timeline_card, bg=COLORS['surface'], highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.status_var = tk.StringVar(value="Scroll to zoom (over task names: scroll lanes), drag or Shift+scroll to pan, click a bar for details.")
+        ttk.Label(self, textvariable=self.status_var, foreground=COLORS['text_secondary']).pack(anchor=tk.W, padx=25, pady=8)
+        self.canvas.bind("<Configure>", lambda e: self.schedule_redraw())
+        self.canvas.bind("<ButtonPress-1>", self._on_press)
+        self.canvas.bind("<B1-Motion>", self._on_drag)
+        self.canvas.bind("<ButtonRelease-1>", self._on_release)
+        self.canvas.bind("<MouseWheel>", lambda e: self._on_wheel(e, 1 if e.delta > 0 else -1))
+        self.canvas.bind("<Shift-MouseWheel>", lambda e: self.pan(-self.span / 10 if e.delta > 0 else self.span / 10))
+        self.canvas.bind("<Button-4>", lambda e: self._on_wheel(e, 1))
+        self.canvas.bind("<Button-5>", lambda e: self._on_wheel(e, -1))
+        self.canvas.bind("<Shift-Button-4>", lambda e: self.pan(-self.span / 10))
+        self.canvas.bind("<Shift-Button-5>", lambda e: self.pan(self.span / 10))
+    def refresh(self):
+        self.schedule_redraw()
+    def _on_theme_change(self):
+        self.canvas.config(bg=COLORS['surface'])
+        self.schedule_redraw()
+    def show_day(self, day):
+        """Jump to a single-day view of ``day`` (a date)"""
+        self.view_var.set("Day")
+        self.span = self.SPANS["Day"]
+        self.view_start = day.toordinal() * 1440
+        self.schedule_redraw()
+    def go_today(self):
+        self.view_start = date.today().toordinal() * 1440 - (self.span - 1440 if self.span > 1440 else 0)
+        self.schedule_redraw()
+    def _on_view_change(self):
+        self.span = self.SPANS[self.view_var.get()]
+        self.view_start = self.view_start // 1440 * 1440
+        if self.span == self.SPANS["Week"]:
+            self.view_start -= date.fromordinal(int(self.view_start // 1440)).weekday() * 1440
+        self.schedule_redraw()
+    def pan(self, minutes):
+        self.view_start += minutes
+        self.schedule_redraw()
+    def zoom(self, factor, anchor=None):
+        """Scale the visible span by ``factor`` keeping the time under ``anchor`` (a canvas x) in place"""
+        width = self._plot_width()
+        fraction = (anchor - self.LABEL_WIDTH) / width if anchor is not None else 0.5
+        fraction = min(max(fraction, 0), 1)
+        pivot = self.view_start + fraction * self.span
+        self.span = min(max(self.span * factor, self.MIN_SPAN), self.MAX_SPAN)
+        self.view_start = pivot - fraction * self.span
+        self.schedule_redraw()
+    def _on_wheel(self, event, direction):
+        if event.x < self.LABEL_WIDTH:
+            self.scroll_lanes(-3 * direction)
+        else:
+            self.zoom(0.8 if direction > 0 else 1.25, anchor=event.x)
+    def scroll_lanes(self, rows):
+        self.lane_offset += rows
+        self.schedule_redraw()
+    def _on_lane_scroll(self, action, amount, unit=None):
+        """Scrollbar protocol: ``moveto fraction`` or ``scroll n units|pages``"""
+        if action == "moveto":
+            self.lane_offset = round(float(amount) * self._lane_count)
+            self.schedule_redraw()
+        else:
+            self.scroll_lanes(int(amount) * (self._lanes_in_view if unit == "pages" else 1))
+    def _on_press(self, event):
+        self._drag = (event.x, self.view_start, False)
+    def _on_drag(self, event):
+        if self._drag:
+            x, start, _ = self._drag
+            self._drag = (x, start, True)
+            self.view_start = start - (event.x - x) * self.span / self._plot_width()
+            self.schedule_redraw()
+    def _on_release(self, event):
+        dragged = self._drag and self._drag[2]
+        self._drag = None
+        if not dragged:
+            self._show_details(self.canvas.find_withtag("current"))
+    def schedule_redraw(self):
+        """Coalesce redraw requests from wheel/drag bursts into one per idle cycle"""
+        if self._pending is None:
+            self._pending = self.after_idle(self.redraw)
+    def _plot_width(self):
+        return max(self.canvas.winfo_width() - self.LABEL_WIDTH - 10, 50)
+    @staticmethod
+    def session_interval(session):
+        """(start, end) in timeline minutes; end comes from the wall-clock end, crossing midnight if needed"""
+        day = date.fromisoformat(session["date"]).toordinal() * 1440
+        start = FocusHeatmap._minute_of_day(session.get("start"))
+        end = FocusHeatmap._minute_of_day(session.get("end")) if session.get("end") else start + session.get("duration", 0)
+        if end < start or (end == start and session.get("duration", 0) > 0):
+            end += 1440
+        return day + start, day + max(end, start + 1)
+    def visible_sessions(self):
+        """Sessions overlapping the view, fetched day by day through the date index (plus the day before, for overnight bars)"""
+        first = date.fromordinal(int(self.view_start // 1440) - 1)
+        last = date.fromordinal(int((self.view_start + self.span) // 1440))
+        end = self.view_start + self.span
+        visible = []
+        for session in self.app.data.sessions_between(first.isoformat(), last.isoformat()):
+            start, stop = self.session_interval(session)
+            if stop > self.view_start and start < end:
+                visible.append((start, stop, session))
+        return visible
+    @instrumentation.instrumented()
+    def redraw(self):
+        self._pending = None
+        canvas = self.canvas
+        canvas.delete("all")
+        self._bars = {}
+        width, height = self._plot_width(), max(canvas.winfo_height(), 100)
+        scale = width / self.span
+        view_end = self.view_start + self.span
+        x_of = lambda minute: self.LABEL_WIDTH + (minute - self.view_start) * scale
+        start_day, end_day = date.fromordinal(int(self.view_start // 1440)), date.fromordinal(int((view_end - 1) // 1440))
+        self.range_var.set(start_day.strftime("%a %d %b %Y") if start_day == end_day
+                           else f"{start_day:%d %b %Y} – {end_day:%d %b %Y}")
+        step = next((s for s in self.TICK_STEPS if s * scale >= 80), self.TICK_STEPS[-1])
+        tick = -(-self.view_start // step) * step
+        while tick < view_end:
+            x = x_of(tick)
+            midnight = tick % 1440 == 0
+            canvas.create_line(x, self.AXIS_HEIGHT, x, height, fill=COLORS['border'], dash=() if midnight else (2, 4))
+            moment = datetime.fromordinal(int(tick // 1440)) + timedelta(minutes=tick % 1440)
+            label = moment.strftime("%a %d %b") if midnight else moment.strftime("%H:%M")
+            canvas.create_text(x + 3, self.AXIS_HEIGHT / 2, text=label, anchor=tk.W, fill=COLORS['text_secondary'],
+                               font=(FONT_FAMILY, FONT_SIZES['small']))
+            tick += step
+        visible = self.visible_sessions()
+        data = self.app.data
+        lanes = {}
+        for start, stop, session in sorted(visible, key=lambda item: item[0]):
+            lanes.setdefault(session.get("task_id") or session.get("name"), []).append((start, stop, session))
+        available = height - self.AXIS_HEIGHT - 10
+        lane_height = min(self.MAX_LANE, max(self.MIN_LANE, available / max(len(lanes), 1)))
+        self._lane_count, self._lanes_in_view = len(lanes), max(1, int(available // lane_height))
+        self.lane_offset = min(max(self.lane_offset, 0), max(len(lanes) - self._lanes_in_view, 0))
+        if lanes:
+            self.lane_scrollbar.set(self.lane_offset / len(lanes), min((self.lane_offset + self._lanes_in_view) / len(lanes), 1))
+        else:
+            self.lane_scrollbar.set(0, 1)
+            canvas.create_text(self.LABEL_WIDTH + width / 2, height / 2, text="No sessions in this period",
+                               fill=COLORS['text_secondary'], font=(FONT_FAMILY, FONT_SIZES['medium']))
+            return
+        show_markers = self.span / width <= self.MARKER_MIN_MINUTES_PER_PX
+        in_view = list(lanes.items())[self.lane_offset:self.lane_offset + self._lanes_in_view]
+        for row, (key, items) in enumerate(in_view):
+            top = self.AXIS_HEIGHT + 5 + row * lane_height
+            task = data.task_by_id.get(key)
+            color = task.get("color", DEFAULT_TASK_COLOR) if task else DEFAULT_TASK_COLOR
+            canvas.create_text(8, top + lane_height / 2, text=data.session_task_name(items[0][2])[:18], anchor=tk.W,
+                               fill=COLORS['text_primary'], font=(FONT_FAMILY, FONT_SIZES['small']))
+            for start, stop, session in items:
+                x0, x1 = max(x_of(start), self.LABEL_WIDTH), min(x_of(stop), self.LABEL_WIDTH + width)
+                bar = canvas.create_rectangle(x0, top + 3, max(x1, x0 + 2), top + lane_height - 3, fill=color,
+                                              outline=COLORS['surface'], tags=("session",))
+                self._bars[bar] = session
+                if show_markers and x1 - x0 > 6:
+                    self._draw_markers(session, start, top, lane_height, x_of)
+    def _draw_markers(self, session, start, top, lane_height, x_of):
+        record = self.app.data.session_events.get(session.get("id"))
+        if not record:
+            return
+        started = datetime.fromisoformat(record["started"])
+        base = started.toordinal() * 1440 + started.hour * 60 + started.minute + started.second / 60
+        for offset, kind in record["events"]:
+            x = x_of(base + offset / 60)
+            color = COLORS[self.MARKERS.get(kind, ("text_secondary",))[0]]
+            self.canvas.create_polygon(x - 4, top, x + 4, top, x, top + 6, fill=color, outline="")
+            self.canvas.create_line(x, top + 6, x, top + lane_height - 3, fill=color)
+    def _show_details(self, items):
+        session = self._bars.get(items[0]) if items else None
+        if not session:
+            return
+        data = self.app.data
+        record = data.session_events.get(session.get("id"))
+        counts = {}
+        for _, kind in (record or {}).get("events", []):
+            counts[kind] = counts.get(kind, 0) + 1
+        events = ", ".join(f"{n} {self.MARKERS[k][1].lower()}{'s' if n != 1 else ''}" for k, n in counts.items() if k in self.MARKERS)
+        notes = data.session_events.notes(session.get("id"))
+        self.status_var.set(f"{data.session_task_name(session)} · {data.session_type_label(session)} · {session['date']} "
+                            f"{session.get('start', '?')}–{session.get('end', '?')} · {session.get('duration', 0):.1f} min"
+                            + (f" · {events}" if events else "") + (f" · 📝 {notes}" if notes else ""))
+class SearchPage(ttk.Frame):
+    def __init__(self, parent, app):
+        super().__init__(parent)
+        self.app = app
+        self.filters = {}
+        self._pending = None
+        self._build_widgets()
+    def _build_widgets(self):
+        header_frame = ttk.Frame(self)
+        header_frame.pack(fill=tk.X, pady=(0, 20))
+        ttk.Label(header_frame, text="🔍 Search Sessions", style="Heading.TLabel").pack()
+        controls_card = ttk.Frame(self, style="Card.TFrame")
+        controls_card.pack(fill=tk.X, pady=(0, 15), padx=20)
+        controls_frame = ttk.Frame(controls_card)
+        controls_frame.pack(fill=tk.X, padx=20, pady=15)
+        self.query_var = tk.StringVar()
+        query_entry = ttk.Entry(controls_frame, textvariable=self.query_var, width=40)
+        query_entry.pack(side=tk.LEFT, padx=(0, 10))
+        query_entry.bind("<KeyRelease>", lambda e: self._schedule_search())
+        ttk.Label(controls_frame, text="From:").pack(side=tk.LEFT)
+        self.from_var = tk.StringVar(value=self.app.data.archive.hot_start())  # archived years only when asked for
+        ttk.Entry(controls_frame, textvariable=self.from_var, width=11).pack(side=tk.LEFT, padx=(5, 10))
+        ttk.Label(controls_frame, text="To:").pack(side=tk.LEFT)
+        self.to_var = tk.StringVar()
+        ttk.Entry(controls_frame, textvariable=self.to_var, width=11).pack(side=tk.LEFT, padx=(5, 10))
+        ttk.Button(controls_frame, text="Search", command=self.refresh, style="Secondary.TButton").pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls_frame, text="Clear Filters", command=self.clear_filters).pack(side=tk.LEFT, padx=5)
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.status_var, font=(FONT_FAMILY, FONT_SIZES['small']),
+                  foreground=COLORS['text_secondary']).pack(anchor=tk.W, padx=20)
+        facets_frame = ttk.Frame(self)
+        facets_frame.pack(fill=tk.X, padx=20, pady=(5, 10))
+        self.facet_lists = {}
+        for facet in SessionSearchIndex.FACETS:
+            column = ttk.Frame(facets_frame)
+            column.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=3)
+            ttk.Label(column, text=facet.title(), font=(FONT_FAMILY, FONT_SIZES['normal'], 'bold')).pack(anchor=tk.W)
+            listbox = tk.Listbox(column, height=6, exportselection=False, font=(FONT_FAMILY, FONT_SIZES['small']),
+                                 bg=COLORS['surface'], fg=COLORS['text_primary'], selectbackground=COLORS['primary'],
+                                 selectforeground='white', borderwidth=0, highlightthickness=0)
+            listbox.pack(fill=tk.BOTH, expand=True)
+            listbox.bind("<<ListboxSelect>>", lambda e, f=facet: self._toggle_facet(f))
+            self.facet_lists[facet] = listbox
+        results_card = ttk.Frame(self, style="Card.TFrame")
+        results_card.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 15))
+        columns = ("Date", "Time", "Task", "Type", "Duration", "Interruptions")
+        self.results_tree = ttk.Treeview(results_card, columns=columns, show="headings")
+        for col, width in zip(columns, (90, 100, 180, 120, 80, 90)):
+            self.results_tree.heading(col, text=col)
+            self.results_tree.column(col, width=width)
+        scrollbar = ttk.Scrollbar(results_card, orient="vertical", command=self.results_tree.yview)
+        self.results_tree.configure(yscrollcommand=scrollbar.set)
+        self.results_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0), pady=10)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
+    def _schedule_search(self):
+        """Debounce typing so one query runs per pause in keystrokes"""
+        if self._pending:
+            self.after_cancel(self._pending)
+        self._pending = self.after(150, self.refresh)
+    def _toggle_facet(self, facet):
+        listbox = self.facet_lists[facet]
+        selection = listbox.curselection()
+        if not selection:
+            return
+        value = listbox.get(selection[0]).rsplit(" (", 1)[0]
+        if self.filters.get(facet) == value:
+            del self.filters[facet]
+        else:
+            self.filters[facet] = value
+        self.refresh()
+    def clear_filters(self):
+        self.filters.clear()
+        self.from_var.set(self.app.data.archive.hot_start())
+        self.to_var.set("")
+        self.refresh()
+    @instrumentation.instrumented()
+    def refresh(self):
+        self._pending = None
+        start_date, end_date = self.from_var.get().strip() or None, self.to_var.get().strip() or None
+        try:
+            for value in (start_date, end_date):
+                if value:
+                    datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            self.status_var.set("Dates must be in YYYY-MM-DD format")
+            return
+        started = time.perf_counter()
+        result = self.app.data.search_index.search(self.query_var.get(), start_date, end_date, self.filters)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        active = ", ".join(f"{f}={v}" for f, v in self.filters.items())
+        hot_start = self.app.data.archive.hot_start()
+        self.status_var.set(f"{result['total']} matching sessions ({elapsed_ms:.1f} ms)" + (f" — filters: {active}" if active else "")
+                            + (" — archived years excluded, clear From to include them" if hot_start and start_date == hot_start else ""))
+        for facet, listbox in self.facet_lists.items():
+            listbox.delete(0, tk.END)
+            for value, count in result["facets"][facet]:
+                listbox.insert(tk.END, f"{value} ({count})")
+                if self.filters.get(facet) == value:
+                    listbox.itemconfig(tk.END, foreground=COLORS['primary'])
+        self.results_tree.delete(*self.results_tree.get_children())
+        for s in result["results"]:
+            self.results_tree.insert("", tk.END, values=(
+                s["date"], f"{s.get('start', '')}-{s.get('end', '')}", self.app.data.session_task_name(s),
+                self.app.data.session_type_label(s), f"{s.get('duration', 0):.1f} min", s.get("interruptions", 0)))
 class AnalyticsPage(ttk.Frame):
+    PRESET_DAYS = {"Last 7 Days": 7, "Last 30 Days": 30, "Last 90 Days": 90}
+    LINE_POINT_BUDGET = 120
     def __init__(self, parent, app):
         super().__init__(parent)
         self.app = app
+        self._pending = None
         self._build_widgets()
     def _build_widgets(self):
         header_frame = ttk.Frame(self)
@@ -1344,14 +4768,35 @@ class AnalyticsPage(ttk.Frame):
                  font=(FONT_FAMILY, FONT_SIZES['medium'], 'bold')).pack(side=tk.LEFT, padx=(0, 10))
         self.period_var = tk.StringVar(value="Last 30 Days")
         period_combo = ttk.Combobox(controls_frame, textvariable=self.period_var,
-                                  values=["Last 7 Days", "Last 30 Days", "Last 90 Days", "This Year"],
+                                  values=["Last 7 Days", "Last 30 Days", "Last 90 Days", "This Year", "Custom Range"],
                                   state="readonly", width=15)
         period_combo.pack(side=tk.LEFT, padx=(0, 10))
         period_combo.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+        ttk.Label(controls_frame, text="From:").pack(side=tk.LEFT)
+        self.from_var = tk.StringVar()
+        from_entry = ttk.Entry(controls_frame, textvariable=self.from_var, width=11)
+        from_entry.pack(side=tk.LEFT, padx=(5, 10))
+        ttk.Label(controls_frame, text="To:").pack(side=tk.LEFT)
+        self.to_var = tk.StringVar()
+        to_entry = ttk.Entry(controls_frame, textvariable=self.to_var, width=11)
+        to_entry.pack(side=tk.LEFT, padx=(5, 10))
+        for entry in (from_entry, to_entry):
+            entry.bind("<Return>", lambda e: self._use_custom_range())
+        self.compare_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(controls_frame, text="Compare to previous period", variable=self.compare_var,
+                        command=self.refresh).pack(side=tk.LEFT, padx=10)
         ttk.Button(controls_frame, text="🔄 Refresh", command=self.refresh, 
                   style="Secondary.TButton").pack(side=tk.LEFT, padx=10)
-        charts_frame = ttk.Frame(self)
-        charts_frame.pack(fill=tk.BOTH, expand=True, padx=20)
+        slider_frame = ttk.Frame(controls_card)
+        slider_frame.pack(fill=tk.X, padx=20, pady=(0, 15))
+        self.range_label = ttk.Label(slider_frame, text="Last 30 days", width=14)
+        self.range_label.pack(side=tk.LEFT)
+        self.range_scale = ttk.Scale(slider_frame, from_=1, to=365, value=30, command=self._on_range_slide)
+        self.range_scale.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
+        self.charts_notebook = ttk.Notebook(self)
+        self.charts_notebook.pack(fill=tk.BOTH, expand=True, padx=20)
+        charts_frame = ttk.Frame(self.charts_notebook)
+        self.charts_notebook.add(charts_frame, text="Overview")
         left_card = ttk.Frame(charts_frame, style="Card.TFrame")
         left_card.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 10))
         ttk.Label(left_card, text="Session Type Distribution", 
@@ -1368,6 +4813,25 @@ class AnalyticsPage(ttk.Frame):
         self.line_ax = self.line_fig.add_subplot(111)
         self.line_canvas = FigureCanvasTkAgg(self.line_fig, master=right_card)
         self.line_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.heatmap_card = ttk.Frame(self.charts_notebook, style="Card.TFrame")
+        self.charts_notebook.add(self.heatmap_card, text="🕒 Time of Day")
+        self.heatmap_fig = Figure(figsize=(10, 4), dpi=80)
+        self.heatmap_canvas = FigureCanvasTkAgg(self.heatmap_fig, master=self.heatmap_card)
+        self.heatmap_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self._heatmap_drawn_version = None
+        self.interruptions_card = ttk.Frame(self.charts_notebook, style="Card.TFrame")
+        self.charts_notebook.add(self.interruptions_card, text="🚨 Interruptions")
+        self.interruptions_fig = Figure(figsize=(10, 4), dpi=80)
+        self.interruptions_canvas = FigureCanvasTkAgg(self.interruptions_fig, master=self.interruptions_card)
+        self.interruptions_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self._interruptions_drawn_version = None
+        self.xp_card = ttk.Frame(self.charts_notebook, style="Card.TFrame")
+        self.charts_notebook.add(self.xp_card, text="⭐ XP")
+        self.xp_fig = Figure(figsize=(10, 4), dpi=80)
+        self.xp_canvas = FigureCanvasTkAgg(self.xp_fig, master=self.xp_card)
+        self.xp_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self._xp_drawn_version = None
+        self.charts_notebook.bind("<<NotebookTabChanged>>", lambda e: self._update_tab_charts())
         stats_card = ttk.Frame(self, style="Card.TFrame")
         stats_card.pack(fill=tk.X, pady=(15, 0), padx=20)
         ttk.Label(stats_card, text="📊 Statistics Summary", 
@@ -1382,61 +4846,230 @@ class AnalyticsPage(ttk.Frame):
         self.avg_session_label.pack(side=tk.LEFT, padx=10)
         self.most_productive_label = ttk.Label(self.stats_frame, text="Most Productive Day: N/A")
         self.most_productive_label.pack(side=tk.LEFT, padx=10)
-    def refresh(self):
-        period = self.period_var.get()
-        sessions = self._get_sessions_for_period(period)
-        if not sessions:
-            self._show_empty_charts()
-            self._update_stats([])
-            return
-        self._update_pie_chart(sessions)
-        self._update_line_chart(sessions)
-        self._update_stats(sessions)
-    def _get_sessions_for_period(self, period):
-        """Get sessions for the selected time period"""
+        self.comparison_label = ttk.Label(stats_card, text="", foreground=COLORS['text_secondary'])
+        self.comparison_label.pack(anchor=tk.W, padx=30)
+        self.task_share_label = ttk.Label(stats_card, text="", foreground=COLORS['text_secondary'])
+        self.task_share_label.pack(anchor=tk.W, padx=30, pady=(0, 15))
+    def _use_custom_range(self):
+        self.period_var.set("Custom Range")
+        self.refresh()
+    def _on_range_slide(self, value):
+        """Slider drag: move the custom range and update the comparison now, redraw charts once dragging pauses"""
+        days = int(float(value))
         today = datetime.now().date()
-        if period == "Last 7 Days":
-            start_date = today - timedelta(days=7)
-        elif period == "Last 30 Days":
-            start_date = today - timedelta(days=30)
-        elif period == "Last 90 Days":
-            start_date = today - timedelta(days=90)
-        elif period == "This Year":
+        self.range_label.config(text=f"Last {days} days")
+        self.from_var.set((today - timedelta(days=days - 1)).isoformat())
+        self.to_var.set(today.isoformat())
+        self.period_var.set("Custom Range")
+        self._update_comparison(self._get_period_range())
+        if self._pending:
+            self.after_cancel(self._pending)
+        self._pending = self.after(200, self.refresh)
+    @staticmethod
+    def preset_range(period, today=None):
+        """Inclusive (start, end) YYYY-MM-DD bounds of a preset period"""
+        today = today or datetime.now().date()
+        if period == "This Year":
             start_date = date(today.year, 1, 1)
         else:
-            start_date = today - timedelta(days=30)
-        start_date_str = start_date.strftime("%Y-%m-%d")
-        return [s for s in self.app.data.sessions if s["date"] >= start_date_str]
-    def _update_pie_chart(self, sessions):
+            start_date = today - timedelta(days=AnalyticsPage.PRESET_DAYS.get(period, 30))
+        return start_date.isoformat(), today.isoformat()
+    def _get_period_range(self):
+        """Bounds of the selected period, or None when the custom dates are invalid"""
+        if self.period_var.get() != "Custom Range":
+            start_date, end_date = self.preset_range(self.period_var.get())
+            self.from_var.set(start_date)
+            self.to_var.set(end_date)
+            return start_date, end_date
+        try:
+            start, end = date.fromisoformat(self.from_var.get().strip()), date.fromisoformat(self.to_var.get().strip())
+        except ValueError:
+            self.comparison_label.config(text="Dates must be in YYYY-MM-DD format")
+            return None
+        if start > end:
+            start, end = end, start
+        return start.isoformat(), end.isoformat()
+    def _update_tab_charts(self):
+        self._update_heatmap()
+        self._update_interruptions()
+        self._update_xp_chart()
+    @instrumentation.instrumented()
+    def refresh(self):
+        self._pending = None
+        self._update_tab_charts()
+        day_keys = self.app.data.rollups.tables["day"]
+        if day_keys:
+            span = (datetime.now().date() - date.fromisoformat(min(day_keys))).days + 1
+            self.range_scale.config(to=max(span, 365))
+        bounds = self._get_period_range()
+        if bounds is None:
+            return
+        summary = self.app.data.rollups.summarize(*bounds)
+        self._update_comparison(bounds)
+        if not summary["total_sessions"]:
+            self._show_empty_charts()
+            self._update_stats(None)
+            return
+        self._update_pie_chart(summary)
+        self._update_line_chart(summary)
+        self._update_stats(summary)
+    def _update_comparison(self, bounds):
+        """Deltas against the equally long period before ``bounds``, read from year/month/day rollups"""
+        if not bounds or not self.compare_var.get():
+            self.comparison_label.config(text="")
+            self.task_share_label.config(text="")
+            return
+        result = self.app.data.rollups.compare(*bounds)
+        current, previous = result["current"], result["previous"]
+        prev_start, prev_end = result["previous_range"]
+        self.comparison_label.config(text=(
+            f"vs {prev_start} – {prev_end}:  "
+            f"Total {self._format_delta(current['total_minutes'], previous['total_minutes'])}   "
+            f"Avg Session {self._format_delta(current['avg_session'], previous['avg_session'])}   "
+            f"Interruptions/h {current['interruptions_per_hour']:.1f} "
+            f"({current['interruptions_per_hour'] - previous['interruptions_per_hour']:+.1f})"))
+        shares = sorted(current["task_share"].items(), key=lambda item: item[1], reverse=True)[:4]
+        self.task_share_label.config(text="Task share:  " + "   ".join(
+            f"{name} {share * 100:.0f}% ({(share - previous['task_share'].get(name, 0)) * 100:+.0f}pp)"
+            for name, share in shares) if shares else "")
+    @staticmethod
+    def _format_delta(current, previous):
+        if not previous:
+            return "(new)" if current else "(–)"
+        change = (current - previous) / previous * 100
+        return f"{'▲' if change >= 0 else '▼'} {abs(change):.0f}%"
+    def _update_pie_chart(self, summary):
         self.pie_ax.clear()
-        type_time = defaultdict(float)
-        for s in sessions:
-            session_type = s.get("session_type", "Unknown")
-            type_time[session_type] += s.get("duration", 0)
+        type_time = summary["type_time"]
         if type_time:
             labels = list(type_time.keys())
             sizes = list(type_time.values())
-            cmap = cm.get_cmap("Set3", len(labels))
+            cmap = plt.get_cmap("Set3", len(labels))
             colors = [cmap(i) for i in range(len(labels))]
             self.pie_ax.pie(sizes, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
             self.pie_ax.set_title(f"Time Distribution ({self.period_var.get()})")
-        self.pie_canvas.draw()
-    def _update_line_chart(self, sessions):
+        with instrumentation.measure("AnalyticsPage.pie_draw"):
+            self.pie_canvas.draw()
+    def _update_line_chart(self, summary):
         self.line_ax.clear()
-        daily_time = defaultdict(float)
-        for s in sessions:
-            daily_time[s["date"]] += s.get("duration", 0) / 60  # Convert to hours
+        daily_time = summary["daily_time"]
         if daily_time:
-            dates = sorted(daily_time.keys())
-            times = [daily_time[d] for d in dates]
-            date_objects = np.array([datetime.strptime(d, "%Y-%m-%d") for d in dates])
-            self.line_ax.plot(date_objects, times, marker='o', linewidth=2, markersize=4)
-            self.line_ax.set_title(f"Daily Productivity ({self.period_var.get()})")
-            self.line_ax.set_ylabel("Hours")
+            dates, hours, bucket = self.line_series(daily_time, self.LINE_POINT_BUDGET)
+            self.line_ax.plot(dates, hours, marker='o' if len(dates) <= 60 else None, linewidth=2, markersize=4)
+            title = "Daily Productivity" if bucket == "day" else f"Productivity, {bucket}ly average"
+            self.line_ax.set_title(f"{title} ({self.period_var.get()})")
+            self.line_ax.set_ylabel("Hours" if bucket == "day" else "Hours / day")
             self.line_ax.tick_params(axis='x', rotation=45)
             self.line_ax.grid(True, alpha=0.3)
             self.line_fig.autofmt_xdate()
-        self.line_canvas.draw()
+        with instrumentation.measure("AnalyticsPage.line_draw"):
+            self.line_canvas.draw()
+    @staticmethod
+    def line_series(daily_time, budget):
+        """Plot points for a {YYYY-MM-DD: minutes} series, bucketed by week or month and then
+        LTTB-downsampled so at most ``budget`` points are drawn whatever the range length"""
+        days = np.array(sorted(daily_time), dtype="datetime64[D]")
+        minutes = np.array([daily_time[d] for d in np.datetime_as_string(days)], dtype=np.float64)
+        span = int((days[-1] - days[0]).astype(np.int64)) + 1
+        if span <= budget:
+            return days, minutes / 60, "day"
+        if span <= budget * 7:
+            bucket = "week"
+            starts = days - ((days.astype(np.int64) + 3) % 7)  # Monday of each ISO week
+        else:
+            bucket = "month"
+            starts = days.astype("datetime64[M]").astype("datetime64[D]")
+        keys, inverse = np.unique(starts, return_inverse=True)
+        totals = np.bincount(inverse, weights=minutes)
+        if bucket == "week":
+            lengths = np.full(len(keys), 7)
+        else:
+            lengths = ((keys.astype("datetime64[M]") + 1).astype("datetime64[D]") - keys).astype(np.int64)
+        hours = totals / lengths / 60
+        if len(keys) > budget:
+            picked = lttb(keys.astype(np.int64).astype(np.float64), hours, budget)
+            keys, hours = keys[picked], hours[picked]
+        return keys, hours, bucket
+    def _update_heatmap(self):
+        """Redraw the time-of-day heatmap only when its tab is visible and the data changed"""
+        if self.charts_notebook.select() != str(self.heatmap_card):
+            return
+        heatmap = self.app.data.heatmap
+        grid = heatmap.get_grid()
+        if self._heatmap_drawn_version == heatmap.version:
+            return
+        self._heatmap_drawn_version = heatmap.version
+        self.heatmap_fig.clear()
+        heat_ax, hour_ax = self.heatmap_fig.subplots(2, 1, sharex=True, gridspec_kw={"height_ratios": [3, 1.3]})
+        image = heat_ax.imshow(grid / 60, aspect="auto", cmap="YlOrRd", extent=(-0.5, 23.5, 6.5, -0.5))
+        heat_ax.set_yticks(range(7))
+        heat_ax.set_yticklabels(FocusHeatmap.WEEKDAYS)
+        heat_ax.set_title("Hours Worked by Weekday and Time of Day (All Time)")
+        self.heatmap_fig.colorbar(image, ax=heat_ax, label="Hours")
+        hour_totals = grid.sum(axis=0) / 60
+        hour_ax.bar(range(24), hour_totals, color=COLORS['primary'])
+        hour_ax.set_xticks(range(0, 24, 2))
+        hour_ax.set_xticklabels([f"{h:02d}:00" for h in range(0, 24, 2)], rotation=45)
+        hour_ax.set_ylabel("Hours")
+        hour_ax.grid(True, axis="y", alpha=0.3)
+        self.heatmap_fig.colorbar(image, ax=hour_ax).ax.set_visible(False)  # keep both axes the same width
+        self.heatmap_fig.tight_layout()
+        with instrumentation.measure("AnalyticsPage.heatmap_draw"):
+            self.heatmap_canvas.draw()
+    def _update_interruptions(self):
+        """Redraw the interruption clustering charts only when their tab is visible and new events arrived"""
+        if self.charts_notebook.select() != str(self.interruptions_card):
+            return
+        events = self.app.data.session_events
+        by_elapsed, by_hour = events.interruption_profile()
+        if self._interruptions_drawn_version == events.version:
+            return
+        self._interruptions_drawn_version = events.version
+        self.interruptions_fig.clear()
+        elapsed_ax, hour_ax = self.interruptions_fig.subplots(1, 2)
+        bin_minutes = SessionEventLog.BIN_MINUTES
+        elapsed_ax.bar(np.arange(len(by_elapsed)) * bin_minutes, by_elapsed, width=bin_minutes * 0.9, align="edge",
+                       color=COLORS['error'])
+        elapsed_ax.set_title("Interruptions by Minutes into Session")
+        elapsed_ax.set_xlabel(f"Minutes ({bin_minutes}-minute bins, last bin {SessionEventLog.MAX_MINUTES}+)")
+        hour_ax.bar(range(24), by_hour, color=COLORS['warning'])
+        hour_ax.set_title("Interruptions by Hour of Day")
+        hour_ax.set_xticks(range(0, 24, 2))
+        hour_ax.set_xticklabels([f"{h:02d}:00" for h in range(0, 24, 2)], rotation=45)
+        for ax in (elapsed_ax, hour_ax):
+            ax.set_ylabel("Interruptions")
+            ax.grid(True, axis="y", alpha=0.3)
+        self.interruptions_fig.tight_layout()
+        with instrumentation.measure("AnalyticsPage.interruptions_draw"):
+            self.interruptions_canvas.draw()
+    def _update_xp_chart(self):
+        """Cumulative XP over time from the XP ledger, redrawn only when visible and the ledger changed"""
+        if self.charts_notebook.select() != str(self.xp_card):
+            return
+        ledger = self.app.data.xp_ledger
+        series = ledger.series()
+        version = (ledger.entries, ledger.rules)
+        if self._xp_drawn_version == version:
+            return
+        self._xp_drawn_version = version
+        self.xp_fig.clear()
+        ax = self.xp_fig.add_subplot(111)
+        if series:
+            days = np.array([day for day, _ in series], dtype="datetime64[D]")
+            totals = np.array([total for _, total in series])
+            ax.step(days, totals, where="post", color=COLORS['primary'], linewidth=2)
+            ax.fill_between(days, totals, step="post", color=COLORS['primary'], alpha=0.15)
+            for level in range(100, int(totals[-1]) + 1, max(100, int(totals[-1]) // 800 * 100)):
+                ax.axhline(level, color=COLORS['text_secondary'], linewidth=0.5, alpha=0.3)
+            ax.set_title(f"Total XP Over Time (level {self.app.data.user_profile['level']})")
+            ax.set_ylabel("XP")
+            self.xp_fig.autofmt_xdate()
+        else:
+            ax.text(0.5, 0.5, 'No XP earned yet', horizontalalignment='center', verticalalignment='center',
+                    transform=ax.transAxes, fontsize=14, color='gray')
+        ax.grid(True, alpha=0.3)
+        self.xp_fig.tight_layout()
+        self.xp_canvas.draw()
     def _show_empty_charts(self):
         self.pie_ax.clear()
         self.pie_ax.text(0.5, 0.5, 'No data available', horizontalalignment='center',
@@ -1448,21 +5081,19 @@ class AnalyticsPage(ttk.Frame):
                          verticalalignment='center', transform=self.line_ax.transAxes,
                          fontsize=14, color='gray')
         self.line_canvas.draw()
-    def _update_stats(self, sessions):
-        if not sessions:
+    def _update_stats(self, summary):
+        if not summary:
             self.total_sessions_label.config(text="Total Sessions: 0")
             self.total_time_label.config(text="Total Time: 0h 0m")
             self.avg_session_label.config(text="Avg Session: 0m")
             self.most_productive_label.config(text="Most Productive Day: N/A")
             return
-        total_sessions = len(sessions)
-        total_minutes = sum(s.get("duration", 0) for s in sessions)
+        total_sessions = summary["total_sessions"]
+        total_minutes = summary["total_minutes"]
         total_hours = int(total_minutes // 60)
         remaining_minutes = int(total_minutes % 60)
         avg_session = int(total_minutes / total_sessions) if total_sessions > 0 else 0
-        daily_time = defaultdict(float)
-        for s in sessions:
-            daily_time[s["date"]] += s.get("duration", 0)
+        daily_time = summary["daily_time"]
         most_productive_day = "N/A"
         if daily_time:
             best_date = max(daily_time.keys(), key=lambda d: daily_time[d])
@@ -1513,10 +5144,12 @@ class AchievementsPage(ttk.Frame):
         self.achievements_notebook = ttk.Notebook(achievements_card)
         self.achievements_notebook.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 15))
         self.achievement_frames = {}
+        self._rendered_tabs = set()
         for category in ["All", "Sessions", "Time", "Streak", "Quality", "Goals"]:
             frame = ttk.Frame(self.achievements_notebook)
             self.achievements_notebook.add(frame, text=category)
             self.achievement_frames[category.lower()] = frame
+        self.achievements_notebook.bind("<<NotebookTabChanged>>", lambda e: self._display_achievements())
     def _display_user_profile(self):
         """Display user profile information"""
         profile = self.app.data.user_profile
@@ -1549,31 +5182,19 @@ class AchievementsPage(ttk.Frame):
             ttk.Label(badge_frame, text=badge,
                      font=(FONT_FAMILY, FONT_SIZES['large'])).pack(pady=5)
     def _display_achievements(self):
-        """Display achievements in categorized tabs"""
-        for frame in self.achievement_frames.values():
-            for widget in frame.winfo_children():
-                widget.destroy()
-        all_achievements = self.app.data.achievements
-        achievements_by_category = {}
-        for achievement in all_achievements:
-            category = achievement.get("category", "other").lower()
-            if category not in achievements_by_category:
-                achievements_by_category[category] = []
-            achievements_by_category[category].append(achievement)
-        self._populate_achievement_list(self.achievement_frames["all"], all_achievements)
-        for category, frame_key in {
-            "sessions": "sessions",
-            "time": "time",
-            "streak": "streak",
-            "quality": "quality",
-            "goals": "goals"
-        }.items():
-            if category in achievements_by_category and frame_key in self.achievement_frames:
-                self._populate_achievement_list(
-                    self.achievement_frames[frame_key],
-                    achievements_by_category[category]
-                )
-    def _populate_achievement_list(self, parent_frame, achievements):
+        """Build the visible achievements tab; other tabs are built when first shown after a refresh"""
+        selected = self.achievements_notebook.select()
+        category = next((c for c, frame in self.achievement_frames.items() if str(frame) == selected), "all")
+        if category in self._rendered_tabs:
+            return
+        frame = self.achievement_frames[category]
+        for widget in frame.winfo_children():
+            widget.destroy()
+        achievements = [a for a in self.app.data.achievements
+                        if category == "all" or a.get("category", "other").lower() == category]
+        self._populate_achievement_list(frame, achievements, self.app.data.metrics())
+        self._rendered_tabs.add(category)
+    def _populate_achievement_list(self, parent_frame, achievements, metrics):
         """Populate a frame with achievement cards"""
         if not achievements:
             ttk.Label(parent_frame, text="No achievements in this category",
@@ -1597,8 +5218,8 @@ class AchievementsPage(ttk.Frame):
             key=lambda a: (not a.get("unlocked", False), a.get("name", ""))
         )
         for achievement in sorted_achievements:
-            self._create_achievement_card(scrollable_frame, achievement)
-    def _create_achievement_card(self, parent, achievement):
+            self._create_achievement_card(scrollable_frame, achievement, metrics)
+    def _create_achievement_card(self, parent, achievement, metrics):
         """Create a card displaying achievement details"""
         is_unlocked = achievement.get("unlocked", False)
         card = ttk.Frame(parent, style="Card.TFrame")
@@ -1636,18 +5257,7 @@ class AchievementsPage(ttk.Frame):
             progress_frame = ttk.Frame(card)
             progress_frame.pack(fill=tk.X, padx=10, pady=(5, 10))
             requirement = achievement.get("requirement", 100)
-            current_value = 0
-            category = achievement.get("category", "").lower()
-            if category == "sessions":
-                current_value = self.app.data.user_profile["stats"]["total_sessions"]
-            elif category == "time":
-                current_value = self.app.data.user_profile["stats"]["total_minutes"]
-            elif category == "streak":
-                current_value = calculate_streak(self.app.data.sessions)
-            elif category == "quality":
-                current_value = self.app.data.user_profile["stats"]["perfect_sessions"]
-            elif category == "goals":
-                current_value = len([g for g in self.app.data.goals if g.get("completed", False)])
+            current_value = metrics.get(achievement.get("category", "").lower(), 0)
             progress_pct = min(100, (current_value / requirement) * 100) if requirement > 0 else 0
             progress_var = tk.DoubleVar(value=progress_pct)
             progress_bar = ttk.Progressbar(progress_frame, variable=progress_var, length=300)
@@ -1655,23 +5265,14 @@ class AchievementsPage(ttk.Frame):
             progress_text = f"{current_value}/{requirement} ({int(progress_pct)}%)"
             ttk.Label(progress_frame, text=progress_text,
                      font=(FONT_FAMILY, FONT_SIZES['small'])).pack(side=tk.RIGHT)
+    @instrumentation.instrumented()
     def refresh(self):
         """Refresh all achievement data"""
         newly_unlocked = self.app.data.check_and_unlock_achievements()
-        for achievement_info in newly_unlocked:
-            achievement = achievement_info["achievement"]
-            level_up = achievement_info["level_up"]
-            xp_gained = achievement_info["xp_gained"]
-            message = f"🎉 Achievement Unlocked: {achievement['name']}\n\n"
-            message += f"{achievement['description']}\n\n"
-            message += f"Reward: {xp_gained} XP"
-            if level_up:
-                message += f"\n🌟 LEVEL UP! You are now Level {self.app.data.user_profile['level']}"
-            if achievement["badge"]:
-                message += f"\n🏅 New Badge: {achievement['badge']}"
-            messagebox.showinfo("Achievement Unlocked!", message)
+        self.app.toasts.notify_unlocks(newly_unlocked, self.app.data.user_profile["level"])
         self._display_user_profile()
         self._display_badges()
+        self._rendered_tabs.clear()
         self._display_achievements()
         self.app.data.save_all()
 class GoalsPage(ttk.Frame):
@@ -1713,6 +5314,7 @@ class GoalsPage(ttk.Frame):
                                              selectforeground='white',
                                              borderwidth=0)
         self.achievements_listbox.pack(fill=tk.X, padx=20, pady=(0, 15))
+    @instrumentation.instrumented()
     def refresh(self):
         if not hasattr(self.app.data, 'goals'):
             self.app.data.goals = []
@@ -1721,27 +5323,10 @@ class GoalsPage(ttk.Frame):
         self._display_goals()
         self._display_achievements()
     def _update_goal_progress(self):
-        """Update progress for all goals based on current session data"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        week_start = (datetime.now() - timedelta(days=datetime.now().weekday())).strftime("%Y-%m-%d")
-        for goal in self.app.data.goals:
-            if goal["completed"]:
-                continue
-            if goal["type"] == "daily":
-                daily_minutes = sum(s["duration"] for s in self.app.data.sessions if s["date"] == today)
-                goal["current"] = int(daily_minutes)
-            elif goal["type"] == "weekly":
-                weekly_minutes = sum(s["duration"] for s in self.app.data.sessions 
-                                   if s["date"] >= week_start)
-                goal["current"] = int(weekly_minutes)
-            elif goal["type"] == "streak":
-                streak = calculate_streak(self.app.data.sessions)
-                goal["current"] = streak
-            if goal["current"] >= goal["target"] and not goal["completed"]:
-                goal["completed"] = True
-                goal["completed_date"] = today
-                messagebox.showinfo("🎉 Goal Achieved!", 
-                                   f"Congratulations! You've completed: {goal['name']}")
+        """Re-evaluate goals in the data layer and show any completions it queued"""
+        self.app.data.update_goal_progress()
+        for note in self.app.data.drain_notifications():
+            self.app.toasts.notify(note["title"], note["message"], "success", system=True)
         self.app.data.save_all()
     def _display_goals(self):
         for widget in self.goals_frame.winfo_children():
@@ -1796,9 +5381,10 @@ class GoalsPage(ttk.Frame):
         """Open dialog to add a new goal"""
         GoalDialog(self, self.app, self.refresh)
     def delete_goal(self, index):
-        if messagebox.askyesno("Delete Goal", "Are you sure you want to delete this goal?"):
-            del self.app.data.goals[index]
-            self.app.data.save_all()
+        if messagebox.askyesno("Delete Goal", "Are you sure you want to delete this goal? (Ctrl+Z undoes this)"):
+            goal = self.app.data.goals[index]
+            goal.setdefault("id", new_id())
+            self.app.data.apply_batch([("delete_goal", goal["id"])], f"Delete goal '{goal['name']}'")
             self.refresh()
 class GoalDialog(ThemedDialog):
     def __init__(self, parent, app, refresh_callback):
@@ -1858,8 +5444,7 @@ class GoalDialog(ThemedDialog):
             "created_date": datetime.now().strftime("%Y-%m-%d"),
             "completed": False
         }
-        self.app.data.goals.append(new_goal)
-        self.app.data.save_all()
+        self.app.data.apply_batch([("insert_goal", new_goal, len(self.app.data.goals))], f"Add goal '{name}'")
         messagebox.showinfo("Success", f"Goal '{name}' created successfully!")
         self.refresh_callback()
         self.destroy()
@@ -1877,24 +5462,60 @@ class AboutPage(ttk.Frame):
                             "- Goal setting and achievement tracking\n"
                             "- Detailed reports with charts\n\n"
                             "Enjoy using SessionSlice!", font=("Segoe UI", 11), justify=tk.CENTER).pack(pady=12)
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of ``threshold`` points that keep the visual shape of (x, y)"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    picked = np.zeros(threshold, dtype=np.int64)
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs((x[previous] - avg_x) * (y[lo:hi] - y[previous]) - (x[previous] - x[lo:hi]) * (avg_y - y[previous]))
+        previous = picked[i + 1] = lo + int(area.argmax())
+    picked[-1] = n - 1
+    return picked
 def calculate_streak(sessions):
     if not sessions:
         return 0
-    dates = {s["date"] for s in sessions}
+    return streak_from_dates({s["date"] for s in sessions})
+def streak_from_dates(dates):
     streak = 0
     day = datetime.now().date()
     while day.strftime("%Y-%m-%d") in dates:
         streak += 1
         day -= timedelta(days=1)
     return streak
+def run_report_cli(argv):
+    """Headless entry point for scheduled jobs: python sessionslice.py --report weekly --format pdf"""
+    parser = argparse.ArgumentParser(description="Generate a SessionSlice productivity report without a display")
+    parser.add_argument("--report", choices=list(ReportGenerator.PERIODS), required=True)
+    parser.add_argument("--format", choices=ReportGenerator.FORMATS, default="html")
+    parser.add_argument("--output", default=REPORTS_DIR, help="directory to write the report into")
+    args = parser.parse_args(argv)
+    path = ReportGenerator(SessionSliceData()).generate(args.report, args.format, args.output)
+    print(f"📄 Report written to {path}")
 if __name__ == "__main__":
+    if any(arg == "--report" or arg.startswith("--report=") for arg in sys.argv[1:]):  # launchers may pass their own flags
+        run_report_cli(sys.argv[1:])
+        sys.exit(0)
+    instance_guard = SingleInstanceGuard()
     try:
         print("🚀 Starting SessionSlice Productivity Tracker...")
+        if not instance_guard.acquire():
+            print("ℹ️ SessionSlice is already running; focusing the existing window.")
+            sys.exit(0)
         app = SessionSliceApp()
+        instance_guard.serve(lambda: app.call_in_main_thread(app.focus_window))
         print("✅ Application loaded successfully!")
         app.mainloop()
     except Exception as e:
         print(f"❌ Error starting application: {e}")
         import traceback
         traceback.print_exc()
-        input("Press Enter to exit...")
\ No newline at end of file
+        input("Press Enter to exit...")
+    finally:
+        instance_guard.release()
\ No newline at end of file